@@ -1,95 +1,52 @@
 # ~/calendar_bot/app.py
-
+"""
+The web tier: a thin ingress for Google webhook notifications plus the
+/health and /metrics endpoints. All sync work lives in the engine (engine.py);
+webhooks are pushed to it over NOTIFY_SOCKET, so request handling never
+competes with a running poll.
+"""
 import os
 import sys
+import hmac
+import time
 import uuid
 import logging
-import requests
-from pathlib import Path
-from datetime import datetime, timezone, timedelta
+import functools
+import threading
 
-from flask import Flask, request, jsonify
-from apscheduler.schedulers.background import BackgroundScheduler
-from googleapiclient.errors import HttpError
-from google.auth.exceptions import RefreshError, TransportError
-from requests.exceptions import RequestException
-from tenacity import retry, wait_exponential, stop_after_attempt, retry_if_exception_type
+from flask import Flask, request, jsonify, send_file
 
 # Prometheus client imports - ENSURE THESE ARE PRESENT AND CORRECT
-from prometheus_client import generate_latest, Counter, Gauge, Histogram
+from prometheus_client import CollectorRegistry, REGISTRY, multiprocess
+from prometheus_client.exposition import choose_encoder
 
 # --- Utility Imports ---
 from utils.logger import logger
-from utils.email_utils import send_error_email
-from utils.google_utils import build_calendar_service
-from utils.process_event import handle_event, load_processed, save_processed
-from utils.mirror import reconcile_mirrors, remove_mirror, apply_instance_exception
-from utils.clones import remove_clone
-from utils.sync import list_changes, load_sync_tokens, save_sync_tokens
-from utils.health import send_health_ping
-from utils.tenacity_utils import log_before_retry
+from utils.leader import LeaderElection, LEADER_LOCK_FILE, forward_to_leader
+from utils.shards import owner_socket
+from utils.status import read_status
+from utils.health import propagation_summary, readiness
+from utils.flight_recorder import read_runs
+from utils.profiling import profile_path, read_profile_status
+from utils.metrics import WEBHOOK_RECEIVED_TOTAL
 
 # --- App Configuration Loading ---
-POLL_INTERVAL_MINUTES = int(os.getenv("POLL_INTERVAL_MINUTES", "5"))
-SOURCE_CALENDARS_STR = os.getenv('SOURCE_CALENDARS', 'joeltimm@gmail.com,tsouthworth@gmail.com')
-SOURCE_CALENDARS = [cal.strip() for cal in SOURCE_CALENDARS_STR.split(',') if cal.strip()]
 DEBUG_LOGGING = os.getenv("DEBUG_LOGGING", "false").lower() == "true"
-UPTIME_KUMA_PUSH_URL = os.getenv("UPTIME_KUMA_PUSH_URL") # For Uptime Kuma heartbeat
-GOOGLE_WEBHOOK_URL = os.getenv("GOOGLE_WEBHOOK_URL")
-
-# --- Webhook channel lifecycle configuration ---
-# Google Calendar watch channels expire (max ~7 days). We renew each channel
-# this long *before* its reported expiration so notifications never lapse.
-WEBHOOK_RENEW_BUFFER = timedelta(hours=6)
-# Fallback TTL used only if Google's watch() response omits an expiration.
-WEBHOOK_DEFAULT_TTL = timedelta(days=7)
-# If registration fails for a calendar, retry this soon instead of waiting for expiry.
-WEBHOOK_RETRY_DELAY = timedelta(minutes=5)
-
-# --- Prometheus Metrics Definitions ---
-POLLS_INITIATED_TOTAL = Counter(
-    'calendar_bot_polls_initiated_total',
-    'Total number of calendar polling cycles initiated.'
-)
-EVENTS_PROCESSED_SUCCESS_TOTAL = Counter(
-    'calendar_bot_events_processed_success_total',
-    'Total number of events successfully processed (invited/duplicated).',
-    ['calendar_id', 'event_type'] # All labels in one list
-)
-EVENTS_PROCESSED_FAILURE_TOTAL = Counter(
-    'calendar_bot_events_processed_failure_total',
-    'Total number of events that failed processing.',
-    ['calendar_id', 'reason'] # All labels in one list
-)
-PROCESSED_EVENT_IDS_COUNT = Gauge(
-    'calendar_bot_processed_event_ids_count',
-    'Current number of unique event IDs tracked as processed.'
-)
-WEBHOOK_RECEIVED_TOTAL = Counter(
-    'calendar_bot_webhooks_received_total',
-    'Total number of webhooks received.'
-)
-POLL_DURATION_SECONDS = Histogram(
-    'calendar_bot_poll_duration_seconds',
-    'Time taken to complete a polling cycle.'
-)
-EVENTS_CLEANED_TOTAL = Counter(
-    'calendar_bot_events_cleaned_total', 
-    'Total number of old event IDs cleaned from memory.'
-)
-WEBHOOK_REGISTRATIONS_TOTAL = Counter(
-    'calendar_bot_webhook_registrations_total', 
-    'Total webhook registration attempts.', 
-    ['calendar_id', 'status']
-)
+# Run the sync engine inside the elected gunicorn worker. Set to false when it
+# runs as its own process (`python -m engine`).
+EMBEDDED_ENGINE = os.getenv("EMBEDDED_ENGINE", "true").lower() == "true"
+# Engines are sharded by calendar: route each webhook to the owning shard.
+SHARDING = os.getenv("SHARDING", "false").lower() == "true"
+# Serve /debug/* routes. They list calendar addresses, so keep them off on a
+# publicly reachable webhook host.
+DEBUG_ENDPOINTS = os.getenv("DEBUG_ENDPOINTS", "false").lower() == "true"
+# /health and /health/ready reuse one reading of the engine's status for this long.
+HEALTH_CACHE_SECONDS = float(os.getenv("HEALTH_CACHE_SECONDS", "5"))
+# Bearer token for the /admin/* routes; they are disabled while it is unset.
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
 
 # --- Flask App Initialization ---
 app = Flask(__name__)
-processed_ids = set()
-scheduler = BackgroundScheduler()
-# Tracks the currently-active watch channel per calendar so we can stop the old
-# one when renewing: {calendar_id: {'id', 'resourceId', 'expiration'}}
-active_channels = {}
 
 # --- Global Exception Handler ---
 def log_unhandled_exception(exc_type, exc_value, exc_traceback):
@@ -101,309 +58,58 @@ def log_unhandled_exception(exc_type, exc_value, exc_traceback):
 
 sys.excepthook = log_unhandled_exception
 
-def send_daily_health_report():
-    """
-    Sends a daily email summarizing the bot's operation.
-    """
-    logger.info("📧 Sending daily health report email...")
-
-    subject = "Calendar Bot Daily Health Report - All Systems Go!"
-    body = (
-        f"Hello,\n\n"
-        f"This is your Calendar Bot reporting in from joelrockslinuxserver.\n\n"
-        f"The bot is running smoothly.\n"
-        f"Last poll completed successfully.\n" # This might need to be more precise or removed if you don't track it
-        f"Total events processed since last restart: {len(processed_ids)}.\n\n"
-        f"If you are receiving this email, it means:\n"
-        f"- The Flask application is running.\n"
-        f"- The APScheduler is functioning.\n"
-        f"- Outbound internet connectivity is working (to SendGrid and Google APIs during polls).\n\n"
-        f"No critical errors were encountered in the last 24 hours that prevented core operations.\n\n"
-        f"Best regards,\n"
-        f"Your Calendar Bot"
-    )
-
-    send_error_email(subject, body)
-    logger.info("✅ Daily health report email sent.")
-
-def clean_processed_events_list():
-    """
-    Periodically cleans the processed_events.json file to remove IDs for events
-    that are old and no longer relevant, preventing the file from growing indefinitely.
-    """
-    logger.info("🧹 Starting weekly cleaning of processed events list...")
-
-    current_ids = load_processed()
-    if not current_ids:
-        logger.info("✨ No events to clean. Memory is already empty.")
+
+def _start_embedded_engine():
+    import engine
+    engine.start()
+
+
+leader = LeaderElection(LEADER_LOCK_FILE, on_elected=_start_embedded_engine)
+
+
+def _route_to_shard(message):
+    """Forward a notification to the shard leasing its calendar (the watch
+    channel's token). Unroutable notifications are dropped; the owning shard's
+    scheduled poll still picks the change up."""
+    calendar_id = message.get('calendar_id')
+    socket_path = owner_socket(calendar_id) if calendar_id else None
+    if not socket_path:
+        logger.warning("📭 No shard currently owns %r; dropping webhook.", calendar_id)
         return
+    forward_to_leader(message, socket_path=socket_path)
 
-    # We only need one authenticated service object for this, doesn't matter which calendar.
-    try:
-        service = build_calendar_service(SOURCE_CALENDARS[0])
-        one_week_ago = (datetime.now(timezone.utc) - timedelta(days=7)).isoformat()
-
-        # Get all events that have *ended* in the last week.
-        # This gives us a grace period to ensure we don't remove something too soon.
-        recent_events_result = service.events().list(
-            calendarId='primary',
-            timeMax=one_week_ago,
-            showDeleted=True, # Important to include deleted events in our check
-            maxResults=2500 # A large number to get a good chunk of history
-        ).execute()
-
-        past_event_ids = {event['id'] for event in recent_events_result.get('items', [])}
-
-        # Remove any ID from our memory if it corresponds to an event that ended over a week ago.
-        cleaned_ids = current_ids - past_event_ids
-
-        num_cleaned = len(current_ids) - len(cleaned_ids)
-
-        if num_cleaned > 0:
-            logger.info(f"✅ Cleaned {num_cleaned} old event IDs from memory.")
-            save_processed(cleaned_ids)
-            EVENTS_CLEANED_TOTAL.inc(num_cleaned)
-            PROCESSED_EVENT_IDS_COUNT.set(len(cleaned_ids))
-        else:
-            logger.info("✨ No old events found to clean this week.")
-
-    except Exception as e:
-        logger.error(f"❌ Could not complete cleaning of processed events list: {e}", exc_info=True)
-        send_error_email("Calendar Bot - Memory Cleaning Failed", f"An error occurred: {e}")
-
-# --- Main Application Logic ---
-# Event types the bot clones once (rather than adding the shared calendar as an
-# attendee), so they need de-dup tracking in processed_ids.
-CLONE_EVENT_TYPES = ('birthday', 'fromGmail')
-
-
-def _process_change(service, calendar_id, event, is_full_sync):
-    """Apply a single synced event change. Returns True if processed_ids changed.
-
-    - Cancelled/deleted -> remove any shared-calendar mirror and forget the id.
-    - Clone types (birthday/fromGmail) -> clone once, guarded by processed_ids,
-      on both full and incremental syncs (so events beyond the old window aren't
-      missed).
-    - Invite/mirror types -> acted on only for incremental changes (a create or
-      an edit). On a full sync they're skipped to avoid mass-acting on the
-      calendar's existing events at startup/resync; idempotent re-adds happen
-      whenever they next change.
-    """
-    eid = event['id']
-
-    # A single-occurrence exception of a recurring series (one instance edited or
-    # cancelled): reflect it onto the mirror's matching occurrence rather than
-    # treating it as a standalone event. On a full sync no mirrors exist yet, so
-    # this is a no-op there.
-    if event.get('recurringEventId'):
-        if not is_full_sync:
-            apply_instance_exception(service, calendar_id, event)
-        return False
-
-    if event.get('status') == 'cancelled':
-        remove_mirror(service, calendar_id, eid)
-        remove_clone(service, calendar_id, eid)
-        if eid in processed_ids:
-            processed_ids.discard(eid)
-            return True
-        return False
-
-    event_type = event.get('eventType', 'default')
-
-    if event_type in CLONE_EVENT_TYPES:
-        if eid in processed_ids:
-            return False  # already cloned
-        if is_full_sync:
-            processed_ids.add(eid)  # seed pre-existing clones; no backfill cloning
-            return True
-        logger.info(f"✅ Processing new {event_type} event: {eid} from {calendar_id}")
-        handle_event(service, calendar_id, eid, EVENTS_PROCESSED_SUCCESS_TOTAL)
-        processed_ids.add(eid)
-        return True
-
-    if is_full_sync:
-        return False  # don't mass-act on pre-existing invite/mirror events
-
-    logger.info(f"✅ Processing changed event: {eid} from {calendar_id}")
-    handle_event(service, calendar_id, eid, EVENTS_PROCESSED_SUCCESS_TOTAL)
-    return False  # invite/mirror are idempotent; no processed_ids entry needed
-
-
-def poll_calendar():
-    # Incrementally syncs all source calendars and processes changed events.
-    with POLL_DURATION_SECONDS.time():
-        POLLS_INITIATED_TOTAL.inc()
-        if UPTIME_KUMA_PUSH_URL: send_health_ping(f"{UPTIME_KUMA_PUSH_URL}")
-        logger.info("⏱️ Running scheduled poll...")
-
-        sync_tokens = load_sync_tokens()
-
-        for cal in SOURCE_CALENDARS:
-            logger.info(f"🔍 Syncing calendar: {cal}")
-            try:
-                service = build_calendar_service(cal)
-                events, new_token, is_full_sync = list_changes(service, cal, sync_tokens.get(cal))
-                kind = 'events (full sync, seeding)' if is_full_sync else 'changed events'
-                logger.info(f"📆 {cal}: {len(events)} {kind}.")
-                # Process masters/singles before instance-exceptions so a series'
-                # mirror exists before we adjust one of its occurrences.
-                events.sort(key=lambda e: 1 if e.get('recurringEventId') else 0)
-                processed_changed = False
-                for event in events:
-                    eid = event.get('id')
-                    if not eid:
-                        continue
-                    try:
-                        if _process_change(service, cal, event, is_full_sync):
-                            processed_changed = True
-                    except HttpError:
-                        logger.warning(f"Skipping event {eid} for {cal} after final processing attempt failed...")
-                        EVENTS_PROCESSED_FAILURE_TOTAL.labels(calendar_id=cal, reason='api_http_error').inc()
-                        processed_ids.add(eid)
-                        processed_changed = True
-                        continue
-                    except Exception as e_handle:
-                        logger.error(f"❌ An unexpected error occurred while handling event {eid}: {e_handle}", exc_info=True)
-                        EVENTS_PROCESSED_FAILURE_TOTAL.labels(calendar_id=cal, reason='unexpected_error').inc()
-                        send_error_email("Calendar Bot - UNEXPECTED Event Error", f"Event ID: {eid}\nError: {e_handle}")
-
-                # Persist the new sync token so the next poll is incremental.
-                if new_token:
-                    sync_tokens[cal] = new_token
-                    save_sync_tokens(sync_tokens)
-                if processed_changed:
-                    save_processed(processed_ids)
-                    PROCESSED_EVENT_IDS_COUNT.set(len(processed_ids))
-                    logger.info(f"💾 Updated processed event list for {cal}.")
-            except Exception as e_generic:
-                logger.error(f"❌ An unexpected error occurred during the poll for {cal}: {e_generic}", exc_info=True)
-                EVENTS_PROCESSED_FAILURE_TOTAL.labels(calendar_id=cal, reason='poll_level_error').inc()
-                send_error_email("Calendar Bot - UNEXPECTED Polling Error", f"Calendar: {cal}\nError: {e_generic}")
-
-        # Keep shared-calendar mirrors of non-organized events in sync: propagate
-        # source moves/cancellations and prune long-past entries.
-        try:
-            reconcile_mirrors(build_calendar_service)
-        except Exception as e_mirror:
-            logger.error(f"❌ Mirror reconciliation failed: {e_mirror}", exc_info=True)
-
-        if UPTIME_KUMA_PUSH_URL:
-            try:
-                requests.get(f"{UPTIME_KUMA_PUSH_URL}?status=up&msg=OK&ping=")
-                logger.info("✅ Sent successful heartbeat to Uptime Kuma.")
-            except Exception as e:
-                logger.error(f"Failed to send heartbeat to Uptime Kuma: {e}")
-
-# --- Webhook Registration ---
-@retry(
-    # Ride out transient boot-time failures (e.g. DNS not ready, token-refresh
-    # network errors, Google 5xx/429) so a brief hiccup doesn't leave the
-    # calendar unwatched until the next restart.
-    retry=retry_if_exception_type((HttpError, TransportError, RequestException, OSError)),
-    wait=wait_exponential(multiplier=2, min=4, max=60),
-    stop=stop_after_attempt(5),
-    before_sleep=log_before_retry,
-    reraise=True
-)
-def _create_watch_channel(cal):
-    """Builds an authed service and creates a fresh watch channel for one calendar.
-
-    Retries transient network/API errors. Returns (service, watch_response).
-    """
-    service = build_calendar_service(cal)
-    channel_body = {
-        'id': str(uuid.uuid4()),
-        'type': 'web_hook',
-        'address': GOOGLE_WEBHOOK_URL
-    }
-    response = service.events().watch(calendarId=cal, body=channel_body).execute()
-    return service, response
-
-
-def _channel_expiration(response):
-    """Returns the channel expiration as a UTC datetime, falling back to the
-    default TTL if Google didn't report one."""
-    exp_ms = response.get('expiration')
-    if exp_ms:
-        return datetime.fromtimestamp(int(exp_ms) / 1000, tz=timezone.utc)
-    return datetime.now(timezone.utc) + WEBHOOK_DEFAULT_TTL
-
-
-def _schedule_webhook_renewal(earliest_expiration, any_failure):
-    """(Re)schedules the self-perpetuating webhook renewal job.
-
-    Renews before the soonest channel expires; if any registration failed,
-    retries soon instead of waiting for expiry.
-    """
-    now = datetime.now(timezone.utc)
-    if any_failure:
-        next_run = now + WEBHOOK_RETRY_DELAY
-        reason = "retry after failure"
-    elif earliest_expiration:
-        next_run = earliest_expiration - WEBHOOK_RENEW_BUFFER
-        if next_run <= now:  # safety net; channels should outlive the buffer
-            next_run = now + WEBHOOK_RETRY_DELAY
-        reason = "scheduled renewal"
+
+_health_cache = {'expires': 0.0, 'status': None}
+_health_cache_lock = threading.Lock()
+
+
+def _engine_status():
+    """The engine's published status, re-read at most every HEALTH_CACHE_SECONDS."""
+    now = time.monotonic()
+    with _health_cache_lock:
+        if _health_cache['status'] is None or now >= _health_cache['expires']:
+            _health_cache.update(status=read_status(), expires=now + HEALTH_CACHE_SECONDS)
+        return _health_cache['status']
+
+
+def _forward(message):
+    if SHARDING:
+        _route_to_shard(message)
     else:
-        next_run = now + WEBHOOK_DEFAULT_TTL - WEBHOOK_RENEW_BUFFER
-        reason = "default renewal"
-
-    scheduler.add_job(
-        register_webhooks, 'date', run_date=next_run,
-        id='webhook_renewal_job', replace_existing=True
-    )
-    logger.info(f"🗓️ Next webhook {reason} scheduled for {next_run.isoformat()}.")
-
-
-def register_webhooks():
-    """
-    Registers (or renews) a watch channel with Google for each source calendar
-    and schedules the next renewal before the channels expire. This tells Google
-    where to send webhook notifications and keeps them alive indefinitely.
-    """
-    if not GOOGLE_WEBHOOK_URL:
-        logger.warning("🔗 GOOGLE_WEBHOOK_URL is not set. Skipping webhook registration.")
-        return
+        forward_to_leader(message)
 
-    logger.info("🔗 Attempting to register/renew webhooks with Google...")
-    earliest_expiration = None
-    any_failure = False
-
-    for cal in SOURCE_CALENDARS:
-        try:
-            service, response = _create_watch_channel(cal)
-
-            # Stop the previous channel for this calendar so old channels don't
-            # keep firing duplicate notifications (and to avoid leaking quota).
-            old = active_channels.get(cal)
-            if old and old.get('resourceId'):
-                try:
-                    service.channels().stop(
-                        body={'id': old['id'], 'resourceId': old['resourceId']}
-                    ).execute()
-                    logger.info(f"🛑 Stopped previous webhook channel for {cal}.")
-                except Exception as e:
-                    logger.warning(f"Could not stop previous channel for {cal}: {e}")
-
-            active_channels[cal] = {
-                'id': response.get('id'),
-                'resourceId': response.get('resourceId'),
-                'expiration': response.get('expiration'),
-            }
-
-            exp_dt = _channel_expiration(response)
-            if earliest_expiration is None or exp_dt < earliest_expiration:
-                earliest_expiration = exp_dt
-
-            logger.info(f"✅ Successfully registered webhook for {cal} at {GOOGLE_WEBHOOK_URL} (expires {exp_dt.isoformat()}).")
-            WEBHOOK_REGISTRATIONS_TOTAL.labels(calendar_id=cal, status='success').inc()
-        except Exception as e:
-            any_failure = True
-            logger.error(f"❌ Failed to register webhook for {cal}: {e}", exc_info=True)
-            WEBHOOK_REGISTRATIONS_TOTAL.labels(calendar_id=cal, status='failure').inc()
-            send_error_email("Calendar Bot - CRITICAL Webhook Registration Failed", f"Could not register webhook for {cal}.\nError: {e}")
-
-    _schedule_webhook_renewal(earliest_expiration, any_failure)
+
+def require_admin(view):
+    """Only serve `view` to requests carrying `Authorization: Bearer ADMIN_TOKEN`."""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if not ADMIN_TOKEN:
+            return jsonify({"error": "not found"}), 404
+        supplied = request.headers.get('Authorization', '').removeprefix('Bearer ')
+        if not hmac.compare_digest(supplied.encode(), ADMIN_TOKEN.encode()):
+            return jsonify({"error": "unauthorized"}), 401
+        return view(*args, **kwargs)
+    return wrapper
 
 
 # --- Flask Web Routes ---
@@ -414,39 +120,174 @@ def webhook():
     logger.info("📩 Webhook received!")
     resource_state = request.headers.get('X-Goog-Resource-State')
 
-    logger.debug(f"Webhook headers: {request.headers}")
+    logger.debug("Webhook headers: %s", request.headers)
 
+    calendar_id = request.headers.get('X-Goog-Channel-Token')
     if resource_state == 'exists':
-        logger.info("Valid 'exists' webhook received. Signaling immediate poll of main job.")
-        # Instead of adding a new job, modify the next_run_time
-        # of the existing 'poll_calendar_job' to be immediate.
-        # This ensures only one polling job is active/queued at a time,
-        # respecting the max_instances=1 set on 'poll_calendar_job'.
-        try:
-            scheduler.modify_job('poll_calendar_job', next_run_time=datetime.now(timezone.utc))
-            logger.info("Main poll_calendar job rescheduled for immediate execution.")
-        except Exception as e:
-            logger.error(f"Failed to reschedule main poll_calendar job immediately: {e}", exc_info=True)
-            # As a fallback, you might still want to add a unique job if rescheduling fails often,
-            # but ideally, modify_job should work.
-            scheduler.add_job(poll_calendar, id=f'webhook_triggered_fallback_poll_{uuid.uuid4().hex}', replace_existing=False)
-            logger.warning("Added a fallback webhook-triggered poll job due to reschedule failure.")
+        logger.info("Valid 'exists' webhook received. Signaling immediate poll to the sync engine.")
+        _forward({'type': 'poll', 'calendar_id': calendar_id})
+    elif resource_state == 'sync':
+        # Google's handshake on a new channel: no changes, but it proves the
+        # channel delivers, which lets the engine relax its safety-net poll.
+        logger.info("🤝 Watch channel 'sync' handshake received.")
+        _forward({'type': 'channel_sync', 'calendar_id': calendar_id})
     else:
-        logger.info(f"📭 Ignoring webhook with state: {resource_state}")
+        logger.info("📭 Ignoring webhook with state: %s", resource_state)
 
     return jsonify({"status": "received"}), 200
 
 # Prometheus metrics endpoint
 @app.route('/metrics')
 def metrics():
-    """Exposes Prometheus metrics."""
-    return generate_latest(), 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+    """Exposes Prometheus metrics (aggregated across workers in multiprocess mode)."""
+    # Scrapers asking for OpenMetrics also get exemplars (trace IDs on
+    # histogram buckets); prometheus_client drops those in multiprocess mode.
+    encoder, content_type = choose_encoder(request.headers.get('Accept', ''))
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        output = encoder(registry)
+    else:
+        output = encoder(REGISTRY)
+    return output, 200, {'Content-Type': content_type}
 
 @app.route('/health', methods=['GET'])
 def health_check():
-    #A simple health check endpoint that returns OK for monitoring.
+    # Always OK while the web tier answers (readiness is /health/ready); what
+    # the engine published is listed after the OK: open circuit breakers
+    # (a failing dependency degrades the bot but the web tier is still up),
+    # recent edit-to-calendar propagation latency per trigger, how each
+    # scheduler job's last run ended and each calendar's sync and channel.
+    # /health/ready turns the same into a verdict.
+    status = _engine_status()
+    jobs = status.get('jobs', {})
+    now = time.time()
+    report = readiness(status, now)
+    lines = ["OK"] + [
+        f"breaker {name} {state}" for name, state in report['breakers'].items() if state != 'closed'
+    ] + [
+        f"propagation {trigger} p50={q['p50']}s p95={q['p95']}s n={q['count']}"
+        for trigger, q in propagation_summary(status, now).items()
+    ] + [
+        f"job {job if len(jobs) == 1 else f'{instance}/{job}'} {info['outcome']} {now - info['at']:.0f}s ago"
+        for instance, outcomes in sorted(jobs.items()) for job, info in sorted(outcomes.items())
+    ] + [
+        _calendar_health_line(cal, info)
+        for engine in report['engines'].values() for cal, info in engine['calendars'].items()
+    ] + [
+        f"outbox {engine['outbox']} alerts pending" for engine in report['engines'].values() if engine['outbox']
+    ]
+    return "\n".join(lines), 200
+
+def _calendar_health_line(cal, info):
+    synced = f"synced {info['last_sync_age']}s ago" if info['last_sync_age'] is not None else "not synced"
+    line = f"calendar {cal} {synced}"
+    if info['channel_expires_in'] is not None:
+        line += f", channel expires in {info['channel_expires_in']}s"
+    if info['retry_pending']:
+        line += ", retry pending"
+    return line
+
+@app.route('/health/live', methods=['GET'])
+def liveness():
+    """Liveness for the container healthcheck: the web tier answers. Reads nothing."""
     return "OK", 200
 
+@app.route('/health/ready', methods=['GET'])
+def readiness_check():
+    """Readiness for the monitor: 200 when the engine is syncing every calendar
+    on time with live watch channels and no open breaker, else 503. The body
+    lists the problems and, per engine, each calendar's last sync age, channel
+    expiry and pending retries."""
+    status = _engine_status()
+    report = readiness(status, time.time())
+    report['jobs'] = status.get('jobs', {})
+    return jsonify(report), 200 if report['ready'] else 503
+
+@app.route('/debug/polls', methods=['GET'])
+def debug_polls():
+    """The engine's flight recorder: its last polls and reconciliation runs,
+    oldest first, per engine instance."""
+    if not DEBUG_ENDPOINTS:
+        return jsonify({"error": "not found"}), 404
+    return jsonify(read_runs()), 200
+
+@app.route('/admin/profile', methods=['POST'])
+@require_admin
+def arm_profile():
+    """Arms the engine's profiler for the next `polls` polls (default 1) or for
+    every poll starting in the next `seconds`. With SHARDING, `calendar_id`
+    picks the shard to profile. Poll GET /admin/profile/<id> for the result."""
+    polls = request.args.get('polls', type=int)
+    seconds = request.args.get('seconds', type=float)
+    malformed = ('polls' in request.args and polls is None) or ('seconds' in request.args and seconds is None)
+    if malformed or (polls is not None and seconds is not None) \
+            or (polls is not None and polls < 1) or (seconds is not None and seconds <= 0):
+        return jsonify({"error": "give either polls >= 1 or seconds > 0"}), 400
+    calendar_id = request.args.get('calendar_id')
+    if SHARDING and not calendar_id:
+        return jsonify({"error": "calendar_id is required to pick a shard"}), 400
+
+    profile_id = uuid.uuid4().hex
+    message = {'type': 'profile', 'id': profile_id, 'polls': polls, 'seconds': seconds}
+    if calendar_id:
+        message['calendar_id'] = calendar_id
+    _forward(message)
+    logger.info("🔬 Profiler arm request %s forwarded to the sync engine.", profile_id)
+    return jsonify({"id": profile_id, "status": f"/admin/profile/{profile_id}"}), 202
+
+@app.route('/admin/profile/<profile_id>', methods=['GET'])
+@require_admin
+def get_profile(profile_id):
+    """The profile's state; once done, `?format=pstats` or `?format=collapsed`
+    downloads it (load the first with `pstats.Stats`, feed the second to
+    flamegraph.pl or speedscope)."""
+    return _serve_artifact(profile_id, ('pstats', 'collapsed'))
+
+@app.route('/admin/memory', methods=['POST'])
+@require_admin
+def arm_memory_snapshot():
+    """Arms a tracemalloc snapshot diff between the engine's next two polls.
+    With SHARDING, `calendar_id` picks the shard. Poll GET /admin/memory/<id>
+    for the result."""
+    calendar_id = request.args.get('calendar_id')
+    if SHARDING and not calendar_id:
+        return jsonify({"error": "calendar_id is required to pick a shard"}), 400
+    diff_id = uuid.uuid4().hex
+    message = {'type': 'memory_snapshot', 'id': diff_id}
+    if calendar_id:
+        message['calendar_id'] = calendar_id
+    _forward(message)
+    logger.info("🧮 Memory snapshot request %s forwarded to the sync engine.", diff_id)
+    return jsonify({"id": diff_id, "status": f"/admin/memory/{diff_id}"}), 202
+
+@app.route('/admin/memory/<diff_id>', methods=['GET'])
+@require_admin
+def get_memory_snapshot(diff_id):
+    """The diff's state; once done, `?format=tracemalloc` downloads the top
+    allocation growth by source line."""
+    return _serve_artifact(diff_id, ('tracemalloc',))
+
+def _serve_artifact(artifact_id, formats):
+    """Status JSON of a profile or snapshot diff, or with `?format=` one of its files."""
+    try:
+        status = read_profile_status(artifact_id)
+    except ValueError:
+        return jsonify({"error": "not found"}), 404
+    if status is None:
+        # Arming is asynchronous: the engine may not have picked the request up yet.
+        return jsonify({"state": "pending"}), 200
+    fmt = request.args.get('format')
+    if fmt is None:
+        return jsonify(status), 200
+    if fmt not in formats:
+        return jsonify({"error": f"format must be one of {', '.join(formats)}"}), 400
+    path = profile_path(artifact_id, fmt)
+    if status.get('state') != 'done' or not path.exists():
+        return jsonify({"error": "not available", **status}), 409
+    return send_file(path.resolve(), as_attachment=True, download_name=path.name,
+                     mimetype='application/octet-stream' if fmt == 'pstats' else 'text/plain')
+
 # --- App Startup Logic for Gunicorn ---
 if __name__ != '__main__':
     # This block runs when the app is started by Gunicorn
@@ -455,15 +296,9 @@ if __name__ != '__main__':
         logger.debug("🐛 Debug logging enabled.")
 
     logger.info("🚀 Starting Flask app...")
-    processed_ids.update(load_processed())
-    PROCESSED_EVENT_IDS_COUNT.set(len(processed_ids))
-    logger.info(f"📂 Loaded {len(processed_ids)} processed event IDs.")
-
-    # Configure and start the scheduler
-    scheduler.add_job(poll_calendar, 'interval', minutes=POLL_INTERVAL_MINUTES, id='poll_calendar_job', max_instances=1)
-    scheduler.add_job(poll_calendar, id='initial_startup_poll', run_date=datetime.now(timezone.utc), replace_existing=True)
-    scheduler.add_job(send_daily_health_report, 'cron', hour=7, id='daily_health_email_job', replace_existing=True)
-    scheduler.add_job(clean_processed_events_list, 'cron', day_of_week='sun', hour=3, id='weekly_memory_clean_job', replace_existing=True)
-    scheduler.add_job(register_webhooks, id='initial_webhook_registration', run_date=datetime.now(timezone.utc) + timedelta(seconds=10))
-    scheduler.start()
-    logger.info(f"🧠 Main process started. Polling every {POLL_INTERVAL_MINUTES} minutes.")
+    if EMBEDDED_ENGINE and not SHARDING:
+        # Only one worker runs the engine; the rest serve HTTP and forward
+        # webhook notifications to it.
+        leader.start()
+    elif EMBEDDED_ENGINE:
+        logger.warning("EMBEDDED_ENGINE is ignored with SHARDING; run each shard as `python -m engine`.")
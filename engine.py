@@ -0,0 +1,886 @@
+# ~/calendar_bot/engine.py
+"""
+The sync engine: owns polling, mirror reconciliation, webhook channel renewal
+and all state files. The Flask app (app.py) is only an ingress that pushes
+webhook notifications to the engine over NOTIFY_SOCKET.
+
+Run it standalone with `python -m engine`, so it can be scaled, profiled and
+restarted independently of the web tier. With EMBEDDED_ENGINE=true (the
+default) the web tier instead starts it inside whichever gunicorn worker wins
+the leader election. Either way the leader lock guarantees a single engine.
+"""
+import os
+import time
+import uuid
+import signal
+import socket
+import logging
+import threading
+import contextlib
+from datetime import datetime, timezone, timedelta
+
+from apscheduler.schedulers.background import BackgroundScheduler
+from googleapiclient.errors import HttpError
+from google.auth.exceptions import TransportError
+from requests.exceptions import RequestException
+from tenacity import retry, wait_exponential, stop_after_attempt, retry_if_exception_type
+from prometheus_client import start_http_server
+
+# --- Utility Imports ---
+from utils.logger import logger
+from utils.alerts import alert, outbox_depth
+from utils.email_utils import send_error_email
+from utils.google_utils import build_calendar_service
+from utils.process_event import handle_event, load_processed, save_processed, migrate_processed, ProcessedStore
+from utils.mirror import (
+    reconcile_mirrors, remove_mirror, apply_instance_exceptions,
+    event_end_ts, repair_drift, cached_index as cached_mirror_index,
+)
+from utils.breaker import CircuitOpen, publish_breakers, set_instance as set_breaker_instance
+from utils.clones import remove_clone, forget_deleted_clones
+from utils import clones, mirror
+from utils.deadline import Deadline, DeadlineExceeded, bounded_by
+from utils.flight_recorder import (
+    record as flight_record, stage, note_calendar, publish as publish_flight_recorder,
+    recent as recent_flight_records,
+)
+from utils.memory import (
+    SnapshotDiff, track as track_memory, track_file as track_state_file, update_gauges as update_memory_gauges,
+    note_batch, logging_buffers,
+)
+from utils.jobs import JobMonitor
+from utils.pacing import AdaptivePollInterval
+from utils.profiling import PollProfiler
+from utils.propagation import triggered_by, publish_propagation_summary
+from utils.status import publish_status
+from utils.tracing import span, timed, traced, set_attribute
+from utils.routing import get_router
+from utils.sync import list_changes, load_sync_tokens, save_sync_tokens
+from utils.health import send_health_ping
+from utils.tenacity_utils import log_before_retry
+from utils.leader import LeaderElection, LEADER_LOCK_FILE, NOTIFY_SOCKET, serve_notifications
+from utils.shards import ShardCoordinator, LEASE_TTL_SECONDS
+from utils.metrics import (
+    POLLS_INITIATED_TOTAL, EVENTS_PROCESSED_SUCCESS_TOTAL, EVENTS_PROCESSED_FAILURE_TOTAL,
+    PROCESSED_EVENT_IDS_COUNT, POLL_DURATION_SECONDS, EVENTS_CLEANED_TOTAL,
+    WEBHOOK_REGISTRATIONS_TOTAL, MIRROR_RECONCILE_READS_TOTAL,
+    SHARD_OWNED_CALENDARS, CALENDAR_SYNC_LAG_SECONDS, MIRROR_DRIFT_REPAIRS_TOTAL,
+    POLL_INTERVAL_SECONDS, MIRROR_RECONCILE_BACKLOG, MIRROR_RECONCILE_SWEEP_SECONDS,
+    MIRROR_RECONCILE_SWEEP_COMPLETED, POLL_DEADLINE_EXCEEDED_TOTAL,
+)
+
+# --- Engine Configuration Loading ---
+POLL_INTERVAL_MINUTES = int(os.getenv("POLL_INTERVAL_MINUTES", "5"))
+# Bounds for the adaptive safety-net poll (see utils/pacing.py): the minimum is
+# used while a calendar's webhooks are down or it is busy, the maximum while its
+# channel is live and delivering. POLL_INTERVAL_MINUTES applies in between.
+POLL_INTERVAL_MIN_MINUTES = int(os.getenv("POLL_INTERVAL_MIN_MINUTES", "1"))
+POLL_INTERVAL_MAX_MINUTES = int(os.getenv("POLL_INTERVAL_MAX_MINUTES", "30"))
+# Changes per sync (moving average) above which a calendar counts as busy.
+POLL_CHURN_HIGH = float(os.getenv("POLL_CHURN_HIGH", "10"))
+# Hard wall-clock budget for one poll, across every API call and retry in it.
+# Whatever is left when it expires waits for the next poll.
+POLL_DEADLINE_SECONDS = float(os.getenv("POLL_DEADLINE_SECONDS", "240"))
+# Mirror reconciliation runs as its own job; each run stops after this much
+# time or this many API calls and the next run resumes the sweep.
+RECONCILE_INTERVAL_MINUTES = int(os.getenv("RECONCILE_INTERVAL_MINUTES", "5"))
+RECONCILE_BUDGET_SECONDS = float(os.getenv("RECONCILE_BUDGET_SECONDS", "30"))
+RECONCILE_MAX_CALLS = int(os.getenv("RECONCILE_MAX_CALLS", "200"))
+SOURCE_CALENDARS_STR = os.getenv('SOURCE_CALENDARS', 'joeltimm@gmail.com,tsouthworth@gmail.com')
+SOURCE_CALENDARS = [cal.strip() for cal in SOURCE_CALENDARS_STR.split(',') if cal.strip()]
+DEBUG_LOGGING = os.getenv("DEBUG_LOGGING", "false").lower() == "true"
+UPTIME_KUMA_PUSH_URL = os.getenv("UPTIME_KUMA_PUSH_URL") # For Uptime Kuma heartbeat
+GOOGLE_WEBHOOK_URL = os.getenv("GOOGLE_WEBHOOK_URL")
+# Standalone engine only: port for its own /metrics (0 disables). When embedded,
+# its metrics are served by the web tier's /metrics instead.
+ENGINE_METRICS_PORT = int(os.getenv("ENGINE_METRICS_PORT", "9101"))
+# Shard SOURCE_CALENDARS across several engine instances (see utils/shards.py).
+# Each instance needs a unique INSTANCE_ID and the shared data volume.
+SHARDING = os.getenv("SHARDING", "false").lower() == "true"
+INSTANCE_ID = os.getenv("INSTANCE_ID") or f"{socket.gethostname()}-{os.getpid()}"
+
+# --- Webhook channel lifecycle configuration ---
+# Google Calendar watch channels expire (max ~7 days). We renew each channel
+# this long *before* its reported expiration so notifications never lapse.
+WEBHOOK_RENEW_BUFFER = timedelta(hours=6)
+# Fallback TTL used only if Google's watch() response omits an expiration.
+WEBHOOK_DEFAULT_TTL = timedelta(days=7)
+# If registration fails for a calendar, retry this soon instead of waiting for expiry.
+WEBHOOK_RETRY_DELAY = timedelta(minutes=5)
+
+# Forget a processed (cloned) event ID once the event ended this long ago.
+PROCESSED_RETENTION = timedelta(days=7)
+
+# --- Engine State ---
+processed_ids = ProcessedStore()
+scheduler = BackgroundScheduler()
+# Lag, duration, misfires and skips of every scheduler job; last outcomes go to /health.
+job_monitor = JobMonitor(INSTANCE_ID if SHARDING else 'engine')
+# Tracks the currently-active watch channel per calendar so we can stop the old
+# one when renewing: {calendar_id: {'id', 'resourceId', 'expiration'}}
+active_channels = {}
+# Set when SHARDING: this instance's calendar leases.
+shard = None
+# Last successful sync per calendar (epoch seconds), for the lag metric.
+last_synced = {}
+# Adaptive poll pacing: when each calendar's last sync started, when a webhook
+# last arrived for it (epoch seconds), and calendars whose channel failed to register.
+pacing = AdaptivePollInterval(
+    POLL_INTERVAL_MINUTES * 60, POLL_INTERVAL_MIN_MINUTES * 60, POLL_INTERVAL_MAX_MINUTES * 60, POLL_CHURN_HIGH
+)
+last_poll_started = {}
+last_notified = {}
+failed_registrations = set()
+# Current interval of poll_calendar_job, in seconds.
+poll_tick = None
+# Armed from the web tier's /admin/profile and /admin/memory routes.
+profiler = PollProfiler()
+memory_diff = SnapshotDiff()
+
+# Sized after every poll into the calendar_bot_resident_state_* gauges; the
+# files behind the two cached indexes are sized on disk too.
+track_memory('processed_ids', lambda: processed_ids)
+track_memory('active_channels', lambda: active_channels)
+track_memory('poll_state', lambda: (last_synced, last_poll_started, last_notified, pacing))
+track_memory('mirror_index', cached_mirror_index)
+track_memory('clone_index', clones.cached_index)
+track_memory('flight_recorder', recent_flight_records)
+track_memory('logging_buffers', logging_buffers)
+track_state_file('mirror_map', lambda: mirror.MIRROR_FILE)
+track_state_file('clone_map', lambda: clones.CLONE_FILE)
+
+
+def owned_calendars():
+    """The source calendars this engine syncs: all of them, or its shard's."""
+    if shard is None:
+        return SOURCE_CALENDARS
+    return [cal for cal in SOURCE_CALENDARS if cal in shard.owned]
+
+
+def target_calendars():
+    """Every calendar the routing table copies events to, excluding any that is
+    also a source calendar (it is already synced, under the same token key)."""
+    return [t for t in get_router().targets if t not in SOURCE_CALENDARS]
+
+
+def owned_targets():
+    """The target calendars this engine incrementally syncs for drift. When
+    SHARDING they are leased like source calendars, so one shard syncs each."""
+    if shard is None:
+        return target_calendars()
+    return [t for t in target_calendars() if t in shard.owned]
+
+
+def watched_calendars():
+    """Calendars this engine keeps a watch channel on."""
+    return owned_calendars() + owned_targets()
+
+
+def _account_for(cal):
+    """The account whose credentials are used for `cal`. Target calendars have
+    no token of their own; any source account can manage them."""
+    return cal if cal in SOURCE_CALENDARS else SOURCE_CALENDARS[0]
+
+
+def effective_interval(cal, now=None):
+    """The adaptive safety-net poll interval (seconds) for one calendar."""
+    if not GOOGLE_WEBHOOK_URL:
+        return pacing.base  # no webhooks: polling is the only path, as configured
+    now = now or time.time()
+    channel = active_channels.get(cal)
+    live = (bool(channel) and cal not in failed_registrations
+            and _channel_expiration(channel).timestamp() > now)
+    heard = live and last_notified.get(cal, 0) >= channel.get('registered_at', 0)
+    return pacing.interval(cal, live, heard)
+
+
+def _is_due(cal, now):
+    """Whether a poll tick should sync `cal`: a webhook arrived since its last
+    sync, or its own interval has elapsed."""
+    started = last_poll_started.get(cal)
+    if started is None or last_notified.get(cal, 0) >= started:
+        return True
+    # 10% slack so tick jitter doesn't skip a calendar whose interval equals the tick.
+    return now - started >= 0.9 * effective_interval(cal, now)
+
+
+def retune_poll_interval():
+    """Publishes each calendar's effective interval and re-ticks
+    poll_calendar_job at the shortest of them."""
+    global poll_tick
+    intervals = {cal: effective_interval(cal) for cal in watched_calendars()}
+    for cal, seconds in intervals.items():
+        POLL_INTERVAL_SECONDS.labels(calendar_id=cal).set(seconds)
+    tick = min(intervals.values(), default=pacing.base)
+    if tick != poll_tick and scheduler.get_job('poll_calendar_job'):
+        scheduler.reschedule_job('poll_calendar_job', trigger='interval', seconds=tick)
+        logger.info("⏲️ Safety-net poll now ticks every %g min.", tick // 60)
+        poll_tick = tick
+
+
+def _state_scope():
+    """Calendars whose entries this engine may write in shared state files
+    (None = all, when not sharded)."""
+    return None if shard is None else owned_calendars()
+
+def send_daily_health_report():
+    """
+    Sends a daily email summarizing the bot's operation.
+    """
+    logger.info("📧 Sending daily health report email...")
+
+    subject = "Calendar Bot Daily Health Report - All Systems Go!"
+    body = (
+        f"Hello,\n\n"
+        f"This is your Calendar Bot reporting in from joelrockslinuxserver.\n\n"
+        f"The bot is running smoothly.\n"
+        f"Last poll completed successfully.\n" # This might need to be more precise or removed if you don't track it
+        f"Total events processed since last restart: {len(processed_ids)}.\n\n"
+        f"If you are receiving this email, it means:\n"
+        f"- The Flask application is running.\n"
+        f"- The APScheduler is functioning.\n"
+        f"- Outbound internet connectivity is working (to SendGrid and Google APIs during polls).\n\n"
+        f"No critical errors were encountered in the last 24 hours that prevented core operations.\n\n"
+        f"Best regards,\n"
+        f"Your Calendar Bot"
+    )
+
+    send_error_email(subject, body)
+    logger.info("✅ Daily health report email sent.")
+
+def clean_processed_events_list():
+    """
+    Drops processed IDs of events that ended more than PROCESSED_RETENTION ago,
+    preventing the processed_events.json file from growing indefinitely.
+
+    Expiry is driven by the end time stored with each ID, so this is a local
+    O(expired) operation covering every source calendar, with no API calls.
+    """
+    logger.info("🧹 Starting cleaning of processed events list...")
+
+    cutoff = (datetime.now(timezone.utc) - PROCESSED_RETENTION).timestamp()
+    expired = processed_ids.expire(cutoff)
+
+    if expired:
+        save_processed(processed_ids, _state_scope())
+        EVENTS_CLEANED_TOTAL.inc(len(expired))
+        PROCESSED_EVENT_IDS_COUNT.set(len(processed_ids))
+        logger.info("✅ Cleaned %s old event IDs from memory.", len(expired))
+    else:
+        logger.info("✨ No old events found to clean.")
+
+# --- Main Application Logic ---
+# Event types the bot clones once (rather than adding the shared calendar as an
+# attendee), so they need de-dup tracking in processed_ids.
+CLONE_EVENT_TYPES = ('birthday', 'fromGmail')
+
+
+@traced('process_change')
+def _process_change(service, calendar_id, event, is_full_sync, deadline=None):
+    """Apply a single synced event change. Returns True if processed_ids changed.
+    Recurring-instance exceptions never come here; `_process_changes` applies
+    them per series.
+
+    - Cancelled/deleted -> remove any shared-calendar mirror and forget the id.
+    - Clone types (birthday/fromGmail) -> clone once, guarded by processed_ids,
+      on both full and incremental syncs (so events beyond the old window aren't
+      missed).
+    - Invite/mirror types -> acted on only for incremental changes (a create or
+      an edit). On a full sync they're skipped to avoid mass-acting on the
+      calendar's existing events at startup/resync; idempotent re-adds happen
+      whenever they next change.
+    """
+    eid = event['id']
+    set_attribute('calendar_id', calendar_id)
+    set_attribute('event_id', eid)
+
+    if event.get('status') == 'cancelled':
+        remove_mirror(service, calendar_id, eid, deadline)
+        remove_clone(service, calendar_id, eid, deadline)
+        if eid in processed_ids:
+            processed_ids.discard(eid)
+            return True
+        return False
+
+    event_type = event.get('eventType', 'default')
+
+    if event_type in CLONE_EVENT_TYPES:
+        if eid in processed_ids:
+            return False  # already cloned
+        if is_full_sync:
+            # seed pre-existing clones; no backfill cloning
+            processed_ids.add(eid, calendar_id, event_end_ts(event))
+            return True
+        logger.info("✅ Processing new %s event: %s from %s", event_type, eid, calendar_id)
+        handle_event(service, calendar_id, eid, EVENTS_PROCESSED_SUCCESS_TOTAL, deadline=deadline)
+        processed_ids.add(eid, calendar_id, event_end_ts(event))
+        return True
+
+    if is_full_sync:
+        return False  # don't mass-act on pre-existing invite/mirror events
+
+    logger.info("✅ Processing changed event: %s from %s", eid, calendar_id)
+    handle_event(service, calendar_id, eid, EVENTS_PROCESSED_SUCCESS_TOTAL, deadline=deadline)
+    return False  # invite/mirror are idempotent; no processed_ids entry needed
+
+
+def sync_target_calendar(target, sync_tokens, deadline=None):
+    """Incrementally syncs one target calendar and repairs mirrors/clones that
+    changed there behind the bot's back. Costs O(changes), unlike a sweep."""
+    service = build_calendar_service(_account_for(target))
+    with stage('list'):
+        events, new_token, is_full_sync = list_changes(service, target, sync_tokens.get(target), deadline)
+    note_calendar(target, events=len(events), full_sync=is_full_sync)
+    note_batch(target, events, is_full_sync)
+    # A full sync only seeds the token; there is no earlier state to diff against.
+    if events and not is_full_sync:
+        logger.info("📆 Target %s: %s changed events.", target, len(events))
+        with stage('process'):
+            repaired = repair_drift(build_calendar_service, events, target, deadline)
+            if repaired:
+                MIRROR_DRIFT_REPAIRS_TOTAL.inc(repaired)
+            forget_deleted_clones(events, target)
+    if new_token:
+        with stage('persist'):
+            save_sync_tokens({target: new_token})
+
+
+def poll_calendar():
+    # Incrementally syncs all source calendars and processes changed events.
+    # Every Calendar request in the poll caps its timeout at the deadline.
+    deadline = Deadline(POLL_DEADLINE_SECONDS)
+    with profiler.profiling(), memory_diff.around_poll(), span('poll'), timed(POLL_DURATION_SECONDS), \
+            flight_record('poll', trigger='poll'), bounded_by(deadline):
+        POLLS_INITIATED_TOTAL.inc()
+        if UPTIME_KUMA_PUSH_URL:
+            with stage('heartbeat'):
+                send_health_ping(f"{UPTIME_KUMA_PUSH_URL}", deadline=deadline)
+        logger.info("⏱️ Running scheduled poll...")
+
+        sync_tokens = load_sync_tokens()
+        now = time.time()
+        current = None
+        try:
+            for cal in owned_calendars():
+                if not _is_due(cal, now):
+                    logger.debug("⏭️ %s not due (interval %g min).", cal, effective_interval(cal, now) // 60)
+                    continue
+                # Webhook-triggered if a notification arrived since the last sync.
+                started = last_poll_started.get(cal)
+                trigger = 'webhook' if started is not None and last_notified.get(cal, 0) >= started else 'poll'
+                current = cal
+                last_poll_started[cal] = now
+                note_calendar(cal, trigger=trigger)
+                with triggered_by(trigger), span('sync_calendar', calendar_id=cal, trigger=trigger):
+                    _sync_source_calendar(cal, sync_tokens, deadline)
+
+            for target in owned_targets():
+                if not _is_due(target, now):
+                    continue
+                current = target
+                last_poll_started[target] = now
+                try:
+                    with span('sync_target_calendar', calendar_id=target):
+                        sync_target_calendar(target, sync_tokens, deadline)
+                except DeadlineExceeded:
+                    raise
+                except CircuitOpen as e_open:
+                    logger.warning("⏸️ Skipping drift sync of target calendar %s: %s", target, e_open)
+                except Exception as e_target:
+                    logger.error("❌ Drift sync of target calendar %s failed: %s", target, e_target, exc_info=True)
+            current = None
+        except DeadlineExceeded as e_deadline:
+            POLL_DEADLINE_EXCEEDED_TOTAL.inc()
+            # The interrupted calendar kept its old sync token; make it due again.
+            last_poll_started.pop(current, None)
+            logger.warning("⏳ %s %s and any calendars after it wait for the next poll.", e_deadline, current)
+
+        retune_poll_interval()
+        _publish_propagation()
+        _publish_health()
+        update_memory_gauges()
+
+        if UPTIME_KUMA_PUSH_URL and not deadline.expired:
+            with stage('heartbeat'):
+                send_health_ping(f"{UPTIME_KUMA_PUSH_URL}?status=up&msg=OK&ping=", deadline=deadline)
+    _publish_flight_recorder()
+
+
+def _sync_source_calendar(cal, sync_tokens, deadline):
+    """Syncs one source calendar and processes its changed events. Raises
+    DeadlineExceeded (without saving the new sync token) if the poll runs out of time."""
+    logger.info("🔍 Syncing calendar: %s", cal)
+    try:
+        service = build_calendar_service(cal)
+        with stage('list'):
+            events, new_token, is_full_sync = list_changes(service, cal, sync_tokens.get(cal), deadline)
+        kind = 'events (full sync, seeding)' if is_full_sync else 'changed events'
+        logger.info("📆 %s: %s %s.", cal, len(events), kind)
+        note_calendar(cal, events=len(events), full_sync=is_full_sync)
+        note_batch(cal, events, is_full_sync)
+        if not is_full_sync:
+            pacing.observe(cal, len(events))
+        with stage('process'):
+            processed_changed = _process_changes(service, cal, events, is_full_sync, deadline)
+
+        # Persist the new sync token so the next poll is incremental.
+        with stage('persist'):
+            if new_token:
+                save_sync_tokens({cal: new_token})
+            if processed_changed:
+                save_processed(processed_ids, _state_scope())
+                PROCESSED_EVENT_IDS_COUNT.set(len(processed_ids))
+                logger.info("💾 Updated processed event list for %s.", cal)
+        last_synced[cal] = datetime.now(timezone.utc).timestamp()
+        CALENDAR_SYNC_LAG_SECONDS.labels(calendar_id=cal).set(0)
+    except DeadlineExceeded:
+        raise
+    except CircuitOpen as e_open:
+        # The account (or Google) is failing; the sync resumes from the saved
+        # token once a probe gets through, without an email per poll.
+        logger.warning("⏸️ Skipping %s: %s", cal, e_open)
+        EVENTS_PROCESSED_FAILURE_TOTAL.labels(calendar_id=cal, reason='circuit_open').inc()
+    except Exception as e_generic:
+        logger.error("❌ An unexpected error occurred during the poll for %s: %s", cal, e_generic, exc_info=True)
+        EVENTS_PROCESSED_FAILURE_TOTAL.labels(calendar_id=cal, reason='poll_level_error').inc()
+        alert("Calendar Bot - UNEXPECTED Polling Error", f"Calendar: {cal}\nError: {e_generic}",
+              fingerprint=f"poll_error:{cal}:{type(e_generic).__name__}")
+
+
+def _publish_flight_recorder():
+    try:
+        publish_flight_recorder(INSTANCE_ID if SHARDING else 'engine')
+    except OSError as e:
+        logger.warning("Could not publish the flight recorder: %s", e)
+
+
+def _publish_propagation():
+    try:
+        publish_propagation_summary(INSTANCE_ID if SHARDING else 'engine')
+    except OSError as e:
+        logger.warning("Could not publish propagation latency summary: %s", e)
+
+
+def health_snapshot():
+    """What /health/ready judges this engine by, from in-memory state only:
+    per calendar the last successful sync (and the age past which it is
+    overdue), whether a retry is pending and when its watch channel expires."""
+    now = time.time()
+    calendars = {}
+    for cal in owned_calendars():
+        started = last_poll_started.get(cal)
+        synced = last_synced.get(cal)
+        calendars[cal] = {
+            'last_sync': synced,
+            # Two intervals plus a poll's deadline: one missed poll is not yet a problem.
+            'max_sync_age': 2 * effective_interval(cal, now) + POLL_DEADLINE_SECONDS,
+            'retry_pending': started is not None and (synced is None or synced < started),
+        }
+    for cal in watched_calendars():
+        channel = active_channels.get(cal)
+        calendars.setdefault(cal, {}).update(
+            watched=True, channel_expires=_channel_expiration(channel).timestamp() if channel else None,
+        )
+    return {
+        'published': now,
+        # The next poll republishes; past this the scheduler has stalled.
+        'stale_after': now + 2 * (poll_tick or POLL_INTERVAL_MINUTES * 60) + POLL_DEADLINE_SECONDS,
+        'webhooks': bool(GOOGLE_WEBHOOK_URL),
+        'calendars': calendars,
+        'channels_pending': len(failed_registrations),
+        'outbox': outbox_depth(),
+    }
+
+
+def _publish_health():
+    try:
+        publish_status('health', {INSTANCE_ID if SHARDING else 'engine': health_snapshot()})
+    except OSError as e:
+        logger.warning("Could not publish engine health: %s", e)
+    publish_breakers()  # keeps this engine's breaker entry from ageing out of /health/ready
+
+
+def _process_changes(service, cal, events, is_full_sync, deadline):
+    """Processes one calendar's synced changes. Returns True if processed_ids changed."""
+    # Process masters/singles before instance-exceptions so a series'
+    # mirror exists before we adjust one of its occurrences. The
+    # exceptions are then applied together, grouped per series.
+    exceptions = [e for e in events if e.get('recurringEventId')]
+    events = [e for e in events if not e.get('recurringEventId')]
+    processed_changed = False
+    for event in events:
+        eid = event.get('id')
+        if not eid:
+            continue
+        try:
+            if _process_change(service, cal, event, is_full_sync, deadline):
+                processed_changed = True
+        except (DeadlineExceeded, CircuitOpen):
+            raise
+        except HttpError:
+            logger.warning("Skipping event %s for %s after final processing attempt failed...", eid, cal)
+            EVENTS_PROCESSED_FAILURE_TOTAL.labels(calendar_id=cal, reason='api_http_error').inc()
+            processed_ids.add(eid, cal, event_end_ts(event))
+            processed_changed = True
+            continue
+        except Exception as e_handle:
+            logger.error("❌ An unexpected error occurred while handling event %s: %s", eid, e_handle, exc_info=True)
+            EVENTS_PROCESSED_FAILURE_TOTAL.labels(calendar_id=cal, reason='unexpected_error').inc()
+            alert("Calendar Bot - UNEXPECTED Event Error", f"Calendar: {cal}\nEvent ID: {eid}\nError: {e_handle}",
+                  fingerprint=f"event_error:{cal}:{type(e_handle).__name__}")
+
+    # On a full sync no mirrors exist yet, so exceptions are a no-op there.
+    if exceptions and not is_full_sync:
+        try:
+            with span('apply_instance_exceptions', calendar_id=cal, count=len(exceptions)):
+                apply_instance_exceptions(service, cal, exceptions, deadline)
+        except (DeadlineExceeded, CircuitOpen):
+            raise
+        except Exception as e_exc:
+            logger.error("❌ Failed to apply recurring-instance exceptions for %s: %s", cal, e_exc, exc_info=True)
+            EVENTS_PROCESSED_FAILURE_TOTAL.labels(calendar_id=cal, reason='unexpected_error').inc()
+    return processed_changed
+
+
+def reconcile_mirrors_job():
+    """Keeps mirrors of non-organized events in sync with their sources
+    (moves/cancellations) and prunes long-past entries, one budgeted slice of
+    the sweep per run."""
+    try:
+        with span('reconcile'), flight_record('reconcile'), stage('reconcile'):
+            result = reconcile_mirrors(
+                build_calendar_service, MIRROR_RECONCILE_READS_TOTAL, calendars=_state_scope(),
+                max_seconds=RECONCILE_BUDGET_SECONDS, max_calls=RECONCILE_MAX_CALLS,
+            )
+    except Exception as e_mirror:
+        logger.error("❌ Mirror reconciliation failed: %s", e_mirror, exc_info=True)
+        _publish_flight_recorder()
+        return
+    MIRROR_RECONCILE_BACKLOG.set(result['backlog'])
+    _publish_propagation()
+    _publish_flight_recorder()
+    if result['sweep_seconds'] is not None:
+        MIRROR_RECONCILE_SWEEP_SECONDS.set(result['sweep_seconds'])
+        MIRROR_RECONCILE_SWEEP_COMPLETED.set_to_current_time()
+        logger.debug("🪞 Mirror reconciliation sweep completed in %.0fs.", result['sweep_seconds'])
+    else:
+        logger.info("🪞 Mirror reconciliation budget spent; %s mirrors left in this sweep.", result['backlog'])
+
+
+# --- Webhook Registration ---
+@retry(
+    # Ride out transient boot-time failures (e.g. DNS not ready, token-refresh
+    # network errors, Google 5xx/429) so a brief hiccup doesn't leave the
+    # calendar unwatched until the next restart.
+    retry=retry_if_exception_type((HttpError, TransportError, RequestException, OSError)),
+    wait=wait_exponential(multiplier=2, min=4, max=60),
+    stop=stop_after_attempt(5),
+    before_sleep=log_before_retry,
+    reraise=True
+)
+def _create_watch_channel(cal):
+    """Builds an authed service and creates a fresh watch channel for one calendar.
+
+    Retries transient network/API errors. Returns (service, watch_response).
+    """
+    service = build_calendar_service(_account_for(cal))
+    channel_body = {
+        'id': str(uuid.uuid4()),
+        'type': 'web_hook',
+        'address': GOOGLE_WEBHOOK_URL,
+        # Echoed back as X-Goog-Channel-Token, so the web tier can route the
+        # notification to the shard owning this calendar.
+        'token': cal,
+    }
+    response = service.events().watch(calendarId=cal, body=channel_body).execute()
+    return service, response
+
+
+def _channel_expiration(response):
+    """Returns the channel expiration as a UTC datetime, falling back to the
+    default TTL if Google didn't report one."""
+    exp_ms = response.get('expiration')
+    if exp_ms:
+        return datetime.fromtimestamp(int(exp_ms) / 1000, tz=timezone.utc)
+    return datetime.now(timezone.utc) + WEBHOOK_DEFAULT_TTL
+
+
+def _schedule_webhook_renewal(earliest_expiration, any_failure):
+    """(Re)schedules the self-perpetuating webhook renewal job.
+
+    Renews before the soonest channel expires; if any registration failed,
+    retries soon instead of waiting for expiry.
+    """
+    now = datetime.now(timezone.utc)
+    if any_failure:
+        next_run = now + WEBHOOK_RETRY_DELAY
+        reason = "retry after failure"
+    elif earliest_expiration:
+        next_run = earliest_expiration - WEBHOOK_RENEW_BUFFER
+        if next_run <= now:  # safety net; channels should outlive the buffer
+            next_run = now + WEBHOOK_RETRY_DELAY
+        reason = "scheduled renewal"
+    else:
+        next_run = now + WEBHOOK_DEFAULT_TTL - WEBHOOK_RENEW_BUFFER
+        reason = "default renewal"
+
+    scheduler.add_job(
+        register_webhooks, 'date', run_date=next_run,
+        id='webhook_renewal_job', replace_existing=True
+    )
+    logger.info("🗓️ Next webhook %s scheduled for %s.", reason, next_run.isoformat())
+
+
+@traced('register_webhooks')
+def register_webhooks():
+    """
+    Registers (or renews) a watch channel with Google for each watched calendar
+    and schedules the next renewal before the channels expire. This tells Google
+    where to send webhook notifications and keeps them alive indefinitely.
+    """
+    if not GOOGLE_WEBHOOK_URL:
+        logger.warning("🔗 GOOGLE_WEBHOOK_URL is not set. Skipping webhook registration.")
+        return
+
+    logger.info("🔗 Attempting to register/renew webhooks with Google...")
+    earliest_expiration = None
+    any_failure = False
+
+    for cal in watched_calendars():
+        try:
+            service, response = _create_watch_channel(cal)
+
+            # Stop the previous channel for this calendar so old channels don't
+            # keep firing duplicate notifications (and to avoid leaking quota).
+            old = active_channels.get(cal)
+            if old and old.get('resourceId'):
+                try:
+                    service.channels().stop(
+                        body={'id': old['id'], 'resourceId': old['resourceId']}
+                    ).execute()
+                    logger.info("🛑 Stopped previous webhook channel for %s.", cal)
+                except Exception as e:
+                    logger.warning("Could not stop previous channel for %s: %s", cal, e)
+
+            active_channels[cal] = {
+                'id': response.get('id'),
+                'resourceId': response.get('resourceId'),
+                'expiration': response.get('expiration'),
+                'registered_at': time.time(),
+            }
+            failed_registrations.discard(cal)
+
+            exp_dt = _channel_expiration(response)
+            if earliest_expiration is None or exp_dt < earliest_expiration:
+                earliest_expiration = exp_dt
+
+            logger.info("✅ Successfully registered webhook for %s at %s (expires %s).",
+                        cal, GOOGLE_WEBHOOK_URL, exp_dt.isoformat())
+            WEBHOOK_REGISTRATIONS_TOTAL.labels(calendar_id=cal, status='success').inc()
+        except Exception as e:
+            any_failure = True
+            failed_registrations.add(cal)
+            WEBHOOK_REGISTRATIONS_TOTAL.labels(calendar_id=cal, status='failure').inc()
+            if isinstance(e, CircuitOpen):
+                logger.warning("⏸️ Not registering webhook for %s: %s", cal, e)
+                continue
+            logger.error("❌ Failed to register webhook for %s: %s", cal, e, exc_info=True)
+            alert("Calendar Bot - CRITICAL Webhook Registration Failed", f"Could not register webhook for {cal}.\nError: {e}",
+                  fingerprint=f"webhook_registration:{cal}")
+
+    _schedule_webhook_renewal(earliest_expiration, any_failure)
+    retune_poll_interval()  # channel health changed
+    _publish_health()
+
+
+# --- Scheduling ---
+def trigger_immediate_poll():
+    """Runs the main poll job now."""
+    # Instead of adding a new job, modify the next_run_time
+    # of the existing 'poll_calendar_job' to be immediate.
+    # This ensures only one polling job is active/queued at a time,
+    # respecting the max_instances=1 set on 'poll_calendar_job'.
+    try:
+        scheduler.modify_job('poll_calendar_job', next_run_time=datetime.now(timezone.utc))
+        logger.info("Main poll_calendar job rescheduled for immediate execution.")
+    except Exception as e:
+        logger.error("Failed to reschedule main poll_calendar job immediately: %s", e, exc_info=True)
+        # As a fallback, you might still want to add a unique job if rescheduling fails often,
+        # but ideally, modify_job should work.
+        scheduler.add_job(poll_calendar, id=f'webhook_triggered_fallback_poll_{uuid.uuid4().hex}', replace_existing=False)
+        logger.warning("Added a fallback webhook-triggered poll job due to reschedule failure.")
+
+
+def _handle_forwarded_notification(message):
+    """Handles a notification pushed by the web tier over NOTIFY_SOCKET.
+
+    Every notification proves its channel delivers. 'poll' also syncs the
+    calendar now; 'channel_sync' is Google's handshake on a new channel.
+    'profile' and 'memory_snapshot' come from the admin routes instead and
+    arm the profiler or a tracemalloc snapshot diff.
+    """
+    if message.get('type') == 'profile':
+        _arm_profiler(message)
+        return
+    if message.get('type') == 'memory_snapshot':
+        try:
+            memory_diff.arm(message.get('id'))
+        except ValueError as e:
+            logger.warning("Ignoring memory snapshot request: %s", e)
+        return
+    cal = message.get('calendar_id')
+    now = time.time()
+    # Notifications from channels registered without a token can't be attributed.
+    for notified in ([cal] if cal else watched_calendars()):
+        last_notified[notified] = now
+    if message.get('type') == 'poll':
+        logger.info("📨 Poll request received from the web tier.")
+        trigger_immediate_poll()
+    elif message.get('type') == 'channel_sync':
+        logger.info("🤝 Watch channel handshake received for %s.", cal or 'a calendar')
+    else:
+        logger.warning("Ignoring unknown forwarded notification: %s", message)
+
+
+def _arm_profiler(message):
+    seconds = message.get('seconds')
+    try:
+        profiler.arm(message.get('id'), polls=message.get('polls'), seconds=seconds)
+    except ValueError as e:
+        logger.warning("Ignoring profile request: %s", e)
+        return
+    if seconds is not None and scheduler.running:
+        # Write the profile out when the window closes, even if no poll ends then.
+        scheduler.add_job(profiler.finish_if_due, id='profile_window_end', replace_existing=True,
+                          run_date=datetime.now(timezone.utc) + timedelta(seconds=seconds))
+
+
+# --- Sharding ---
+def _stop_channel(cal):
+    channel = active_channels.pop(cal, None)
+    if not channel or not channel.get('resourceId'):
+        return
+    try:
+        build_calendar_service(_account_for(cal)).channels().stop(
+            body={'id': channel['id'], 'resourceId': channel['resourceId']}
+        ).execute()
+        logger.info("🛑 Stopped webhook channel for %s (calendar moved to another shard).", cal)
+    except Exception as e:
+        logger.warning("Could not stop channel for %s: %s", cal, e)
+
+
+def shard_heartbeat():
+    """Renews this shard's leases and adopts/hands off calendars on rebalance."""
+    gained, lost = shard.heartbeat()
+
+    for cal in lost:
+        _stop_channel(cal)
+        processed_ids.discard_calendars([cal])
+        last_synced.pop(cal, None)
+        last_poll_started.pop(cal, None)
+        last_notified.pop(cal, None)
+        failed_registrations.discard(cal)
+        pacing.forget(cal)
+        with contextlib.suppress(KeyError):
+            POLL_INTERVAL_SECONDS.remove(cal)
+        SHARD_OWNED_CALENDARS.labels(instance=INSTANCE_ID, calendar_id=cal).set(0)
+    if gained:
+        # Adopt the previous owner's processed IDs for these calendars, and the
+        # global ones (migrated without a calendar) every shard keeps.
+        processed_ids.update({
+            eid: meta for eid, meta in load_processed().items()
+            if meta.get('calendar_id') in gained or meta.get('calendar_id') is None
+        })
+        for cal in gained:
+            SHARD_OWNED_CALENDARS.labels(instance=INSTANCE_ID, calendar_id=cal).set(1)
+        if scheduler.running:
+            # Watch the new calendars and sync them without waiting for the next interval.
+            scheduler.add_job(register_webhooks, id='shard_webhook_registration', replace_existing=True)
+            trigger_immediate_poll()
+    if gained or lost:
+        PROCESSED_EVENT_IDS_COUNT.set(len(processed_ids))
+
+    now = datetime.now(timezone.utc).timestamp()
+    for cal in owned_calendars():
+        if cal in last_synced:
+            CALENDAR_SYNC_LAG_SECONDS.labels(calendar_id=cal).set(now - last_synced[cal])
+
+
+def start():
+    """Loads state, starts the scheduler and begins accepting notifications.
+    Called once, in whichever process holds the leader lock (or, when
+    SHARDING, in every instance)."""
+    global shard
+    get_router()  # compile the routing table now, so a bad ROUTING_FILE fails at startup
+    notify_socket = NOTIFY_SOCKET
+    migrate_processed()
+    # Replaces the entry a previous run left, which may still show a breaker open.
+    set_breaker_instance(INSTANCE_ID if SHARDING else 'engine')
+    publish_breakers()
+    if SHARDING:
+        notify_socket = NOTIFY_SOCKET.with_name(f"engine-{INSTANCE_ID}.sock")
+        # Target calendars are leased too, so exactly one shard syncs each for drift.
+        shard = ShardCoordinator(INSTANCE_ID, SOURCE_CALENDARS + target_calendars(), notify_socket)
+        shard_heartbeat()  # takes initial leases and loads their processed IDs
+        scheduler.add_job(shard_heartbeat, 'interval', seconds=max(LEASE_TTL_SECONDS // 3, 1),
+                          id='shard_heartbeat_job', max_instances=1)
+    else:
+        processed_ids.update(load_processed())
+    PROCESSED_EVENT_IDS_COUNT.set(len(processed_ids))
+    logger.info("📂 Loaded %s processed event IDs.", len(processed_ids))
+
+    # Configure and start the scheduler
+    # Starts at POLL_INTERVAL_MINUTES; retune_poll_interval() adapts it after each poll.
+    scheduler.add_job(poll_calendar, 'interval', minutes=POLL_INTERVAL_MINUTES, id='poll_calendar_job', max_instances=1)
+    scheduler.add_job(poll_calendar, id='initial_startup_poll', run_date=datetime.now(timezone.utc), replace_existing=True)
+    scheduler.add_job(reconcile_mirrors_job, 'interval', minutes=RECONCILE_INTERVAL_MINUTES,
+                      id='reconcile_mirrors_job', max_instances=1)
+    scheduler.add_job(send_daily_health_report, 'cron', hour=7, id='daily_health_email_job', replace_existing=True)
+    scheduler.add_job(clean_processed_events_list, 'cron', day_of_week='sun', hour=3, id='weekly_memory_clean_job', replace_existing=True)
+    scheduler.add_job(register_webhooks, id='initial_webhook_registration', run_date=datetime.now(timezone.utc) + timedelta(seconds=10))
+    job_monitor.attach(scheduler)
+    scheduler.start()
+    serve_notifications(_handle_forwarded_notification, socket_path=notify_socket)
+    logger.info(
+        "🧠 Sync engine started (pid %s). Polling every %s minutes, adapting between %s and %s.",
+        os.getpid(), POLL_INTERVAL_MINUTES, POLL_INTERVAL_MIN_MINUTES, POLL_INTERVAL_MAX_MINUTES,
+    )
+
+
+def main():
+    """Entry point for the standalone engine process (`python -m engine`)."""
+    if DEBUG_LOGGING:
+        logger.setLevel(logging.DEBUG)
+        logger.debug("🐛 Debug logging enabled.")
+    if ENGINE_METRICS_PORT:
+        start_http_server(ENGINE_METRICS_PORT)
+        logger.info("📈 Engine metrics served on port %s.", ENGINE_METRICS_PORT)
+
+    stopping = threading.Event()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(sig, lambda *_: stopping.set())
+
+    if SHARDING:
+        # Every instance runs, each on the calendars it holds leases for.
+        election = None
+        start()
+    else:
+        # A second engine (or an embedded one) waits as a hot standby.
+        election = LeaderElection(LEADER_LOCK_FILE, on_elected=start)
+        election.start()
+    stopping.wait()
+
+    logger.info("🛑 Sync engine shutting down...")
+    if election:
+        election.stop()
+    if scheduler.running:
+        scheduler.shutdown(wait=True)
+    if shard:
+        shard.leave()  # hand our calendars over now rather than after the lease TTL
+        publish_status('health', {INSTANCE_ID: None})  # a departed shard isn't a stalled one
+        publish_status('breakers', {INSTANCE_ID: None})
+        publish_status('propagation', {INSTANCE_ID: None})
+
+
+if __name__ == '__main__':
+    main()
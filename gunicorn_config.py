@@ -1,11 +1,32 @@
 # gunicorn_config.py
 import os
+import shutil
 
 bind = "0.0.0.0:5000"
-workers = 1
+# Any number of workers is safe: one is elected leader and runs the scheduler,
+# the others serve HTTP and forward webhook notifications to it.
+workers = int(os.getenv("GUNICORN_WORKERS", "1"))
 worker_class = "gevent"
 timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
 # Optional:
 accesslog = '-' # Log to stdout
 errorlog = '-'  # Log to stdout
 loglever = 'info'
+
+# With more than one worker, Prometheus metrics must be aggregated across
+# processes: each worker writes its samples under PROMETHEUS_MULTIPROC_DIR and
+# /metrics merges them. The variable must be set before gunicorn starts.
+PROMETHEUS_MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+
+
+def on_starting(server):
+    # Clear samples left over from a previous run.
+    if PROMETHEUS_MULTIPROC_DIR:
+        shutil.rmtree(PROMETHEUS_MULTIPROC_DIR, ignore_errors=True)
+        os.makedirs(PROMETHEUS_MULTIPROC_DIR, exist_ok=True)
+
+
+def child_exit(server, worker):
+    if PROMETHEUS_MULTIPROC_DIR:
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
@@ -12,7 +12,9 @@ from utils.email_utils import send_error_email
 
 # --- Configuration ---
 # Internal Docker network URL for your calendar_bot's health endpoint
-CALENDAR_BOT_HEALTH_URL = "http://calendar_bot:5000/health" # calendar_bot is the service name, 5000 is internal port
+# Readiness, not liveness: 503 when the engine has stalled, a calendar is overdue,
+# a watch channel lapsed or a circuit breaker is open.
+CALENDAR_BOT_HEALTH_URL = "http://calendar_bot:5000/health/ready" # calendar_bot is the service name, 5000 is internal port
 MONITOR_INTERVAL_SECONDS = int(os.getenv("MONITOR_INTERVAL_SECONDS", "60")) # Check every 60 seconds by default
 STATUS_FILE_PATH = os.getenv("MONITOR_STATUS_FILE", "/app/status/monitor_status.json")
 
@@ -51,7 +53,7 @@ def monitor_health():
             logger.info(f"🩺 Pinging Calendar Bot health endpoint: {CALENDAR_BOT_HEALTH_URL}...")
             response = requests.get(CALENDAR_BOT_HEALTH_URL, timeout=10) # 10-second timeout
 
-            if response.status_code == 200 and response.text == "OK":
+            if response.status_code == 200:
                 if current_bot_status != "UP":
                     logger.info("✅ Calendar Bot is now UP.")
                     send_error_email(
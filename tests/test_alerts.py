@@ -0,0 +1,72 @@
+# ~/calendar_bot/tests/test_alerts.py
+from prometheus_client import REGISTRY
+
+from utils.alerts import AlertPipeline
+
+
+def _alerts(outcome):
+    return REGISTRY.get_sample_value('calendar_bot_alerts_total', {'outcome': outcome}) or 0
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def _pipeline(clock, sent, **kwargs):
+    def send(subject, body):
+        sent.append((subject, body))
+        return True
+    return AlertPipeline(send=send, digest_seconds=60, clock=clock, wall_clock=clock, **kwargs)
+
+
+def test_storm_of_one_failure_becomes_one_digest(monkeypatch):
+    clock, sent = FakeClock(), []
+    pipeline = _pipeline(clock, sent)
+    monkeypatch.setattr(pipeline, '_ensure_worker', lambda: None)
+    suppressed_before = _alerts('suppressed')
+
+    for i in range(50):
+        pipeline.submit("Event Error", f"Event ID: evt{i}\nError: 503", fingerprint='event_error:a@x.com:HttpError')
+    pipeline.submit("Webhook Registration Failed", "a@x.com", fingerprint='webhook_registration:a@x.com')
+    pipeline.run_once()
+    assert sent == [] and pipeline.depth() == 51  # waiting for the digest window
+
+    clock.now += 60
+    pipeline.run_once()
+    [(subject, body)] = sent
+    assert subject == "Calendar Bot - 51 alerts (2 distinct)"
+    assert "[×50] Event Error" in body and "evt0" in body and "evt49" not in body and "(+47 more like these)" in body
+    assert _alerts('suppressed') - suppressed_before == 49
+    assert pipeline.depth() == 0
+
+
+def test_single_alert_keeps_its_subject_and_hourly_limit_defers(monkeypatch):
+    clock, sent = FakeClock(), []
+    pipeline = _pipeline(clock, sent, max_emails_per_hour=1)
+    monkeypatch.setattr(pipeline, '_ensure_worker', lambda: None)
+
+    pipeline.submit("Polling Error", "Calendar: a@x.com")
+    clock.now += 60
+    pipeline.run_once()
+    assert sent == [("Polling Error", "Calendar: a@x.com")]
+
+    pipeline.submit("Polling Error", "Calendar: b@x.com")
+    clock.now += 60
+    pipeline.run_once()
+    assert len(sent) == 1  # over the limit: held, not dropped
+    clock.now += 3600
+    pipeline.run_once()
+    assert sent[1] == ("Polling Error", "Calendar: b@x.com")
+
+
+def test_submit_never_blocks_on_a_full_queue(monkeypatch):
+    pipeline = _pipeline(FakeClock(), [], queue_size=1)
+    monkeypatch.setattr(pipeline, '_ensure_worker', lambda: None)
+    dropped_before = _alerts('dropped')
+    pipeline.submit("a", "1")
+    pipeline.submit("b", "2")
+    assert _alerts('dropped') - dropped_before == 1
@@ -1,17 +1,22 @@
 # ~/calendar_bot/tests/test_app.py
 
 import pytest
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch
 
 # Import the Flask app object from your main application file
-import app as app_module
-from app import app as flask_app, _process_change
+from app import app as flask_app
 
 @pytest.fixture()
 def app():
     """Create a testable instance of the Flask app."""
     yield flask_app
 
+@pytest.fixture(autouse=True)
+def no_health_cache():
+    """Let each test's patched read_status through the /health cache."""
+    with patch('app.HEALTH_CACHE_SECONDS', 0):
+        yield
+
 @pytest.fixture()
 def client(app):
     """Create a test client to make simulated web requests."""
@@ -21,13 +26,131 @@ def test_health_endpoint(client):
     """
     Tests if the /health endpoint is reachable and returns the correct response.
     """
-    # Act: Send a GET request to the /health endpoint
-    response = client.get('/health')
+    # Act: Send a GET request to the /health endpoint (with nothing published
+    # by the engine, which the app import may have started in the background)
+    with patch('app.read_status', return_value={}):
+        response = client.get('/health')
     
     # Assert: Check for a successful status code and the expected body
     assert response.status_code == 200
     assert response.data == b'OK'
 
+def test_health_lists_open_breakers(client):
+    now = 1_000_000.0
+    status = {'breakers': {
+        'engine-1': {'published': now - 60, 'breakers': {'sendgrid': {'state': 'closed'},
+                                                         'calendar:a@example.com': {'state': 'open'}}},
+        'engine-2': {'published': now - 60, 'breakers': {'calendar:a@example.com': {'state': 'closed'}}},
+        # A departed instance, and an entry from before breakers were keyed by instance.
+        'engine-0': {'published': now - 200_000, 'breakers': {'uptime_kuma': {'state': 'open'}}},
+        'sendgrid': {'state': 'open', 'opened_at': now - 300_000},
+    }}
+    with patch('app.read_status', return_value=status), patch('app.time.time', return_value=now):
+        response = client.get('/health')
+    assert response.status_code == 200
+    assert response.data == b'OK\nbreaker calendar:a@example.com open'
+
+def test_health_reports_propagation_quantiles(client):
+    now = 1_000_000.0
+    status = {'propagation': {
+        'engine-1': {'published': now - 60, 'triggers': {'webhook': {'p50': 4.0, 'p95': 30.0, 'count': 9},
+                                                        'poll': None}},
+        'engine-2': {'published': now - 60, 'triggers': {'webhook': {'p50': 5.0, 'p95': 12.0, 'count': 3}}},
+        'engine-0': {'published': now - 200_000, 'triggers': {'poll': {'p50': 1.0, 'p95': 1.0, 'count': 1}}},
+    }}
+    with patch('app.read_status', return_value=status), patch('app.time.time', return_value=now):
+        response = client.get('/health')
+    assert response.data == b'OK\npropagation webhook p50=4.2s p95=30.0s n=12'
+
+def test_health_lists_last_job_outcomes(client):
+    jobs = {'jobs': {'engine': {'poll_calendar_job': {'outcome': 'skipped', 'at': 1000.0}}}}
+    with patch('app.read_status', return_value=jobs), patch('app.time.time', return_value=1042.0):
+        response = client.get('/health')
+    assert response.data == b'OK\njob poll_calendar_job skipped 42s ago'
+
+def test_liveness_is_constant_and_readiness_judges_the_engine(client):
+    now = 1_000_000.0
+    snapshot = {
+        'published': now - 60, 'stale_after': now + 600, 'webhooks': True, 'channels_pending': 0,
+        'calendars': {
+            'a@x.com': {'last_sync': now - 60, 'max_sync_age': 900, 'retry_pending': False,
+                        'watched': True, 'channel_expires': now + 86400},
+        },
+    }
+    with patch('app.read_status', return_value={}):
+        assert client.get('/health/live').data == b'OK'
+        assert client.get('/health/ready').status_code == 503
+
+    with patch('app.read_status', return_value={'health': {'engine': snapshot}}), \
+         patch('app.time.time', return_value=now):
+        ready = client.get('/health/ready')
+        assert ready.status_code == 200
+        assert ready.get_json()['engines']['engine']['calendars']['a@x.com'] == {
+            'last_sync_age': 60, 'channel_expires_in': 86400, 'retry_pending': False,
+        }
+        assert client.get('/health').data == b'OK\ncalendar a@x.com synced 60s ago, channel expires in 86400s'
+
+    # Scheduler stalled: nothing republished for an hour, and the channel has lapsed.
+    with patch('app.read_status', return_value={'health': {'engine': snapshot}}), \
+         patch('app.time.time', return_value=now + 90000), \
+         patch('utils.health.HEALTH_ENGINE_EXPIRY_SECONDS', 100000):
+        ready = client.get('/health/ready')
+    assert ready.status_code == 503
+    assert ready.get_json()['problems'] == [
+        'engine engine has not published since 90060s ago',
+        'a@x.com has not synced for 90060s',
+        'a@x.com has no live watch channel',
+    ]
+
+def test_readiness_drops_engines_gone_past_the_expiry(client):
+    now = 1_000_000.0
+    live = {'published': now - 60, 'stale_after': now + 600, 'calendars': {}}
+    gone = {'published': now - 200_000, 'stale_after': now - 199_000, 'calendars': {'b@x.com': {'max_sync_age': 900}}}
+    with patch('app.read_status', return_value={'health': {'engine-1': live, 'engine-0': gone}}), \
+         patch('app.time.time', return_value=now):
+        ready = client.get('/health/ready')
+        assert ready.status_code == 200
+        assert list(ready.get_json()['engines']) == ['engine-1']
+        assert client.get('/health').data == b'OK'
+
+    with patch('app.read_status', return_value={'health': {'engine-0': gone}}), \
+         patch('app.time.time', return_value=now):
+        assert client.get('/health/ready').get_json()['problems'] == ['no engine has published its status']
+
+def test_debug_polls_serves_the_flight_recorder_when_enabled(client):
+    runs = {'engine': [{'kind': 'poll', 'duration': 1.5}]}
+    assert client.get('/debug/polls').status_code == 404
+    with patch('app.DEBUG_ENDPOINTS', True), patch('app.read_runs', return_value=runs):
+        response = client.get('/debug/polls')
+    assert response.status_code == 200
+    assert response.get_json() == runs
+
+def test_admin_profile_requires_the_token_and_arms_the_engine(client, tmp_path):
+    assert client.post('/admin/profile').status_code == 404  # no ADMIN_TOKEN configured
+    with patch('app.ADMIN_TOKEN', 's3cret'), patch('app.forward_to_leader') as mock_forward:
+        assert client.post('/admin/profile', headers={'Authorization': 'Bearer wrong'}).status_code == 401
+        auth = {'Authorization': 'Bearer s3cret'}
+        assert client.post('/admin/profile?polls=0', headers=auth).status_code == 400
+        response = client.post('/admin/profile?polls=3', headers=auth)
+        assert response.status_code == 202
+        profile_id = response.get_json()['id']
+        mock_forward.assert_called_once_with({'type': 'profile', 'id': profile_id, 'polls': 3, 'seconds': None})
+
+        with patch('utils.profiling.PROFILE_DIR', tmp_path):
+            assert client.get(f'/admin/profile/{profile_id}', headers=auth).get_json() == {'state': 'pending'}
+            (tmp_path / f'{profile_id}.json').write_text('{"state": "done", "polls": 3}')
+            (tmp_path / f'{profile_id}.collapsed').write_text('poll;sync 42\n')
+            response = client.get(f'/admin/profile/{profile_id}?format=collapsed', headers=auth)
+            assert response.status_code == 200
+            assert response.data == b'poll;sync 42\n'
+            assert client.get('/admin/profile/..%2Fsecrets', headers=auth).status_code == 404
+
+def test_admin_memory_arms_a_snapshot_diff(client):
+    with patch('app.ADMIN_TOKEN', 's3cret'), patch('app.forward_to_leader') as mock_forward:
+        response = client.post('/admin/memory', headers={'Authorization': 'Bearer s3cret'})
+    assert response.status_code == 202
+    mock_forward.assert_called_once_with({'type': 'memory_snapshot', 'id': response.get_json()['id']})
+
 def test_metrics_endpoint(client):
     """
     Tests if the /metrics endpoint is working and exposing Prometheus metrics.
@@ -39,100 +162,36 @@ def test_metrics_endpoint(client):
     assert response.status_code == 200
     assert b'calendar_bot_polls_initiated_total' in response.data
 
-@pytest.fixture()
-def clean_processed_ids():
-    """Snapshot and restore app.processed_ids around a test."""
-    saved = set(app_module.processed_ids)
-    app_module.processed_ids.clear()
-    yield app_module.processed_ids
-    app_module.processed_ids.clear()
-    app_module.processed_ids.update(saved)
-
-
-def test_process_change_cancelled_removes_mirror_and_clone(clean_processed_ids):
-    clean_processed_ids.add('evt1')
-    event = {'id': 'evt1', 'status': 'cancelled'}
-    with patch('app.remove_mirror') as mock_remove, patch('app.remove_clone') as mock_clone, \
-         patch('app.handle_event') as mock_handle:
-        changed = _process_change(MagicMock(), 'cal@x.com', event, is_full_sync=False)
-    mock_remove.assert_called_once()
-    mock_clone.assert_called_once()
-    mock_handle.assert_not_called()
-    assert 'evt1' not in clean_processed_ids
-    assert changed is True
-
-
-def test_process_change_routes_exception_to_mirror(clean_processed_ids):
-    event = {'id': 'm1_i', 'recurringEventId': 'm1', 'status': 'cancelled',
-             'originalStartTime': {'dateTime': '2030-01-01T09:00:00Z'}}
-    with patch('app.apply_instance_exception') as mock_exc, patch('app.handle_event') as mock_handle:
-        _process_change(MagicMock(), 'cal@x.com', event, is_full_sync=False)
-    mock_exc.assert_called_once()
-    mock_handle.assert_not_called()
-
-
-def test_process_change_skips_exception_on_full_sync(clean_processed_ids):
-    event = {'id': 'm1_i', 'recurringEventId': 'm1',
-             'originalStartTime': {'dateTime': '2030-01-01T09:00:00Z'}}
-    with patch('app.apply_instance_exception') as mock_exc:
-        _process_change(MagicMock(), 'cal@x.com', event, is_full_sync=True)
-    mock_exc.assert_not_called()
-
-
-def test_process_change_clones_new_birthday_incremental(clean_processed_ids):
-    event = {'id': 'b1', 'eventType': 'birthday'}
-    with patch('app.handle_event') as mock_handle:
-        changed = _process_change(MagicMock(), 'cal@x.com', event, is_full_sync=False)
-    mock_handle.assert_called_once()
-    assert 'b1' in clean_processed_ids
-    assert changed is True
-
-
-def test_process_change_seeds_birthday_on_full_sync(clean_processed_ids):
-    # Full sync must not backfill-clone pre-existing birthdays, only seed them.
-    event = {'id': 'b1', 'eventType': 'birthday'}
-    with patch('app.handle_event') as mock_handle:
-        changed = _process_change(MagicMock(), 'cal@x.com', event, is_full_sync=True)
-    mock_handle.assert_not_called()
-    assert 'b1' in clean_processed_ids
-    assert changed is True
-
-
-def test_process_change_skips_already_cloned(clean_processed_ids):
-    clean_processed_ids.add('b1')
-    event = {'id': 'b1', 'eventType': 'birthday'}
-    with patch('app.handle_event') as mock_handle:
-        changed = _process_change(MagicMock(), 'cal@x.com', event, is_full_sync=False)
-    mock_handle.assert_not_called()
-    assert changed is False
-
-
-def test_process_change_skips_invite_on_full_sync(clean_processed_ids):
-    event = {'id': 'r1', 'eventType': 'default'}
-    with patch('app.handle_event') as mock_handle:
-        _process_change(MagicMock(), 'cal@x.com', event, is_full_sync=True)
-    mock_handle.assert_not_called()
-
-
-def test_process_change_acts_on_invite_incremental(clean_processed_ids):
-    event = {'id': 'r1', 'eventType': 'default'}
-    with patch('app.handle_event') as mock_handle:
-        _process_change(MagicMock(), 'cal@x.com', event, is_full_sync=False)
-    mock_handle.assert_called_once()
-
-
-def test_webhook_triggers_poll(client):
+def test_webhook_forwards_poll_to_engine(client):
     """
-    Tests if a valid webhook POST request correctly triggers an immediate poll.
-    We use a 'patch' to mock the scheduler so we can check if it was called.
+    Tests if a valid webhook POST request is pushed to the sync engine as an
+    immediate-poll notification.
     """
-    # Arrange: Mock the scheduler object within the 'app' module
-    with patch('app.scheduler') as mock_scheduler:
-        headers = {'X-Goog-Resource-State': 'exists'}
-        
-        # Act: Send a POST request to the /webhook endpoint with the required header
-        response = client.post('/webhook', headers=headers)
-        
-        # Assert: Check for a successful response and verify the scheduler was told to run the job
-        assert response.status_code == 200
-        mock_scheduler.modify_job.assert_called_once()
+    with patch('app.forward_to_leader') as mock_forward:
+        response = client.post('/webhook', headers={'X-Goog-Resource-State': 'exists',
+                                                    'X-Goog-Channel-Token': 'cal@x.com'})
+    assert response.status_code == 200
+    mock_forward.assert_called_once_with({'type': 'poll', 'calendar_id': 'cal@x.com'})
+
+
+def test_webhook_forwards_sync_handshake(client):
+    with patch('app.forward_to_leader') as mock_forward:
+        client.post('/webhook', headers={'X-Goog-Resource-State': 'sync',
+                                         'X-Goog-Channel-Token': 'cal@x.com'})
+    mock_forward.assert_called_once_with({'type': 'channel_sync', 'calendar_id': 'cal@x.com'})
+
+
+def test_webhook_ignores_other_states(client):
+    with patch('app.forward_to_leader') as mock_forward:
+        response = client.post('/webhook', headers={'X-Goog-Resource-State': 'not_exists'})
+    assert response.status_code == 200
+    mock_forward.assert_not_called()
+
+
+def test_webhook_routes_to_owning_shard(client):
+    with patch('app.SHARDING', True), patch('app.owner_socket', return_value='data/engine-a.sock'), \
+         patch('app.forward_to_leader') as mock_forward:
+        client.post('/webhook', headers={'X-Goog-Resource-State': 'exists',
+                                         'X-Goog-Channel-Token': 'cal@x.com'})
+    mock_forward.assert_called_once_with({'type': 'poll', 'calendar_id': 'cal@x.com'},
+                                         socket_path='data/engine-a.sock')
@@ -0,0 +1,113 @@
+# ~/calendar_bot/tests/test_breaker.py
+import json
+
+import pytest
+from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
+from googleapiclient.http import HttpMockSequence
+
+from utils import breaker as breaker_module, status
+from utils.breaker import CircuitBreaker, CircuitOpen, CLOSED, HALF_OPEN, OPEN, get_breaker, publish_breakers
+from utils.google_utils import _request_builder
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture(autouse=True)
+def status_file(tmp_path, monkeypatch):
+    path = tmp_path / 'engine_status.json'
+    monkeypatch.setattr(status, 'STATUS_FILE', path)
+    monkeypatch.setattr(breaker_module, '_announced', {})
+    return path
+
+
+def _fail(breaker, times=1):
+    for _ in range(times):
+        with pytest.raises(RuntimeError):
+            with breaker.guard():
+                raise RuntimeError("down")
+
+
+def test_trips_after_consecutive_failures_and_short_circuits():
+    breaker = CircuitBreaker('dep', failure_threshold=3, reset_timeout=60, clock=_Clock())
+    _fail(breaker, 2)
+    with breaker.guard():
+        pass  # a success resets the count
+    _fail(breaker, 3)
+    assert breaker.state == OPEN
+    with pytest.raises(CircuitOpen):
+        with breaker.guard():
+            pytest.fail("an open breaker must not run the call")
+
+
+def test_half_open_probe_closes_or_reopens_with_backoff(status_file):
+    clock = _Clock()
+    breaker = CircuitBreaker('dep', failure_threshold=1, reset_timeout=60, max_reset_timeout=100, clock=clock)
+    _fail(breaker)
+    assert json.loads(status_file.read_text())['breakers'][breaker_module._instance]['breakers']['dep']['state'] == OPEN
+
+    clock.now = 60
+    _fail(breaker)  # the probe fails: open again, for twice as long (capped)
+    clock.now = 150
+    with pytest.raises(CircuitOpen):
+        breaker.before_call()
+    clock.now = 160
+    breaker.before_call()  # the probe
+    assert breaker.state == HALF_OPEN
+    with pytest.raises(CircuitOpen):
+        breaker.before_call()  # only one probe at a time
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    assert json.loads(status_file.read_text())['breakers'][breaker_module._instance]['breakers']['dep']['state'] == CLOSED
+
+
+def test_transitions_are_published_outside_the_lock(monkeypatch):
+    breaker = CircuitBreaker('dep', failure_threshold=1, clock=_Clock())
+    held = []
+    monkeypatch.setattr('utils.breaker.publish_status', lambda *args: held.append(breaker._lock.locked()))
+    _fail(breaker)
+    breaker.record_success()
+    assert held == [False, False]
+
+
+def test_breakers_are_published_per_instance_and_closed_on_creation(status_file, monkeypatch):
+    monkeypatch.setattr(breaker_module, '_breakers', {})
+    # What a previous run of this engine left: a breaker stuck open.
+    status.publish_status('breakers', {'engine': {'published': 0, 'breakers': {'sendgrid': {'state': OPEN}}}})
+    status.publish_status('breakers', {'engine-2': {'published': 0, 'breakers': {}}})
+    monkeypatch.setattr(breaker_module, '_instance', 'engine')
+
+    publish_breakers()  # engine start
+    assert status.read_status()['breakers']['engine']['breakers'] == {}
+    get_breaker('sendgrid')
+    entries = status.read_status()['breakers']
+    assert entries['engine']['breakers'] == {'sendgrid': {'state': CLOSED, 'opened_at': None}}
+    assert 'engine-2' in entries  # other instances' entries are left alone
+
+
+def test_calendar_requests_count_only_outages_as_failures():
+    breaker = CircuitBreaker('calendar:a@example.com', failure_threshold=2, clock=_Clock())
+    http = HttpMockSequence([
+        ({'status': '404'}, b'{}'),
+        ({'status': '404'}, b'{}'),
+        ({'status': '503'}, b'{}'),
+        ({'status': '503'}, b'{}'),
+    ])
+    service = build('calendar', 'v3', http=http, requestBuilder=_request_builder(breaker), static_discovery=True)
+
+    for _ in range(2):  # "no such event" is an answer, not an outage
+        with pytest.raises(HttpError):
+            service.events().get(calendarId='a', eventId='x').execute()
+    assert breaker.state == CLOSED
+    for _ in range(2):
+        with pytest.raises(HttpError):
+            service.events().get(calendarId='a', eventId='x').execute()
+    assert breaker.state == OPEN
+    with pytest.raises(CircuitOpen):
+        service.events().get(calendarId='a', eventId='x').execute()
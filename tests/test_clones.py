@@ -1,8 +1,20 @@
 # ~/calendar_bot/tests/test_clones.py
 from unittest.mock import MagicMock, patch
 
+import pytest
+
 from utils import clones
-from utils.clones import record_clone, remove_clone
+from utils.clones import record_clone, remove_clone, forget_deleted_clones, _key
+
+SRC1 = _key('cal@x.com', 'src1')
+SRC2 = _key('cal@x.com', 'src2')
+
+
+@pytest.fixture(autouse=True)
+def fresh_index(tmp_path):
+    # Tests stub load_clone_map; start each one without a cached index.
+    with patch.object(clones, 'CLONE_FILE', tmp_path / 'clones.json'), patch.object(clones, '_index', None):
+        yield
 
 
 def test_record_clone_persists_mapping():
@@ -10,12 +22,12 @@ def test_record_clone_persists_mapping():
          patch.object(clones, 'save_clone_map') as save:
         record_clone('cal@x.com', 'src1', 'clone1')
     saved = save.call_args.args[0]
-    assert saved['cal@x.com::src1']['clone_id'] == 'clone1'
+    assert saved[SRC1]['clone_id'] == 'clone1'
 
 
 def test_remove_clone_deletes_and_forgets():
     service = MagicMock()
-    cmap = {'cal@x.com::src1': {'clone_id': 'clone1'}}
+    cmap = {SRC1: {'clone_id': 'clone1'}}
     with patch.object(clones, 'load_clone_map', return_value=cmap), \
          patch.object(clones, 'save_clone_map') as save:
         remove_clone(service, 'cal@x.com', 'src1')
@@ -25,6 +37,34 @@ def test_remove_clone_deletes_and_forgets():
     assert save.call_args.args[0] == {}  # mapping entry removed
 
 
+def test_record_clone_keys_one_entry_per_target():
+    with patch.object(clones, 'load_clone_map', return_value={}), \
+         patch.object(clones, 'save_clone_map') as save:
+        record_clone('cal@x.com', 'src1', 'clone1', ('a@x.com', 'b@x.com'))
+    saved = save.call_args.args[0]
+    assert set(saved) == {_key('cal@x.com', 'src1', 'a@x.com'), _key('cal@x.com', 'src1', 'b@x.com')}
+
+
+def test_remove_clone_deletes_shared_clone_once_for_all_targets():
+    service = MagicMock()
+    cmap = {
+        _key('cal@x.com', 'src1', 'a@x.com'): {'clone_id': 'clone1'},
+        _key('cal@x.com', 'src1', 'b@x.com'): {'clone_id': 'clone1'},
+    }
+    with patch.object(clones, 'load_clone_map', return_value=cmap), \
+         patch.object(clones, 'save_clone_map') as save:
+        remove_clone(service, 'cal@x.com', 'src1')
+    assert service.events().delete.call_count == 1
+    assert save.call_args.args[0] == {}
+
+
+def test_load_clone_map_migrates_legacy_keys(tmp_path):
+    legacy_file = tmp_path / 'clones.json'
+    legacy_file.write_text('{"cal@x.com::src1": {"clone_id": "clone1"}}')
+    with patch.object(clones, 'CLONE_FILE', legacy_file):
+        assert clones.load_clone_map() == {SRC1: {'clone_id': 'clone1'}}
+
+
 def test_remove_clone_noop_when_untracked():
     service = MagicMock()
     with patch.object(clones, 'load_clone_map', return_value={}), \
@@ -32,3 +72,28 @@ def test_remove_clone_noop_when_untracked():
         remove_clone(service, 'cal@x.com', 'src1')
     service.events().delete.assert_not_called()
     save.assert_not_called()
+
+
+def test_forget_deleted_clones_drops_only_cancelled_clones():
+    cmap = {SRC1: {'clone_id': 'clone1'}, SRC2: {'clone_id': 'clone2'}}
+    with patch.object(clones, 'load_clone_map', return_value=cmap), \
+         patch.object(clones, 'save_clone_map') as save:
+        dropped = forget_deleted_clones([
+            {'id': 'clone1', 'status': 'cancelled'},
+            {'id': 'clone2', 'status': 'confirmed'},
+        ])
+    assert dropped == 1
+    assert list(save.call_args.args[0]) == [SRC2]
+
+
+def test_index_looks_clones_up_without_rescanning():
+    record_clone('cal@x.com', 'src1', 'clone1', ('a@x.com', 'b@x.com'))
+    record_clone('cal@x.com', 'src2', 'clone2')
+    with patch.object(clones, 'load_clone_map', side_effect=AssertionError("reloaded")):
+        assert forget_deleted_clones([{'id': 'clone1', 'status': 'cancelled'}], 'a@x.com') == 1
+        index = clones.clone_index()
+        assert index.keys_for_source('cal@x.com', 'src1') == [_key('cal@x.com', 'src1', 'b@x.com')]
+        assert index.keys_for_clone('clone1', 'a@x.com') == []
+        remove_clone(MagicMock(), 'cal@x.com', 'src2')
+        assert len(clones.clone_index()) == 1
+    assert clones.load_clone_map() == {_key('cal@x.com', 'src1', 'b@x.com'): {'clone_id': 'clone1'}}
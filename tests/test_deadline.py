@@ -0,0 +1,45 @@
+# ~/calendar_bot/tests/test_deadline.py
+import pytest
+from tenacity import retry, stop_after_attempt, wait_fixed
+
+from utils.deadline import Deadline, DeadlineExceeded, stop_at_deadline
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_timeout_is_capped_by_time_remaining():
+    clock = _Clock()
+    deadline = Deadline(30, clock=clock)
+    assert deadline.timeout(10) == 10
+    clock.now = 25
+    assert deadline.timeout(10) == 5
+
+
+def test_check_raises_once_expired():
+    clock = _Clock()
+    deadline = Deadline(5, clock=clock)
+    deadline.check()
+    clock.now = 5
+    with pytest.raises(DeadlineExceeded):
+        deadline.check()
+    with pytest.raises(DeadlineExceeded):
+        deadline.timeout(10)
+
+
+def test_retries_stop_instead_of_sleeping_past_deadline():
+    calls = []
+
+    @retry(stop=stop_after_attempt(10) | stop_at_deadline, wait=wait_fixed(60), reraise=True)
+    def flaky(deadline=None):
+        calls.append(1)
+        raise ValueError("transient")
+
+    with pytest.raises(ValueError):
+        flaky(deadline=Deadline(30))
+    assert len(calls) == 1  # a 60s backoff would outlast the 30s left
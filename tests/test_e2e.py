@@ -7,7 +7,7 @@ import pytest
 from unittest.mock import patch
 from utils.process_event import handle_event
 from utils.google_utils import build_service_from_files, build_calendar_service
-from app import poll_calendar
+from engine import poll_calendar
 from unittest.mock import patch, MagicMock
 
 # --- Configuration: Read from Environment Variables ---
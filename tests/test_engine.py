@@ -0,0 +1,259 @@
+# ~/calendar_bot/tests/test_engine.py
+
+import pytest
+from unittest.mock import patch, MagicMock
+
+import engine
+from engine import _process_change
+from utils import flight_recorder, status
+
+
+@pytest.fixture(autouse=True)
+def flight_recorder_file(tmp_path, monkeypatch):
+    path = tmp_path / 'flight_recorder.jsonl'
+    monkeypatch.setattr(flight_recorder, 'FLIGHT_RECORDER_FILE', path)
+    monkeypatch.setattr(status, 'STATUS_FILE', tmp_path / 'engine_status.json')
+    return path
+
+
+@pytest.fixture()
+def clean_processed_ids():
+    """Snapshot and restore engine.processed_ids around a test."""
+    saved = dict(engine.processed_ids.items())
+    engine.processed_ids.clear()
+    yield engine.processed_ids
+    engine.processed_ids.clear()
+    engine.processed_ids.update(saved)
+
+
+def test_process_change_cancelled_removes_mirror_and_clone(clean_processed_ids):
+    clean_processed_ids.add('evt1')
+    event = {'id': 'evt1', 'status': 'cancelled'}
+    with patch('engine.remove_mirror') as mock_remove, patch('engine.remove_clone') as mock_clone, \
+         patch('engine.handle_event') as mock_handle:
+        changed = _process_change(MagicMock(), 'cal@x.com', event, is_full_sync=False)
+    mock_remove.assert_called_once()
+    mock_clone.assert_called_once()
+    mock_handle.assert_not_called()
+    assert 'evt1' not in clean_processed_ids
+    assert changed is True
+
+
+def test_process_changes_routes_exceptions_to_mirror(clean_processed_ids):
+    event = {'id': 'm1_i', 'recurringEventId': 'm1', 'status': 'cancelled',
+             'originalStartTime': {'dateTime': '2030-01-01T09:00:00Z'}}
+    with patch('engine.apply_instance_exceptions') as mock_exc, patch('engine.handle_event') as mock_handle, \
+         patch('engine.remove_mirror') as mock_remove:
+        engine._process_changes(MagicMock(), 'cal@x.com', [event], False, None)
+    assert mock_exc.call_args.args[2] == [event]
+    mock_handle.assert_not_called()
+    mock_remove.assert_not_called()
+
+
+def test_process_changes_skips_exceptions_on_full_sync(clean_processed_ids):
+    event = {'id': 'm1_i', 'recurringEventId': 'm1',
+             'originalStartTime': {'dateTime': '2030-01-01T09:00:00Z'}}
+    with patch('engine.apply_instance_exceptions') as mock_exc:
+        engine._process_changes(MagicMock(), 'cal@x.com', [event], True, None)
+    mock_exc.assert_not_called()
+
+
+def test_process_change_clones_new_birthday_incremental(clean_processed_ids):
+    event = {'id': 'b1', 'eventType': 'birthday'}
+    with patch('engine.handle_event') as mock_handle:
+        changed = _process_change(MagicMock(), 'cal@x.com', event, is_full_sync=False)
+    mock_handle.assert_called_once()
+    assert 'b1' in clean_processed_ids
+    assert changed is True
+
+
+def test_process_change_seeds_birthday_on_full_sync(clean_processed_ids):
+    # Full sync must not backfill-clone pre-existing birthdays, only seed them.
+    event = {'id': 'b1', 'eventType': 'birthday'}
+    with patch('engine.handle_event') as mock_handle:
+        changed = _process_change(MagicMock(), 'cal@x.com', event, is_full_sync=True)
+    mock_handle.assert_not_called()
+    assert 'b1' in clean_processed_ids
+    assert changed is True
+
+
+def test_process_change_skips_already_cloned(clean_processed_ids):
+    clean_processed_ids.add('b1')
+    event = {'id': 'b1', 'eventType': 'birthday'}
+    with patch('engine.handle_event') as mock_handle:
+        changed = _process_change(MagicMock(), 'cal@x.com', event, is_full_sync=False)
+    mock_handle.assert_not_called()
+    assert changed is False
+
+
+def test_process_change_skips_invite_on_full_sync(clean_processed_ids):
+    event = {'id': 'r1', 'eventType': 'default'}
+    with patch('engine.handle_event') as mock_handle:
+        _process_change(MagicMock(), 'cal@x.com', event, is_full_sync=True)
+    mock_handle.assert_not_called()
+
+
+def test_process_change_acts_on_invite_incremental(clean_processed_ids):
+    event = {'id': 'r1', 'eventType': 'default'}
+    with patch('engine.handle_event') as mock_handle:
+        _process_change(MagicMock(), 'cal@x.com', event, is_full_sync=False)
+    mock_handle.assert_called_once()
+
+
+def test_process_change_records_calendar_and_end(clean_processed_ids):
+    event = {'id': 'b1', 'eventType': 'birthday', 'end': {'date': '2030-01-02'}}
+    with patch('engine.handle_event'):
+        _process_change(MagicMock(), 'cal@x.com', event, is_full_sync=False)
+    assert dict(clean_processed_ids.items())['b1'] == {'calendar_id': 'cal@x.com', 'end_ts': 1893542400}
+
+
+def test_clean_processed_events_list_expires_locally(clean_processed_ids):
+    clean_processed_ids.add('old', 'a@x.com', end_ts=0)
+    clean_processed_ids.add('other_cal_old', 'b@x.com', end_ts=0)
+    clean_processed_ids.add('future', 'a@x.com', end_ts=4102444800)
+    with patch('engine.save_processed') as save, patch('engine.build_calendar_service') as build:
+        engine.clean_processed_events_list()
+    build.assert_not_called()  # no Calendar API calls
+    save.assert_called_once()
+    assert set(clean_processed_ids) == {'future'}
+
+
+def test_shard_adopts_gained_calendars_and_global_processed_ids(clean_processed_ids):
+    from utils.process_event import ProcessedStore
+    on_disk = ProcessedStore()
+    on_disk.add('gained_evt', 'a@x.com', end_ts=1)
+    on_disk.add('other_evt', 'b@x.com', end_ts=1)
+    on_disk.add('legacy_evt', None, end_ts=1)  # migrated from the legacy list
+    shard = MagicMock(owned=set())
+    shard.heartbeat.return_value = ({'a@x.com'}, set())
+    with patch.object(engine, 'shard', shard), patch.object(engine, 'scheduler', MagicMock(running=False)), \
+         patch('engine.load_processed', return_value=on_disk):
+        engine.shard_heartbeat()
+    assert set(clean_processed_ids) == {'gained_evt', 'legacy_evt'}
+
+
+def test_forwarded_poll_notification_triggers_poll():
+    """A poll notification from the web tier runs the main poll job immediately."""
+    with patch('engine.scheduler') as mock_scheduler:
+        engine._handle_forwarded_notification({'type': 'poll'})
+    mock_scheduler.modify_job.assert_called_once()
+
+
+def test_forwarded_profile_request_arms_the_profiler_without_counting_as_a_notification():
+    with patch('engine.profiler') as mock_profiler, patch('engine.scheduler') as mock_scheduler, \
+         patch.dict(engine.last_notified, clear=True):
+        engine._handle_forwarded_notification({'type': 'profile', 'id': 'ab' * 16, 'polls': None, 'seconds': 30})
+        assert engine.last_notified == {}
+    mock_profiler.arm.assert_called_once_with('ab' * 16, polls=None, seconds=30)
+    assert mock_scheduler.add_job.call_args.kwargs['id'] == 'profile_window_end'
+
+
+def test_sync_target_calendar_seeds_token_without_repairing():
+    with patch('engine.build_calendar_service'), \
+         patch('engine.list_changes', return_value=([{'id': 'm1'}], 'tok', True)), \
+         patch('engine.repair_drift') as repair, \
+         patch('engine.save_sync_tokens') as save:
+        engine.sync_target_calendar('shared@x.com', {})
+    repair.assert_not_called()
+    save.assert_called_once_with({'shared@x.com': 'tok'})
+
+
+def test_sync_target_calendar_repairs_from_delta():
+    delta = [{'id': 'm1', 'status': 'cancelled'}]
+    with patch('engine.build_calendar_service'), \
+         patch('engine.list_changes', return_value=(delta, 'tok2', False)) as changes, \
+         patch('engine.repair_drift', return_value=1) as repair, \
+         patch('engine.forget_deleted_clones') as forget, \
+         patch('engine.save_sync_tokens'):
+        engine.sync_target_calendar('shared@x.com', {'shared@x.com': 'tok1'})
+    assert changes.call_args.args[1:3] == ('shared@x.com', 'tok1')
+    assert repair.call_args.args[1:3] == (delta, 'shared@x.com')
+    forget.assert_called_once_with(delta, 'shared@x.com')
+
+
+def test_target_calendars_excludes_source_calendars():
+    router = MagicMock(targets=['team@x.com', engine.SOURCE_CALENDARS[0]])
+    with patch('engine.get_router', return_value=router):
+        assert engine.target_calendars() == ['team@x.com']
+
+
+def test_calendar_skipped_until_due_or_notified():
+    with patch.dict(engine.last_poll_started, {'a@x.com': 1000.0}, clear=True), \
+         patch.dict(engine.last_notified, {}, clear=True), \
+         patch('engine.effective_interval', return_value=600):
+        assert not engine._is_due('a@x.com', 1300.0)
+        assert engine._is_due('a@x.com', 1600.0)
+        engine.last_notified['a@x.com'] = 1100.0  # a webhook arrived since the last sync
+        assert engine._is_due('a@x.com', 1300.0)
+
+
+def test_effective_interval_follows_channel_health():
+    channel = {'expiration': str(int((engine.time.time() + 3600) * 1000)), 'registered_at': 100.0}
+    with patch('engine.GOOGLE_WEBHOOK_URL', 'https://hook'), \
+         patch.dict(engine.active_channels, {'a@x.com': channel}, clear=True), \
+         patch.dict(engine.last_notified, {'a@x.com': 200.0}, clear=True), \
+         patch.object(engine, 'failed_registrations', set()):
+        assert engine.effective_interval('a@x.com') == engine.pacing.maximum
+        engine.failed_registrations.add('a@x.com')
+        assert engine.effective_interval('a@x.com') == engine.pacing.minimum
+
+
+def test_reconcile_job_runs_within_budget_and_reports_backlog():
+    with patch('engine.reconcile_mirrors', return_value={'backlog': 7, 'sweep_seconds': None}) as rec, \
+         patch('engine.MIRROR_RECONCILE_BACKLOG') as backlog:
+        engine.reconcile_mirrors_job()
+    assert rec.call_args.kwargs['max_seconds'] == engine.RECONCILE_BUDGET_SECONDS
+    assert rec.call_args.kwargs['max_calls'] == engine.RECONCILE_MAX_CALLS
+    backlog.set.assert_called_once_with(7)
+
+
+def test_poll_deadline_stops_poll_and_keeps_calendar_due():
+    cal = engine.SOURCE_CALENDARS[0]
+    with patch.dict(engine.last_poll_started, {}, clear=True), \
+         patch('engine.POLL_DEADLINE_SECONDS', 0), \
+         patch('engine.UPTIME_KUMA_PUSH_URL', None), \
+         patch('engine.build_calendar_service'), \
+         patch('engine.load_sync_tokens', return_value={}), \
+         patch('engine.save_sync_tokens') as save_tokens, \
+         patch('engine.retune_poll_interval'), \
+         patch('engine.POLL_DEADLINE_EXCEEDED_TOTAL') as exceeded:
+        engine.poll_calendar()
+        assert cal not in engine.last_poll_started
+    exceeded.inc.assert_called_once()
+    save_tokens.assert_not_called()  # the interrupted sync resumes from its old token
+
+
+def test_poll_is_recorded_with_its_stages(flight_recorder_file):
+    cal = engine.SOURCE_CALENDARS[0]
+    event = {'id': 'e1', 'status': 'confirmed'}
+    with patch.dict(engine.last_poll_started, {}, clear=True), \
+         patch('engine.owned_calendars', return_value=[cal]), \
+         patch('engine.owned_targets', return_value=[]), \
+         patch('engine.UPTIME_KUMA_PUSH_URL', None), \
+         patch('engine.build_calendar_service'), \
+         patch('engine.load_sync_tokens', return_value={cal: 'tok'}), \
+         patch('engine.list_changes', return_value=([event], 'tok2', False)), \
+         patch('engine.handle_event'), \
+         patch('engine.save_sync_tokens'), \
+         patch('engine.retune_poll_interval'):
+        engine.poll_calendar()
+
+    entry = flight_recorder.read_runs()['engine'][-1]
+    assert entry['kind'] == 'poll' and entry['error'] is None
+    assert entry['calendars'][cal].pop('batch_bytes') > 0
+    assert entry['calendars'][cal] == {'trigger': 'poll', 'events': 1, 'full_sync': False}
+    assert {'list', 'process', 'persist'} <= set(entry['stages'])
+
+
+def test_health_snapshot_reports_sync_retry_and_channel_state():
+    with patch('engine.SOURCE_CALENDARS', ['a@x.com', 'b@x.com']), patch('engine.owned_targets', return_value=[]), \
+         patch.dict(engine.last_synced, {'a@x.com': 2000.0}, clear=True), \
+         patch.dict(engine.last_poll_started, {'a@x.com': 1990.0, 'b@x.com': 1990.0}, clear=True), \
+         patch.dict(engine.active_channels, {'a@x.com': {'id': 'c', 'expiration': '5000000'}}, clear=True):
+        snapshot = engine.health_snapshot()
+    a, b = snapshot['calendars']['a@x.com'], snapshot['calendars']['b@x.com']
+    assert (a['last_sync'], a['retry_pending'], a['channel_expires']) == (2000.0, False, 5000.0)
+    assert (b['last_sync'], b['retry_pending'], b['channel_expires']) == (None, True, None)
+    assert a['watched'] and a['max_sync_age'] > 0
+    assert snapshot['stale_after'] > snapshot['published']
+
@@ -0,0 +1,23 @@
+# ~/calendar_bot/tests/test_expiry.py
+from utils.expiry import ExpiryIndex
+
+
+def test_pop_expired_returns_only_keys_before_cutoff():
+    index = ExpiryIndex([('a', 10), ('b', 30), ('c', 20), ('forever', None)])
+    assert sorted(index.pop_expired(25)) == ['a', 'c']
+    assert 'b' in index and 'forever' in index
+    assert index.pop_expired(25) == []
+
+
+def test_set_replaces_earlier_expiry():
+    index = ExpiryIndex([('a', 10)])
+    index.set('a', 100)  # the stale (10, 'a') heap entry must be ignored
+    assert index.pop_expired(50) == []
+    assert index.pop_expired(150) == ['a']
+
+
+def test_discard_removes_key():
+    index = ExpiryIndex([('a', 10)])
+    index.discard('a')
+    assert index.pop_expired(50) == []
+    assert len(index) == 0
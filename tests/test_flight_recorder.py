@@ -0,0 +1,38 @@
+# ~/calendar_bot/tests/test_flight_recorder.py
+import pytest
+
+from utils import flight_recorder
+from utils.flight_recorder import publish, read_runs, record
+
+
+@pytest.fixture(autouse=True)
+def recorder_file(tmp_path, monkeypatch):
+    path = tmp_path / 'flight_recorder.jsonl'
+    monkeypatch.setattr(flight_recorder, 'FLIGHT_RECORDER_FILE', path)
+    monkeypatch.setattr(flight_recorder, '_unpublished', flight_recorder.deque(maxlen=10))
+    return path
+
+
+def test_publish_appends_only_new_runs(recorder_file):
+    with record('poll'):
+        pass
+    publish('engine')
+    with record('reconcile'):
+        pass
+    publish('engine')
+    publish('engine')  # nothing new: nothing written
+    assert len(recorder_file.read_text().splitlines()) == 2
+    assert [run['kind'] for run in read_runs()['engine']] == ['poll', 'reconcile']
+
+
+def test_file_is_compacted_to_the_last_runs_per_instance(recorder_file, monkeypatch):
+    monkeypatch.setattr(flight_recorder, 'FLIGHT_RECORDER_SIZE', 2)
+    monkeypatch.setattr(flight_recorder, 'FLIGHT_RECORDER_MAX_BYTES', 1000)
+    for instance in ('a', 'b'):
+        for _ in range(5):
+            with record('poll'):
+                pass
+            publish(instance)
+    assert len(recorder_file.read_text().splitlines()) < 10  # compacted along the way
+    runs = read_runs()
+    assert sorted(runs) == ['a', 'b'] and all(len(entries) == 2 for entries in runs.values())
@@ -0,0 +1,84 @@
+# ~/calendar_bot/tests/test_google_utils.py
+import httplib2
+import pytest
+from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
+from googleapiclient.http import HttpMockSequence
+from prometheus_client import REGISTRY
+
+from utils.breaker import CircuitBreaker
+from utils.deadline import Deadline, DeadlineExceeded, bounded_by
+from utils.google_utils import GOOGLE_API_TIMEOUT_SECONDS, _request_builder
+
+ACCOUNT = 'metrics@example.com'
+
+
+def _sample(name, **labels):
+    return REGISTRY.get_sample_value(name, {'account': ACCOUNT, **labels}) or 0
+
+
+def test_requests_record_latency_outcome_and_size():
+    http = HttpMockSequence([
+        ({'status': '200'}, b'{"items": []}'),
+        ({'status': '404'}, b'{"error": {}}'),
+    ])
+    breaker = CircuitBreaker(f"calendar:{ACCOUNT}")
+    service = build('calendar', 'v3', http=http, static_discovery=True,
+                    requestBuilder=_request_builder(breaker, ACCOUNT))
+    before_ok = _sample('calendar_bot_google_api_requests_total', method='events.list', status='200')
+    before_bytes = _sample('calendar_bot_google_api_response_bytes_sum', method='events.list')
+
+    service.events().list(calendarId='a').execute()
+    with pytest.raises(HttpError):
+        service.events().get(calendarId='a', eventId='x').execute()
+
+    assert _sample('calendar_bot_google_api_requests_total', method='events.list', status='200') == before_ok + 1
+    assert _sample('calendar_bot_google_api_response_bytes_sum', method='events.list') == before_bytes + 13
+    assert _sample('calendar_bot_google_api_request_seconds_count', method='events.get', status='404') >= 1
+
+
+def test_requests_are_labelled_with_the_status_returned():
+    http = HttpMockSequence([
+        ({'status': '204'}, b''),
+        ({'status': '304'}, b''),
+    ])
+    service = build('calendar', 'v3', http=http, static_discovery=True,
+                    requestBuilder=_request_builder(CircuitBreaker(f"calendar:{ACCOUNT}"), ACCOUNT))
+    before = {status: _sample('calendar_bot_google_api_requests_total', method=method, status=status)
+              for method, status in (('events.delete', '204'), ('events.get', '304'))}
+
+    service.events().delete(calendarId='a', eventId='x').execute()
+    with pytest.raises(HttpError):  # a conditional get that hit
+        service.events().get(calendarId='a', eventId='x').execute()
+
+    assert _sample('calendar_bot_google_api_requests_total', method='events.delete', status='204') == before['204'] + 1
+    assert _sample('calendar_bot_google_api_requests_total', method='events.get', status='304') == before['304'] + 1
+
+
+class _TimedHttp(httplib2.Http):
+    """Answers every request with an empty list, noting the timeout in force."""
+
+    def __init__(self):
+        super().__init__(timeout=GOOGLE_API_TIMEOUT_SECONDS)
+        self.timeouts = []
+
+    def request(self, *args, **kwargs):
+        self.timeouts.append(self.timeout)
+        return httplib2.Response({'status': '200'}), b'{"items": []}'
+
+
+def test_request_timeout_is_capped_by_the_poll_deadline():
+    http = _TimedHttp()
+    service = build('calendar', 'v3', http=http, static_discovery=True,
+                    requestBuilder=_request_builder(CircuitBreaker('calendar:deadline'), ACCOUNT))
+    clock = [0.0]
+    deadline = Deadline(100, clock=lambda: clock[0])
+
+    service.events().list(calendarId='a').execute()  # outside a poll: the fixed cap
+    with bounded_by(deadline):
+        clock[0] = 95
+        service.events().list(calendarId='a').execute()
+        clock[0] = 100
+        with pytest.raises(DeadlineExceeded):
+            service.events().list(calendarId='a').execute()
+    assert http.timeouts == [GOOGLE_API_TIMEOUT_SECONDS, 5]
@@ -0,0 +1,75 @@
+# ~/calendar_bot/tests/test_jobs.py
+from datetime import datetime, timezone
+
+import pytest
+from apscheduler.events import (
+    EVENT_JOB_SUBMITTED, EVENT_JOB_EXECUTED, EVENT_JOB_ERROR, EVENT_JOB_MISSED, EVENT_JOB_MAX_INSTANCES,
+    JobSubmissionEvent, JobExecutionEvent,
+)
+from prometheus_client import REGISTRY
+
+from utils import status
+from utils.jobs import JobMonitor, job_label
+
+SCHEDULED = datetime(2030, 1, 1, 9, 0, tzinfo=timezone.utc)
+
+
+@pytest.fixture(autouse=True)
+def status_file(tmp_path, monkeypatch):
+    path = tmp_path / 'engine_status.json'
+    monkeypatch.setattr(status, 'STATUS_FILE', path)
+    return path
+
+
+def _sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+def test_records_lag_duration_and_last_outcome():
+    now = [SCHEDULED.timestamp() + 2.0]
+    monitor = JobMonitor('engine', clock=lambda: now[0])
+    lag_before = _sample('calendar_bot_scheduler_job_lag_seconds_sum', job='weekly_memory_clean_job')
+
+    monitor(JobSubmissionEvent(EVENT_JOB_SUBMITTED, 'weekly_memory_clean_job', 'default', [SCHEDULED]))
+    assert _sample('calendar_bot_scheduler_jobs_in_flight') == 1
+    now[0] += 30.0
+    monitor(JobExecutionEvent(EVENT_JOB_EXECUTED, 'weekly_memory_clean_job', 'default', SCHEDULED))
+
+    assert _sample('calendar_bot_scheduler_job_lag_seconds_sum', job='weekly_memory_clean_job') - lag_before == 2.0
+    assert _sample('calendar_bot_scheduler_jobs_in_flight') == 0
+    assert monitor.last_outcomes() == {
+        'weekly_memory_clean_job': {'outcome': 'success', 'at': now[0], 'duration': 30.0}
+    }
+    assert status.read_status()['jobs'] == {'engine': monitor.last_outcomes()}
+
+
+def test_counts_skips_and_errors():
+    monitor = JobMonitor('engine')
+    skipped_before = _sample('calendar_bot_scheduler_job_skipped_total', job='poll_calendar_job')
+
+    monitor(JobSubmissionEvent(EVENT_JOB_MAX_INSTANCES, 'poll_calendar_job', 'default', [SCHEDULED]))
+    assert _sample('calendar_bot_scheduler_job_skipped_total', job='poll_calendar_job') == skipped_before + 1
+    assert monitor.last_outcomes()['poll_calendar_job']['outcome'] == 'skipped'
+
+    monitor(JobSubmissionEvent(EVENT_JOB_SUBMITTED, 'poll_calendar_job', 'default', [SCHEDULED]))
+    monitor(JobExecutionEvent(EVENT_JOB_ERROR, 'poll_calendar_job', 'default', SCHEDULED,
+                              exception=RuntimeError('boom')))
+    assert monitor.last_outcomes()['poll_calendar_job']['outcome'] == 'error'
+
+
+def test_missed_runs_leave_the_in_flight_count():
+    monitor = JobMonitor('engine')
+    misfires_before = _sample('calendar_bot_scheduler_job_misfires_total', job='reconcile_mirrors_job')
+
+    monitor(JobSubmissionEvent(EVENT_JOB_SUBMITTED, 'reconcile_mirrors_job', 'default', [SCHEDULED]))
+    assert _sample('calendar_bot_scheduler_jobs_in_flight') == 1
+    monitor(JobExecutionEvent(EVENT_JOB_MISSED, 'reconcile_mirrors_job', 'default', SCHEDULED))
+
+    assert _sample('calendar_bot_scheduler_jobs_in_flight') == 0
+    assert _sample('calendar_bot_scheduler_job_misfires_total', job='reconcile_mirrors_job') == misfires_before + 1
+    assert monitor.last_outcomes()['reconcile_mirrors_job']['outcome'] == 'missed'
+
+
+def test_one_off_jobs_share_a_label():
+    assert job_label('webhook_triggered_fallback_poll_' + 'a1' * 16) == 'webhook_triggered_fallback_poll'
+    assert job_label('poll_calendar_job') == 'poll_calendar_job'
@@ -0,0 +1,35 @@
+# ~/calendar_bot/tests/test_leader.py
+import time
+from unittest.mock import MagicMock
+
+from utils.leader import LeaderElection, forward_to_leader, serve_notifications
+
+
+def test_only_one_holder_of_the_lock(tmp_path):
+    lock = tmp_path / 'scheduler.lock'
+    first_elected, second_elected = MagicMock(), MagicMock()
+    first = LeaderElection(lock, on_elected=first_elected)
+    second = LeaderElection(lock, on_elected=second_elected)
+    assert first.try_acquire() is True
+    assert second.try_acquire() is False  # flock is per open file description
+    first_elected.assert_called_once()
+    second_elected.assert_not_called()
+
+
+def test_forwarded_notification_reaches_leader(tmp_path):
+    sock_path = tmp_path / 'leader.sock'
+    received = []
+    sock = serve_notifications(received.append, socket_path=sock_path)
+    try:
+        assert forward_to_leader({'type': 'poll'}, socket_path=sock_path) is True
+        for _ in range(50):
+            if received:
+                break
+            time.sleep(0.01)
+        assert received == [{'type': 'poll'}]
+    finally:
+        sock.close()
+
+
+def test_forward_without_leader_reports_failure(tmp_path):
+    assert forward_to_leader({'type': 'poll'}, socket_path=tmp_path / 'missing.sock') is False
@@ -0,0 +1,65 @@
+# ~/calendar_bot/tests/test_logger.py
+import json
+import logging
+import queue
+import sys
+
+from utils.logger import JsonFormatter, RateLimitFilter, TraceContextFilter, _QueueHandler
+from utils.tracing import span
+
+
+def _record(msg, *args, level=logging.WARNING, **extra):
+    record = logging.LogRecord('calendar_bot', level, __file__, 1, msg, args, None)
+    record.__dict__.update(extra)
+    return record
+
+
+def test_rate_limit_is_per_template_and_reports_what_it_dropped():
+    now = [0.0]
+    limiter = RateLimitFilter(limit=2, window=60, clock=lambda: now[0])
+    passed = [limiter.filter(_record("Skipping event %s", i, level=logging.INFO)) for i in range(5)]
+    assert passed == [True, True, False, False, False]
+    assert limiter.filter(_record("Another line %s", 1, level=logging.INFO))  # a different template
+    assert limiter.filter(_record("Skipping event %s", 5, level=logging.CRITICAL))
+
+    now[0] = 61
+    record = _record("Skipping event %s", 6, level=logging.INFO)
+    assert limiter.filter(record)
+    assert record.suppressed == 3
+    assert record.getMessage() == "Skipping event 6 [3 similar lines suppressed]"
+
+
+def test_rate_limit_never_drops_errors_and_warnings_only_by_rate_key():
+    limiter = RateLimitFilter(limit=1, window=60, clock=lambda: 0.0)
+    assert all(limiter.filter(_record("Poll failed: %s", i, level=logging.ERROR)) for i in range(5))
+    assert all(limiter.filter(_record("Slow poll %s", i)) for i in range(5))
+    assert all(limiter.filter(_record("Poll failed: %s", i, level=logging.ERROR, rate_key='poll')) for i in range(5))
+    passed = [limiter.filter(_record("Skipping %s", i, rate_key='skip')) for i in range(3)]
+    assert passed == [True, False, False]
+
+
+def test_json_lines_carry_structured_fields_from_the_span():
+    record = _record("Invited %s", 'shared@x.com', level=logging.INFO, action='invite_added')
+    with span('sync_calendar', calendar_id='a@x.com') as root:
+        with span('process_change', event_id='evt1'):
+            TraceContextFilter().filter(record)
+    line = json.loads(JsonFormatter().format(record))
+    assert line['message'] == "Invited shared@x.com"
+    assert (line['calendar'], line['event_id'], line['action']) == ('a@x.com', 'evt1', 'invite_added')
+    assert line['trace_id'] == root.trace_id
+
+
+def test_queued_records_are_resolved_on_the_calling_thread():
+    handler = _QueueHandler(queue.Queue(1))
+    attendees = ['a@x.com']
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        record = _record("Attendees %s", attendees, exc_info=sys.exc_info())
+    handler.handle(record)
+    attendees.append('b@x.com')  # a later change must not leak into the log line
+    handler.handle(_record("dropped: queue full"))
+
+    queued = handler.queue.get_nowait()
+    assert queued.getMessage() == "Attendees ['a@x.com']"
+    assert queued.exc_info is None and 'ValueError: boom' in queued.exc_text
@@ -0,0 +1,82 @@
+# ~/calendar_bot/tests/test_memory.py
+import tracemalloc
+
+from prometheus_client import REGISTRY
+
+from utils import memory
+from utils.memory import SnapshotDiff, approx_bytes
+from utils.process_event import ProcessedStore
+from utils.profiling import profile_path, read_profile_status
+
+DIFF_ID = 'cd' * 16
+
+
+def test_approx_bytes_walks_containers_and_instances_counting_shared_objects_once():
+    small, large = ProcessedStore(), ProcessedStore()
+    small.add('evt0', 'a@x.com', end_ts=1.0)
+    for i in range(1000):
+        large.add(f'evt{i}', 'a@x.com', end_ts=float(i))
+    assert approx_bytes(large) > 50 * approx_bytes(small)
+
+    payload = 'x' * 10_000
+    assert approx_bytes([payload, payload]) < 2 * len(payload)
+
+
+def test_update_gauges_sizes_tracked_structures(monkeypatch):
+    monkeypatch.setattr(memory, '_tracked', {})
+    memory.track('test_channels', lambda: {'a@x.com': {'id': 'c1', 'resourceId': 'r1'}})
+    memory.update_gauges(force=True)
+    labels = {'structure': 'test_channels'}
+    assert REGISTRY.get_sample_value('calendar_bot_resident_state_entries', labels) == 1
+    assert REGISTRY.get_sample_value('calendar_bot_resident_state_bytes', labels) > 0
+
+
+def test_snapshot_diff_pins_growth_between_two_polls_to_a_line(tmp_path):
+    leak = []
+    diff = SnapshotDiff(directory=tmp_path)
+    diff.arm(DIFF_ID)
+    try:
+        with diff.around_poll():
+            pass
+        assert read_profile_status(DIFF_ID, tmp_path) == {'state': 'baseline_taken'}
+        with diff.around_poll():
+            leak.extend(bytearray(1024) for _ in range(500))
+    finally:
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    assert read_profile_status(DIFF_ID, tmp_path) == {'state': 'done'}
+    assert not tracemalloc.is_tracing()  # only runs while a diff is armed
+    report = profile_path(DIFF_ID, 'tracemalloc', tmp_path).read_text().splitlines()
+    assert report[0].startswith('# Heap growth between two polls')
+    assert 'test_memory.py' in report[1]
+
+
+def test_state_files_are_sized_on_disk_not_loaded(monkeypatch, tmp_path):
+    monkeypatch.setattr(memory, '_tracked', {})
+    monkeypatch.setattr(memory, '_tracked_files', {})
+    state = tmp_path / 'clones.json'
+    state.write_text('{"a": 1}')
+    memory.track_file('test_clone_map', lambda: state)
+    memory.track_file('test_missing', lambda: tmp_path / 'missing.json')
+    memory.update_gauges(force=True)
+    assert REGISTRY.get_sample_value('calendar_bot_state_file_bytes', {'file': 'test_clone_map'}) == 8
+    assert REGISTRY.get_sample_value('calendar_bot_state_file_bytes', {'file': 'test_missing'}) == 0
+
+
+def test_batch_bytes_samples_large_batches(monkeypatch):
+    events = [{'id': f'evt{i:05d}', 'summary': 's' * 200} for i in range(5000)]
+    exact = approx_bytes(events)
+    sized = []
+    real_approx = memory.approx_bytes
+
+    def counting(obj):
+        sized.append(len(obj))
+        return real_approx(obj)
+
+    monkeypatch.setattr(memory, 'approx_bytes', counting)
+    estimate = memory.batch_bytes(events, sample=50)
+    monkeypatch.undo()
+    assert sized == [50]  # only the sample was walked
+    assert 0.9 * exact < estimate < 1.1 * exact
+    assert memory.batch_bytes(events[:10], sample=50) == approx_bytes(events[:10])
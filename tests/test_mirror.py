@@ -1,4 +1,6 @@
 # ~/calendar_bot/tests/test_mirror.py
+import json
+
 import pytest
 from unittest.mock import MagicMock, patch
 
@@ -6,10 +8,16 @@ from googleapiclient.errors import HttpError
 
 from utils import mirror
 from utils.mirror import (
-    ensure_mirror, reconcile_mirrors, is_self_organized, _snapshot, _mirror_body,
-    apply_instance_exception, SHARED_CALENDAR_ID,
+    ensure_mirror, remove_mirror, reconcile_mirrors, is_self_organized, _snapshot, _digest, _mirror_body,
+    apply_instance_exception, apply_instance_exceptions, _instance_id, event_end_ts, SHARED_CALENDAR_ID,
+    repair_drift, _key,
 )
 
+KEY1 = _key('joeltimm@gmail.com', 'evt1')
+KEY2 = _key('tsouthworth@gmail.com', 'evt2')
+OLD_KEY = _key('joeltimm@gmail.com', 'old')
+MASTER_KEY = _key('cal@x.com', 'master1')
+
 
 class _Resp:
     def __init__(self, status):
@@ -21,6 +29,19 @@ def _http_error(status):
     return HttpError(_Resp(status), b'{}')
 
 
+@pytest.fixture(autouse=True)
+def reconcile_cursor_file(tmp_path):
+    with patch.object(mirror, 'RECONCILE_CURSOR_FILE', tmp_path / 'cursor.json'):
+        yield
+
+
+@pytest.fixture(autouse=True)
+def fresh_index(tmp_path):
+    # Tests stub load_mirror_map; start each one without a cached index.
+    with patch.object(mirror, 'MIRROR_FILE', tmp_path / 'mirrors.json'), patch.object(mirror, '_index', None):
+        yield
+
+
 @pytest.fixture
 def event():
     return {
@@ -53,20 +74,20 @@ def test_ensure_mirror_creates_new(event):
     service.events().insert().execute.return_value = {'id': 'mirror1'}
     with patch.object(mirror, 'load_mirror_map', return_value={}), \
          patch.object(mirror, 'save_mirror_map') as save:
-        assert ensure_mirror(service, 'joeltimm@gmail.com', event) is True
+        assert ensure_mirror(service, 'joeltimm@gmail.com', event) == [SHARED_CALENDAR_ID]
     # Inserted onto the shared calendar and persisted the mapping.
     insert_kwargs = service.events().insert.call_args.kwargs
     assert insert_kwargs['calendarId'] == SHARED_CALENDAR_ID
     saved_map = save.call_args.args[0]
-    assert saved_map['joeltimm@gmail.com::evt1']['mirror_id'] == 'mirror1'
+    assert saved_map[KEY1]['mirror_id'] == 'mirror1'
 
 
 def test_ensure_mirror_skips_when_unchanged(event):
     service = MagicMock()
-    existing = {'joeltimm@gmail.com::evt1': {'mirror_id': 'mirror1', 'snapshot': _snapshot(event)}}
+    existing = {KEY1: {'mirror_id': 'mirror1', 'digest': _digest(_snapshot(event))}}
     with patch.object(mirror, 'load_mirror_map', return_value=existing), \
          patch.object(mirror, 'save_mirror_map') as save:
-        assert ensure_mirror(service, 'joeltimm@gmail.com', event) is True
+        assert ensure_mirror(service, 'joeltimm@gmail.com', event) == [SHARED_CALENDAR_ID]
     service.events().insert.assert_not_called()
     service.events().patch.assert_not_called()
     save.assert_not_called()
@@ -74,7 +95,7 @@ def test_ensure_mirror_skips_when_unchanged(event):
 
 def test_ensure_mirror_patches_when_changed(event):
     service = MagicMock()
-    stale = {'joeltimm@gmail.com::evt1': {'mirror_id': 'mirror1', 'snapshot': {'summary': 'old'}}}
+    stale = {KEY1: {'mirror_id': 'mirror1', 'digest': 'stale'}}
     with patch.object(mirror, 'load_mirror_map', return_value=stale), \
          patch.object(mirror, 'save_mirror_map'):
         ensure_mirror(service, 'joeltimm@gmail.com', event)
@@ -88,16 +109,196 @@ def test_ensure_mirror_skips_gracefully_without_access(event):
     service.events().insert().execute.side_effect = _http_error(403)
     with patch.object(mirror, 'load_mirror_map', return_value={}), \
          patch.object(mirror, 'save_mirror_map') as save:
-        assert ensure_mirror(service, 'joeltimm@gmail.com', event) is False
+        assert ensure_mirror(service, 'joeltimm@gmail.com', event) == []
     save.assert_not_called()
 
 
+def test_ensure_mirror_stores_digest_and_end(event):
+    service = MagicMock()
+    service.events().insert().execute.return_value = {'id': 'mirror1'}
+    with patch.object(mirror, 'load_mirror_map', return_value={}), \
+         patch.object(mirror, 'save_mirror_map') as save:
+        ensure_mirror(service, 'joeltimm@gmail.com', event)
+    record = save.call_args.args[0][KEY1]
+    assert 'snapshot' not in record
+    assert record['digest'] == _digest(_snapshot(event))
+    assert record['end_ts'] == 1914836400  # 2030-09-05T11:00:00Z
+
+
+def test_ensure_mirror_writes_each_target_and_releases_unrouted_ones(event):
+    service = MagicMock()
+    service.events().insert().execute.return_value = {'id': 'team_mirror'}
+    service.events().insert.reset_mock()
+    existing = {_key('joeltimm@gmail.com', 'evt1', 'old@x.com'): {'mirror_id': 'old_mirror'}}
+    with patch.object(mirror, 'load_mirror_map', return_value=existing), \
+         patch.object(mirror, 'save_mirror_map') as save:
+        assert ensure_mirror(service, 'joeltimm@gmail.com', event, ('team@x.com',)) == ['team@x.com']
+    assert service.events().insert.call_args.kwargs['calendarId'] == 'team@x.com'
+    assert service.events().delete.call_args.kwargs == {'calendarId': 'old@x.com', 'eventId': 'old_mirror'}
+    assert list(save.call_args.args[0]) == [_key('joeltimm@gmail.com', 'evt1', 'team@x.com')]
+
+
+def test_digest_ignores_key_order():
+    assert _digest({'a': 1, 'b': 2}) == _digest({'b': 2, 'a': 1})
+
+
+def test_load_mirror_map_migrates_legacy_snapshots(tmp_path, event):
+    legacy_file = tmp_path / 'mirrors.json'
+    legacy_file.write_text(json.dumps(
+        {'joeltimm@gmail.com::evt1': {'mirror_id': 'mirror1', 'snapshot': _snapshot(event)}}
+    ))
+    with patch.object(mirror, 'MIRROR_FILE', legacy_file):
+        record = mirror.load_mirror_map()[KEY1]
+    assert record == {'mirror_id': 'mirror1', 'digest': _digest(_snapshot(event)), 'end_ts': 1914836400}
+
+
+# --- MirrorIndex ---
+
+def test_index_tracks_writes_without_rescanning():
+    index = mirror.MirrorIndex({KEY1: {'mirror_id': 'mirror1', 'ical_uid': 'u'}})
+    assert index.find_by_ical_uid('u', SHARED_CALENDAR_ID) == {'mirror_id': 'mirror1', 'ical_uid': 'u'}
+    index.put(KEY2, {'mirror_id': 'mirror1', 'ical_uid': 'u'})
+    assert sorted(index.attached_keys(SHARED_CALENDAR_ID, 'mirror1')) == sorted([KEY1, KEY2])
+    assert index.keys_for_source('tsouthworth@gmail.com', 'evt2') == [KEY2]
+    index.drop(KEY1)
+    index.drop(KEY2)
+    assert index.find_by_ical_uid('u', SHARED_CALENDAR_ID) is None
+    assert index.attached_keys(SHARED_CALENDAR_ID, 'mirror1') == []
+    assert index.keys_for_source('joeltimm@gmail.com', 'evt1') == []
+
+
+def test_index_is_loaded_once_until_the_file_changes(tmp_path, event):
+    service = MagicMock()
+    service.events().insert().execute.return_value = {'id': 'mirror1'}
+    with patch.object(mirror, 'load_mirror_map', wraps=mirror.load_mirror_map) as load:
+        ensure_mirror(service, 'joeltimm@gmail.com', event)
+        ensure_mirror(service, 'joeltimm@gmail.com', event)
+        assert load.call_count == 1  # our own write kept the index current
+        mirror.MIRROR_FILE.write_text(json.dumps({}))  # another shard rewrote the map
+        assert len(mirror.mirror_index()) == 0
+        assert load.call_count == 2
+
+
+# --- cross-account dedup by iCalUID ---
+
+def test_ensure_mirror_attaches_second_source_by_ical_uid(event):
+    service = MagicMock()
+    event = dict(event, iCalUID='meeting@example.com')
+    existing = {KEY1: {
+        'mirror_id': 'mirror1', 'ical_uid': 'meeting@example.com', 'digest': _digest(_snapshot(event)),
+    }}
+    with patch.object(mirror, 'load_mirror_map', return_value=existing), \
+         patch.object(mirror, 'save_mirror_map') as save:
+        assert ensure_mirror(service, 'tsouthworth@gmail.com', dict(event, id='evt2')) == [SHARED_CALENDAR_ID]
+    service.events().insert.assert_not_called()
+    service.events().patch.assert_not_called()
+    assert save.call_args.args[0][KEY2]['mirror_id'] == 'mirror1'
+
+
+def test_remove_mirror_keeps_mirror_while_another_source_attached():
+    service = MagicMock()
+    mm = {
+        KEY1: {'mirror_id': 'mirror1', 'ical_uid': 'u'},
+        KEY2: {'mirror_id': 'mirror1', 'ical_uid': 'u'},
+    }
+    with patch.object(mirror, 'load_mirror_map', return_value=mm), \
+         patch.object(mirror, 'save_mirror_map') as save:
+        remove_mirror(service, 'joeltimm@gmail.com', 'evt1')
+    service.events().delete.assert_not_called()
+    assert list(save.call_args.args[0]) == [KEY2]
+
+
+def test_remove_mirror_deletes_when_last_source_detaches():
+    service = MagicMock()
+    mm = {KEY2: {'mirror_id': 'mirror1', 'ical_uid': 'u'}}
+    with patch.object(mirror, 'load_mirror_map', return_value=mm), \
+         patch.object(mirror, 'save_mirror_map'):
+        remove_mirror(service, 'tsouthworth@gmail.com', 'evt2')
+    assert service.events().delete.call_args.kwargs['eventId'] == 'mirror1'
+
+
+def test_reconcile_reads_one_source_per_shared_mirror(event):
+    service = MagicMock()
+    service.events().get().execute.side_effect = _http_error(304)
+    service.events().get.reset_mock()
+    mm = {
+        KEY1: {'mirror_id': 'mirror1', 'digest': 'd', 'etag': '"a"'},
+        KEY2: {'mirror_id': 'mirror1', 'digest': 'd', 'etag': '"b"'},
+    }
+    with patch.object(mirror, 'load_mirror_map', return_value=mm), \
+         patch.object(mirror, 'save_mirror_map'):
+        reconcile_mirrors(lambda cal: service)
+    assert service.events().get.call_count == 1
+
+
+# --- repair_drift ---
+
+def test_repair_drift_ignores_own_writes():
+    service = MagicMock()
+    mm = {KEY1: {'mirror_id': 'mirror1', 'mirror_etag': '"ours"'}}
+    with patch.object(mirror, 'load_mirror_map', return_value=mm), \
+         patch.object(mirror, 'save_mirror_map') as save:
+        repaired = repair_drift(lambda cal: service, [
+            {'id': 'mirror1', 'status': 'confirmed', 'etag': '"ours"'},
+            {'id': 'unrelated', 'status': 'cancelled'},
+        ])
+    assert repaired == 0
+    service.events().get.assert_not_called()
+    save.assert_not_called()
+
+
+def test_writes_through_any_attached_key_are_recognised_as_echoes(event):
+    service = MagicMock()
+    service.events().patch().execute.return_value = {'id': 'mirror1', 'etag': '"second"'}
+    mirror.save_mirror_map({
+        KEY1: {'mirror_id': 'mirror1', 'mirror_etag': '"first"', 'digest': 'd'},
+        KEY2: {'mirror_id': 'mirror1', 'mirror_etag': '"first"', 'digest': 'stale'},
+    })
+    ensure_mirror(service, 'tsouthworth@gmail.com', dict(event, id='evt2'))  # writes through KEY2
+
+    assert mirror.mirror_index().get(KEY1)['mirror_etag'] == '"second"'
+    service.events().get.reset_mock()
+    assert repair_drift(lambda cal: service, [{'id': 'mirror1', 'status': 'confirmed', 'etag': '"second"'}]) == 0
+    service.events().get.assert_not_called()
+
+
+def test_repair_drift_recreates_deleted_mirror(event):
+    service = MagicMock()
+    service.events().get().execute.return_value = event
+    service.events().insert().execute.return_value = {'id': 'mirror2', 'etag': '"new"'}
+    mm = {
+        KEY1: {'mirror_id': 'mirror1', 'ical_uid': 'u'},
+        KEY2: {'mirror_id': 'mirror1', 'ical_uid': 'u'},
+    }
+    with patch.object(mirror, 'load_mirror_map', return_value=mm), \
+         patch.object(mirror, 'save_mirror_map') as save:
+        assert repair_drift(lambda cal: service, [{'id': 'mirror1', 'status': 'cancelled'}]) == 1
+    saved = save.call_args.args[0]
+    # Every attached source now points at the new mirror.
+    assert {r['mirror_id'] for r in saved.values()} == {'mirror2'}
+    assert saved[KEY1]['mirror_etag'] == '"new"'
+
+
+def test_repair_drift_reverts_hand_edit(event):
+    service = MagicMock()
+    service.events().get().execute.return_value = event
+    service.events().patch().execute.return_value = {'id': 'mirror1', 'etag': '"fixed"'}
+    mm = {KEY1: {'mirror_id': 'mirror1', 'mirror_etag': '"ours"'}}
+    with patch.object(mirror, 'load_mirror_map', return_value=mm), \
+         patch.object(mirror, 'save_mirror_map') as save:
+        repair_drift(lambda cal: service, [{'id': 'mirror1', 'status': 'confirmed', 'etag': '"edited"'}])
+    patch_kwargs = service.events().patch.call_args.kwargs
+    assert patch_kwargs['calendarId'] == SHARED_CALENDAR_ID
+    assert patch_kwargs['body']['summary'] == 'Invited Meeting'
+    assert save.call_args.args[0][KEY1]['mirror_etag'] == '"fixed"'
+
+
 # --- reconcile_mirrors ---
 
 def test_reconcile_deletes_mirror_when_source_cancelled(event):
     service = MagicMock()
     service.events().get().execute.return_value = {'id': 'evt1', 'status': 'cancelled'}
-    mirror_map = {'joeltimm@gmail.com::evt1': {'mirror_id': 'mirror1', 'snapshot': {}}}
+    mirror_map = {KEY1: {'mirror_id': 'mirror1', 'digest': 'stale'}}
     with patch.object(mirror, 'load_mirror_map', return_value=mirror_map), \
          patch.object(mirror, 'save_mirror_map') as save:
         reconcile_mirrors(lambda cal: service)
@@ -109,7 +310,7 @@ def test_reconcile_deletes_mirror_when_source_cancelled(event):
 def test_reconcile_deletes_mirror_when_source_gone(event):
     service = MagicMock()
     service.events().get().execute.side_effect = _http_error(404)
-    mirror_map = {'joeltimm@gmail.com::evt1': {'mirror_id': 'mirror1', 'snapshot': {}}}
+    mirror_map = {KEY1: {'mirror_id': 'mirror1', 'digest': 'stale'}}
     with patch.object(mirror, 'load_mirror_map', return_value=mirror_map), \
          patch.object(mirror, 'save_mirror_map') as save:
         reconcile_mirrors(lambda cal: service)
@@ -120,13 +321,106 @@ def test_reconcile_deletes_mirror_when_source_gone(event):
 def test_reconcile_patches_mirror_when_source_moved(event):
     service = MagicMock()
     service.events().get().execute.return_value = event  # current source state
-    stale = {'joeltimm@gmail.com::evt1': {'mirror_id': 'mirror1', 'snapshot': {'summary': 'old time'}}}
+    stale = {KEY1: {'mirror_id': 'mirror1', 'digest': 'stale'}}
     with patch.object(mirror, 'load_mirror_map', return_value=stale), \
          patch.object(mirror, 'save_mirror_map'):
         reconcile_mirrors(lambda cal: service)
     service.events().patch.assert_called_once()
 
 
+def test_reconcile_sends_etag_and_treats_304_as_unchanged():
+    service = MagicMock()
+    request = service.events().get.return_value
+    request.headers = {}
+    request.execute.side_effect = _http_error(304)
+    mirror_map = {KEY1: {'mirror_id': 'mirror1', 'digest': 'd', 'etag': '"e1"'}}
+    counter = MagicMock()
+    with patch.object(mirror, 'load_mirror_map', return_value=mirror_map), \
+         patch.object(mirror, 'save_mirror_map') as save:
+        reconcile_mirrors(lambda cal: service, counter)
+    assert request.headers['If-None-Match'] == '"e1"'
+    service.events().patch.assert_not_called()
+    service.events().delete.assert_not_called()
+    save.assert_not_called()
+    counter.labels.assert_called_once_with(outcome='not_modified')
+
+
+def test_reconcile_prunes_expired_mirrors_without_reading_source():
+    service = MagicMock()
+    mirror_map = {OLD_KEY: {'mirror_id': 'mirror1', 'digest': 'd', 'end_ts': 0}}
+    with patch.object(mirror, 'load_mirror_map', return_value=mirror_map), \
+         patch.object(mirror, 'save_mirror_map') as save:
+        reconcile_mirrors(lambda cal: service)
+    service.events().get.assert_not_called()
+    assert save.call_args.args[0] == {}
+
+
+def test_reconcile_prunes_from_the_persistent_expiry_index():
+    service = MagicMock()
+    service.events().get().execute.side_effect = _http_error(304)
+    live = {KEY1: {'mirror_id': 'mirror1', 'digest': 'd', 'etag': '"e"', 'end_ts': 4102444800}}
+    with patch.object(mirror, 'load_mirror_map', return_value=live) as load:
+        reconcile_mirrors(lambda cal: service)
+        mirror.update_mirror_map({OLD_KEY: {'mirror_id': 'mirror2', 'end_ts': 0}})
+        assert mirror.mirror_index().expired(1, {'tsouthworth@gmail.com'}) == []  # other calendars untouched
+        service.events().get.reset_mock()
+        reconcile_mirrors(lambda cal: service)
+    load.assert_called_once()  # the index was updated in place, never rebuilt
+    assert OLD_KEY not in mirror.mirror_index().records
+    assert [c.kwargs['eventId'] for c in service.events().get.call_args_list] == ['evt1']
+
+
+def _budget_map():
+    # Three independent mirrors, deliberately out of start order.
+    return {
+        _key('a@x.com', 'late'): {'mirror_id': 'm3', 'digest': 'd', 'etag': '"e"', 'start_ts': 4102444800},
+        _key('a@x.com', 'soon'): {'mirror_id': 'm1', 'digest': 'd', 'etag': '"e"', 'start_ts': 4000000000},
+        _key('a@x.com', 'mid'): {'mirror_id': 'm2', 'digest': 'd', 'etag': '"e"', 'start_ts': 4050000000},
+    }
+
+
+def test_reconcile_budget_resumes_from_cursor_soonest_first():
+    service = MagicMock()
+    service.events().get().execute.side_effect = _http_error(304)
+    service.events().get.reset_mock()
+    mm = _budget_map()
+    read_ids = lambda: [c.kwargs['eventId'] for c in service.events().get.call_args_list]
+
+    with patch.object(mirror, 'load_mirror_map', return_value=mm), \
+         patch.object(mirror, 'save_mirror_map'):
+        first = reconcile_mirrors(lambda cal: service, max_calls=2)
+        assert read_ids() == ['soon', 'mid']
+        assert first == {'backlog': 1, 'sweep_seconds': None}
+
+        second = reconcile_mirrors(lambda cal: service, max_calls=2)
+    assert read_ids() == ['soon', 'mid', 'late']  # resumed, didn't restart
+    assert second['backlog'] == 0 and second['sweep_seconds'] is not None
+    assert mirror.load_reconcile_cursor() is None  # next run starts a fresh sweep
+
+
+def test_reconcile_time_budget_stops_run():
+    service = MagicMock()
+    with patch.object(mirror, 'load_mirror_map', return_value=_budget_map()), \
+         patch.object(mirror, 'save_mirror_map'):
+        result = reconcile_mirrors(lambda cal: service, max_seconds=0)
+    service.events().get.assert_not_called()
+    assert result['backlog'] == 3
+
+
+def test_end_ts_uses_last_occurrence_for_bounded_series():
+    base = {'start': {'dateTime': '2030-01-01T09:00:00Z'}, 'end': {'dateTime': '2030-01-01T10:00:00Z'}}
+    until = dict(base, recurrence=['RRULE:FREQ=WEEKLY;UNTIL=20300301T090000Z'])
+    assert event_end_ts(until) == 1898589600  # 2030-03-01T10:00:00Z
+    counted = dict(base, recurrence=['RRULE:FREQ=DAILY;COUNT=3'])
+    assert event_end_ts(counted) >= 1893664800  # no earlier than 2030-01-03T10:00:00Z
+
+
+def test_end_ts_none_for_unbounded_series():
+    ev = {'start': {'dateTime': '2030-01-01T09:00:00Z'}, 'end': {'dateTime': '2030-01-01T10:00:00Z'},
+          'recurrence': ['RRULE:FREQ=WEEKLY;BYDAY=MO']}
+    assert event_end_ts(ev) is None
+
+
 # --- recurrence + instance exceptions ---
 
 def test_mirror_body_copies_recurrence():
@@ -146,29 +440,63 @@ def _exception(status=None):
     return e
 
 
+def test_instance_id_timed_and_all_day():
+    assert _instance_id('mir1', {'dateTime': '2030-01-01T04:00:00-05:00'}) == 'mir1_20300101T090000Z'
+    assert _instance_id('mir1', {'date': '2030-01-01'}) == 'mir1_20300101'
+
+
 def test_apply_instance_exception_cancels_mirror_instance():
     service = MagicMock()
-    service.events().instances().execute.return_value = {'items': [{'id': 'mir1_i', 'status': 'confirmed'}]}
-    mm = {'cal@x.com::master1': {'mirror_id': 'mir1', 'snapshot': {}}}
+    mm = {MASTER_KEY: {'mirror_id': 'mir1', 'digest': 'stale'}}
     with patch.object(mirror, 'load_mirror_map', return_value=mm):
         apply_instance_exception(service, 'cal@x.com', _exception(status='cancelled'))
-    service.events().delete.assert_called_once()
+    # The instance ID is computed locally; no instances() lookup needed.
+    assert service.events().delete.call_args.kwargs['eventId'] == 'mir1_20300101T090000Z'
+    service.events().instances.assert_not_called()
     service.events().patch.assert_not_called()
 
 
 def test_apply_instance_exception_moves_mirror_instance():
     service = MagicMock()
-    service.events().instances().execute.return_value = {'items': [{'id': 'mir1_i', 'status': 'confirmed'}]}
-    mm = {'cal@x.com::master1': {'mirror_id': 'mir1', 'snapshot': {}}}
+    mm = {MASTER_KEY: {'mirror_id': 'mir1', 'digest': 'stale'}}
     with patch.object(mirror, 'load_mirror_map', return_value=mm):
         apply_instance_exception(service, 'cal@x.com', _exception())
-    service.events().patch.assert_called_once()
+    assert service.events().patch.call_args.kwargs['eventId'] == 'mir1_20300101T090000Z'
+    service.events().instances.assert_not_called()
     service.events().delete.assert_not_called()
 
 
+def test_apply_instance_exception_falls_back_to_lookup_on_404():
+    service = MagicMock()
+    service.events().patch().execute.side_effect = [_http_error(404), {}]
+    service.events().instances().execute.return_value = {'items': [{'id': 'mir1_odd', 'status': 'confirmed'}]}
+    mm = {MASTER_KEY: {'mirror_id': 'mir1', 'digest': 'stale'}}
+    with patch.object(mirror, 'load_mirror_map', return_value=mm):
+        apply_instance_exception(service, 'cal@x.com', _exception())
+    assert service.events().patch.call_args.kwargs['eventId'] == 'mir1_odd'
+
+
+def test_apply_instance_exceptions_groups_by_series():
+    service = MagicMock()
+    second = dict(_exception(status='cancelled'), originalStartTime={'dateTime': '2030-01-08T09:00:00Z'})
+    mm = {MASTER_KEY: {'mirror_id': 'mir1', 'digest': 'stale'}}
+    with patch.object(mirror, 'load_mirror_map', return_value=mm) as load:
+        apply_instance_exceptions(service, 'cal@x.com', [_exception(), second])
+    load.assert_called_once()
+    service.events().patch.assert_called_once()
+    assert service.events().delete.call_args.kwargs['eventId'] == 'mir1_20300108T090000Z'
+
+
 def test_apply_instance_exception_noop_when_series_not_mirrored():
     service = MagicMock()
     with patch.object(mirror, 'load_mirror_map', return_value={}):
         apply_instance_exception(service, 'cal@x.com', _exception(status='cancelled'))
     service.events().delete.assert_not_called()
     service.events().patch.assert_not_called()
+
+
+def test_apply_exception_returns_false_when_nothing_was_written():
+    service = MagicMock()
+    service.events().instances().execute.return_value = {'items': []}
+    service.events().patch().execute.side_effect = _http_error(404)
+    assert mirror._apply_exception(service, SHARED_CALENDAR_ID, 'mirror1', _exception()) is False
@@ -0,0 +1,27 @@
+# ~/calendar_bot/tests/test_pacing.py
+from utils.pacing import AdaptivePollInterval
+
+
+def _pacing():
+    return AdaptivePollInterval(base=300, minimum=60, maximum=1800, churn_high=10)
+
+
+def test_backs_off_while_channel_live_and_delivering():
+    assert _pacing().interval('a', channel_live=True, channel_heard=True) == 1800
+
+
+def test_uses_base_until_channel_proves_it_delivers():
+    assert _pacing().interval('a', channel_live=True, channel_heard=False) == 300
+
+
+def test_tightens_when_channel_lapsed():
+    assert _pacing().interval('a', channel_live=False, channel_heard=False) == 60
+
+
+def test_tightens_for_busy_calendar_and_recovers():
+    pacing = _pacing()
+    pacing.observe('a', 40)
+    assert pacing.interval('a', True, True) == 60
+    for _ in range(10):
+        pacing.observe('a', 0)
+    assert pacing.interval('a', True, True) == 1800
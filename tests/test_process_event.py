@@ -4,7 +4,11 @@ import pytest
 from unittest.mock import MagicMock, patch
 
 # Import the function we want to test
-from utils.process_event import handle_event
+import json
+
+from utils import process_event
+from utils.process_event import handle_event, ProcessedStore, load_processed, save_processed
+from utils.routing import Router
 
 # --- Test Data Fixtures ---
 # These functions create reusable, fake event data for our tests.
@@ -181,3 +185,83 @@ def test_duplicates_and_deletes_gmail_event(mock_google_service, from_gmail_even
     
     mock_google_service.events().insert.assert_called_once()
     mock_google_service.events().delete.assert_called_once()
+
+
+def test_invites_every_routed_target_in_one_patch(mock_google_service, regular_event):
+    mock_google_service.events().get.return_value.execute.return_value = regular_event
+    router = Router([{'targets': ['family@x.com', 'team@x.com']}])
+
+    with patch.object(process_event, 'get_router', return_value=router):
+        handle_event(service=mock_google_service, calendar_id='primary',
+                     event_id='regular_event_123', success_counter=MagicMock())
+
+    mock_google_service.events().patch.assert_called_once()
+    emails = [a['email'] for a in mock_google_service.events().patch.call_args.kwargs['body']['attendees']]
+    assert emails == ['user@example.com', 'family@x.com', 'team@x.com']
+
+
+def test_unrouted_event_is_not_copied(mock_google_service, regular_event):
+    mock_google_service.events().get.return_value.execute.return_value = regular_event
+    router = Router([{'summary': '^Nope', 'targets': ['family@x.com']}])
+
+    with patch.object(process_event, 'get_router', return_value=router), \
+         patch('utils.process_event.remove_mirror') as mock_remove:
+        handle_event(service=mock_google_service, calendar_id='primary',
+                     event_id='regular_event_123', success_counter=MagicMock())
+
+    mock_google_service.events().patch.assert_not_called()
+    mock_remove.assert_called_once()
+
+
+# --- ProcessedStore ---
+
+def test_processed_store_expires_only_ended_events():
+    store = ProcessedStore()
+    store.add('old', 'a@x.com', end_ts=100)
+    store.add('new', 'b@x.com', end_ts=1000)
+    store.add('forever', 'a@x.com', end_ts=None)  # unbounded series
+    assert store.expire(500) == ['old']
+    assert 'old' not in store
+    assert set(store) == {'new', 'forever'}
+
+
+def test_processed_store_round_trips_and_migrates_legacy(tmp_path):
+    path = tmp_path / 'processed.json'
+    path.write_text(json.dumps(['legacy1']))
+    with patch.object(process_event, 'PROCESSED_FILE', path), \
+         patch.object(process_event.time, 'time', return_value=1000.5):
+        process_event.migrate_processed()
+        store = load_processed()
+        assert 'legacy1' in store
+        store.add('b1', 'cal@x.com', end_ts=42)
+        save_processed(store)
+        reloaded = load_processed()
+    # Migrated IDs count as ended at migration, so they expire like the rest.
+    assert dict(reloaded.items()) == {
+        'legacy1': {'calendar_id': None, 'end_ts': 1000},
+        'b1': {'calendar_id': 'cal@x.com', 'end_ts': 42},
+    }
+    assert sorted(reloaded.expire(1001)) == ['b1', 'legacy1']
+
+
+def test_scoped_save_keeps_global_entries_while_held(tmp_path):
+    path = tmp_path / 'processed.json'
+    path.write_text(json.dumps(['legacy1', 'legacy2']))
+    with patch.object(process_event, 'PROCESSED_FILE', path):
+        shard = load_processed()
+        shard.discard('legacy2')
+        shard.add('ours', 'a@x.com', end_ts=2)
+        save_processed(shard, calendar_ids=['a@x.com'])
+        assert set(load_processed()) == {'legacy1', 'ours'}
+
+
+def test_scoped_save_leaves_other_calendars_entries(tmp_path):
+    path = tmp_path / 'processed.json'
+    with patch.object(process_event, 'PROCESSED_FILE', path):
+        other = ProcessedStore()
+        other.add('theirs', 'b@x.com', end_ts=1)
+        save_processed(other)
+        mine = ProcessedStore()
+        mine.add('ours', 'a@x.com', end_ts=2)
+        save_processed(mine, calendar_ids=['a@x.com'])
+        assert set(load_processed()) == {'theirs', 'ours'}
@@ -0,0 +1,66 @@
+# ~/calendar_bot/tests/test_profiling.py
+import pstats
+
+import pytest
+
+from utils.profiling import PollProfiler, collapsed_stacks, profile_path, read_profile_status
+
+PROFILE_ID = 'ab' * 16
+
+
+def _busy():
+    return sum(i * i for i in range(20000))
+
+
+def _poll():
+    _busy()
+
+
+def test_profiles_the_next_n_polls_then_writes_pstats_and_collapsed_stacks(tmp_path):
+    profiler = PollProfiler(directory=tmp_path)
+    profiler.arm(PROFILE_ID, polls=2)
+    assert read_profile_status(PROFILE_ID, tmp_path)['state'] == 'armed'
+
+    for _ in range(3):  # the third poll runs unprofiled
+        with profiler.profiling():
+            _poll()
+
+    assert read_profile_status(PROFILE_ID, tmp_path) == {'state': 'done', 'polls': 2}
+    stats = pstats.Stats(str(profile_path(PROFILE_ID, 'pstats', tmp_path)))
+    assert any(name == '_busy' for _, _, name in stats.stats)
+    collapsed = profile_path(PROFILE_ID, 'collapsed', tmp_path).read_text().splitlines()
+    assert any('_poll (test_profiling.py' in line and ';_busy (test_profiling.py' in line for line in collapsed)
+    assert all(line.rsplit(' ', 1)[1].isdigit() for line in collapsed)
+
+
+def test_window_closes_even_without_a_poll(tmp_path):
+    now = [1000.0]
+    profiler = PollProfiler(directory=tmp_path, clock=lambda: now[0])
+    profiler.arm(PROFILE_ID, seconds=60)
+    profiler.finish_if_due()
+    assert read_profile_status(PROFILE_ID, tmp_path)['state'] == 'armed'
+    now[0] += 61
+    profiler.finish_if_due()
+    assert read_profile_status(PROFILE_ID, tmp_path) == {'state': 'done', 'polls': 0}
+
+
+def test_rejects_malformed_ids(tmp_path):
+    with pytest.raises(ValueError):
+        PollProfiler(directory=tmp_path).arm('../../etc/passwd')
+
+
+def test_collapsed_stacks_split_shared_callees_by_caller():
+    a, b, leaf, root = ('m.py', 1, 'a'), ('m.py', 2, 'b'), ('m.py', 3, 'leaf'), ('m.py', 4, 'root')
+
+    class Stats:
+        stats = {
+            root: (1, 1, 0.0, 4.0, {}),
+            a: (1, 1, 0.0, 3.0, {root: (1, 1, 0.0, 3.0)}),
+            b: (1, 1, 0.0, 1.0, {root: (1, 1, 0.0, 1.0)}),
+            leaf: (2, 2, 4.0, 4.0, {a: (1, 1, 3.0, 3.0), b: (1, 1, 1.0, 1.0)}),
+        }
+    lines = dict(line.rsplit(' ', 1) for line in collapsed_stacks(Stats).splitlines())
+    assert lines == {
+        'root (m.py:4);a (m.py:1);leaf (m.py:3)': '3000000',
+        'root (m.py:4);b (m.py:2);leaf (m.py:3)': '1000000',
+    }
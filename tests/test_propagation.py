@@ -0,0 +1,42 @@
+# ~/calendar_bot/tests/test_propagation.py
+import json
+import time
+from datetime import datetime, timezone
+
+from prometheus_client import REGISTRY
+
+from utils import propagation, status
+from utils.propagation import LatencyWindow, record_propagation, triggered_by, updated_ts
+
+
+def _updated(seconds_ago):
+    ts = datetime.fromtimestamp(time.time() - seconds_ago, tz=timezone.utc)
+    return ts.isoformat(timespec='milliseconds').replace('+00:00', 'Z')
+
+
+def test_updated_ts_parses_google_timestamps():
+    assert updated_ts({'updated': '2025-01-01T00:00:00.000Z'}) == datetime(2025, 1, 1, tzinfo=timezone.utc).timestamp()
+    assert updated_ts({}) is None
+
+
+def test_window_quantiles_use_nearest_rank():
+    window = LatencyWindow(size=100)
+    assert window.summary() is None
+    for seconds in range(1, 21):
+        window.add(float(seconds))
+    assert window.summary() == {'p50': 10.0, 'p95': 19.0, 'count': 20}
+
+
+def test_records_with_the_surrounding_trigger_and_publishes(tmp_path, monkeypatch):
+    monkeypatch.setattr(status, 'STATUS_FILE', tmp_path / 'engine_status.json')
+    monkeypatch.setattr(propagation, '_windows', {})
+    labels = {'calendar_id': 'prop@example.com', 'action': 'invite_added', 'trigger': 'webhook'}
+
+    with triggered_by('webhook'):
+        record_propagation('prop@example.com', 'invite_added', {'updated': _updated(30)})
+    record_propagation('prop@example.com', 'invite_added', {'id': 'no-updated'})  # ignored
+
+    assert REGISTRY.get_sample_value('calendar_bot_propagation_latency_seconds_count', labels) == 1
+    propagation.publish_propagation_summary('engine')
+    summary = json.loads(status.STATUS_FILE.read_text())['propagation']['engine']['triggers']['webhook']
+    assert summary['count'] == 1 and 29 <= summary['p50'] <= 31
@@ -0,0 +1,42 @@
+# ~/calendar_bot/tests/test_routing.py
+import pytest
+
+from utils.routing import Router, load_router, DEFAULT_TARGET
+
+RULES = [
+    {'source': 'a@x.com', 'event_type': 'birthday', 'targets': ['family@x.com']},
+    {'organizer_domain': 'Work.com', 'targets': ['team@x.com', 'shared@x.com']},
+    {'summary': '(?i)^\\[private\\]', 'targets': []},
+    {'targets': ['shared@x.com']},
+]
+
+
+def test_first_matching_rule_wins():
+    router = Router(RULES)
+    assert router.route('a@x.com', {'eventType': 'birthday'}) == ('family@x.com',)
+    # The birthday rule is scoped to a@x.com.
+    assert router.route('b@x.com', {'eventType': 'birthday'}) == ('shared@x.com',)
+
+
+def test_organizer_domain_is_case_insensitive():
+    router = Router(RULES)
+    event = {'organizer': {'email': 'boss@WORK.com'}}
+    assert router.route('b@x.com', event) == ('team@x.com', 'shared@x.com')
+
+
+def test_empty_targets_suppresses_routing():
+    assert Router(RULES).route('b@x.com', {'summary': '[Private] dentist'}) == ()
+
+
+def test_targets_lists_every_destination_once():
+    assert Router(RULES).targets == ['family@x.com', 'team@x.com', 'shared@x.com']
+
+
+def test_missing_file_routes_everything_to_default(tmp_path):
+    router = load_router(tmp_path / 'absent.json')
+    assert router.route('a@x.com', {}) == (DEFAULT_TARGET,)
+
+
+def test_malformed_rule_is_rejected():
+    with pytest.raises(ValueError):
+        Router([{'organiser': 'typo.com', 'targets': []}])
@@ -0,0 +1,48 @@
+# ~/calendar_bot/tests/test_shards.py
+import time
+
+from utils.shards import HashRing, ShardCoordinator, owner_socket
+
+CALENDARS = [f"user{i}@example.com" for i in range(20)]
+
+
+def test_ring_moves_only_the_joining_nodes_share():
+    before = HashRing(['a', 'b'])
+    after = HashRing(['a', 'b', 'c'])
+    for cal in CALENDARS:
+        # A calendar either stays put or moves to the new node, never between old ones.
+        assert after.owner(cal) in (before.owner(cal), 'c')
+
+
+def test_two_shards_split_calendars_without_overlap(tmp_path):
+    db = tmp_path / 'shards.db'
+    a = ShardCoordinator('a', CALENDARS, tmp_path / 'a.sock', db_path=db)
+    b = ShardCoordinator('b', CALENDARS, tmp_path / 'b.sock', db_path=db)
+    a.heartbeat()
+    assert a.owned == set(CALENDARS)  # alone on the ring
+    b.heartbeat()  # b joins, but a still holds every lease
+    assert b.owned == set()
+    a.heartbeat()  # a releases what the ring now gives b
+    b.heartbeat()
+    assert a.owned and b.owned
+    assert a.owned.isdisjoint(b.owned)
+    assert a.owned | b.owned == set(CALENDARS)
+
+
+def test_dead_shard_leases_lapse_to_survivor(tmp_path):
+    db = tmp_path / 'shards.db'
+    a = ShardCoordinator('a', CALENDARS, tmp_path / 'a.sock', db_path=db, lease_ttl=1)
+    b = ShardCoordinator('b', CALENDARS, tmp_path / 'b.sock', db_path=db, lease_ttl=1)
+    a.heartbeat(); b.heartbeat(); a.heartbeat(); b.heartbeat()
+    time.sleep(1.1)  # a stops heartbeating
+    b.heartbeat()
+    assert b.owned == set(CALENDARS)
+
+
+def test_owner_socket_routes_to_lease_holder(tmp_path):
+    db = tmp_path / 'shards.db'
+    a = ShardCoordinator('a', CALENDARS, tmp_path / 'a.sock', db_path=db)
+    a.heartbeat()
+    assert owner_socket(CALENDARS[0], db_path=db) == str(tmp_path / 'a.sock')
+    a.leave()
+    assert owner_socket(CALENDARS[0], db_path=db) is None
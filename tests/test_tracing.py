@@ -0,0 +1,68 @@
+# ~/calendar_bot/tests/test_tracing.py
+import json
+import logging
+
+import pytest
+from prometheus_client import CollectorRegistry, Histogram
+from prometheus_client.openmetrics.exposition import generate_latest
+
+from utils import tracing
+from utils.logger import TraceContextFilter
+from utils.tracing import current_trace_id, span, timed
+
+
+def test_child_spans_share_the_trace_and_export_as_otlp(tmp_path, monkeypatch):
+    export = tmp_path / 'traces.jsonl'
+    monkeypatch.setattr(tracing, 'TRACE_EXPORT_FILE', str(export))
+
+    with span('poll') as root:
+        with span('sync_calendar', calendar_id='a@example.com') as child:
+            assert current_trace_id() == root.trace_id
+        with pytest.raises(ValueError):
+            with span('process_change'):
+                raise ValueError("boom")
+    assert current_trace_id() is None
+
+    [line] = export.read_text().splitlines()  # one line per finished trace
+    spans = {s['name']: s for s in json.loads(line)['resourceSpans'][0]['scopeSpans'][0]['spans']}
+    assert {s['traceId'] for s in spans.values()} == {root.trace_id}
+    assert spans['sync_calendar']['parentSpanId'] == root.span_id == child.parent_id
+    assert 'parentSpanId' not in spans['poll']
+    assert spans['sync_calendar']['attributes'] == [{'key': 'calendar_id', 'value': {'stringValue': 'a@example.com'}}]
+    assert spans['process_change']['status'] == {'code': 2, 'message': 'ValueError: boom'}
+
+
+def test_spans_are_collected_only_for_export_and_bounded(tmp_path, monkeypatch):
+    monkeypatch.setattr(tracing, 'TRACE_EXPORT_FILE', '')
+    with span('poll') as root:
+        with span('sync_calendar'):
+            pass
+    assert root._trace is None
+
+    export = tmp_path / 'traces.jsonl'
+    monkeypatch.setattr(tracing, 'TRACE_EXPORT_FILE', str(export))
+    monkeypatch.setattr(tracing, 'TRACE_MAX_SPANS', 3)
+    with span('poll') as root:
+        for _ in range(5):
+            with span('calendar.events.get'):
+                pass
+    spans = json.loads(export.read_text())['resourceSpans'][0]['scopeSpans'][0]['spans']
+    assert len(spans) == 4  # three children and the root
+    assert {'key': 'trace.dropped_spans', 'value': {'intValue': '2'}} in spans[-1]['attributes']
+
+
+def test_log_records_carry_the_trace_id():
+    record = logging.LogRecord('calendar_bot', logging.INFO, __file__, 1, 'hello', None, None)
+    with span('poll') as root:
+        TraceContextFilter().filter(record)
+    assert record.trace_id == root.trace_id
+    assert record.trace == f" [trace={root.trace_id}]"
+
+
+def test_timed_histograms_link_to_the_trace_as_exemplar():
+    registry = CollectorRegistry()
+    histogram = Histogram('traced_seconds', 'test', registry=registry)
+    with span('poll') as root:
+        with timed(histogram):
+            pass
+    assert f'trace_id="{root.trace_id}"' in generate_latest(registry).decode()
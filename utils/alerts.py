@@ -0,0 +1,195 @@
+# ~/calendar_bot/utils/alerts.py
+"""
+Asynchronous, aggregated alert emails.
+
+`alert()` only queues: a background thread owns SendGrid, so the poll never
+waits on it. Alerts are deduplicated by fingerprint (the subject unless the
+caller passes something sharper, e.g. the failing calendar and exception
+type) and collected for ALERT_DIGEST_SECONDS from the first one; then one
+email goes out. It carries the original subject and body if only a single
+alert came in, or a digest listing each fingerprint with its count, first
+and last time and a few sample bodies. A Google outage failing every event
+thus sends one digest per window instead of an email per event.
+
+At most ALERT_MAX_EMAILS_PER_HOUR go out; past that, alerts keep folding
+into the pending digest until a slot frees up. Alerts whose email failed
+(SendGrid down, its circuit breaker open) are dropped, since each was also
+logged when raised. Outcomes are counted in calendar_bot_alerts_total and
+calendar_bot_alert_emails_total.
+"""
+import atexit
+import os
+import queue
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+
+from utils.email_utils import send_error_email
+from utils.logger import logger
+from utils.metrics import ALERTS_TOTAL, ALERT_EMAILS_TOTAL, ALERT_OUTBOX_DEPTH
+
+ALERT_DIGEST_SECONDS = float(os.getenv('ALERT_DIGEST_SECONDS', '60'))
+ALERT_MAX_EMAILS_PER_HOUR = int(os.getenv('ALERT_MAX_EMAILS_PER_HOUR', '6'))
+# Alerts waiting for the sender thread; past this, new ones are dropped.
+ALERT_QUEUE_SIZE = int(os.getenv('ALERT_QUEUE_SIZE', '1000'))
+SAMPLES_PER_FINGERPRINT = 3  # bodies quoted per fingerprint in a digest
+
+_HOUR = 3600
+
+
+class _Pending:
+    __slots__ = ('subject', 'count', 'first', 'last', 'samples')
+
+    def __init__(self, subject, body, at):
+        self.subject = subject
+        self.count = 1
+        self.first = self.last = at
+        self.samples = [body]
+
+
+class AlertPipeline:
+    def __init__(self, send=send_error_email, digest_seconds=None, max_emails_per_hour=None,
+                 queue_size=None, clock=time.monotonic, wall_clock=time.time):
+        self._send = send
+        self.digest_seconds = ALERT_DIGEST_SECONDS if digest_seconds is None else digest_seconds
+        self.max_emails_per_hour = ALERT_MAX_EMAILS_PER_HOUR if max_emails_per_hour is None else max_emails_per_hour
+        self._queue = queue.Queue(ALERT_QUEUE_SIZE if queue_size is None else queue_size)
+        self._clock = clock
+        self._wall_clock = wall_clock
+        self._lock = threading.Lock()
+        self._pending = {}  # fingerprint -> _Pending, in arrival order
+        self._due = None  # when the pending digest goes out (monotonic)
+        self._sent = deque()  # monotonic times of recent emails, for the hourly limit
+        self._worker_pid = None
+
+    def submit(self, subject, body, fingerprint=None):
+        """Queue an alert. Never blocks."""
+        try:
+            self._queue.put_nowait((fingerprint or subject, subject, body, self._wall_clock(), self._clock()))
+        except queue.Full:
+            ALERTS_TOTAL.labels(outcome='dropped').inc()
+            logger.warning("📪 Alert queue full; dropping “%s”.", subject)
+            return
+        ALERT_OUTBOX_DEPTH.set(self.depth())
+        self._ensure_worker()
+
+    def depth(self):
+        """Alerts queued or pending in the next email."""
+        with self._lock:
+            pending = sum(p.count for p in self._pending.values())
+        return self._queue.qsize() + pending
+
+    def run_once(self, timeout=0):
+        """Fold queued alerts into the pending digest (waiting up to `timeout`
+        seconds for the first one, forever if None), then send it if it is due."""
+        items = []
+        try:
+            items.append(self._queue.get(timeout=timeout))
+            while True:
+                items.append(self._queue.get_nowait())
+        except queue.Empty:
+            pass
+        for item in items:
+            self._fold(*item)
+        with self._lock:
+            due = self._due is not None and self._clock() >= self._due
+        if due:
+            self._send_pending()
+        ALERT_OUTBOX_DEPTH.set(self.depth())
+
+    def flush(self):
+        """Send whatever is queued or pending now, regardless of the window and
+        the hourly limit (at shutdown)."""
+        self.run_once()
+        self._sent.clear()
+        with self._lock:
+            self._due = self._clock() if self._pending else None
+        self.run_once()
+
+    def _fold(self, fingerprint, subject, body, at, queued):
+        with self._lock:
+            pending = self._pending.get(fingerprint)
+            if pending is None:
+                self._pending[fingerprint] = _Pending(subject, body, at)
+                if self._due is None:  # the window opens with the first alert raised
+                    self._due = queued + self.digest_seconds
+                return
+            pending.count += 1
+            pending.last = at
+            if len(pending.samples) < SAMPLES_PER_FINGERPRINT:
+                pending.samples.append(body)
+        ALERTS_TOTAL.labels(outcome='suppressed').inc()
+
+    def _send_pending(self):
+        now = self._clock()
+        while self._sent and now - self._sent[0] >= _HOUR:
+            self._sent.popleft()
+        if self.max_emails_per_hour and len(self._sent) >= self.max_emails_per_hour:
+            with self._lock:
+                self._due = self._sent[0] + _HOUR  # keep folding until a slot frees up
+            ALERT_EMAILS_TOTAL.labels(outcome='deferred').inc()
+            logger.warning("📪 Alert email limit (%d/hour) reached; holding the digest.", self.max_emails_per_hour)
+            return
+        with self._lock:
+            pending, self._pending, self._due = self._pending, {}, None
+        if not pending:
+            return
+        subject, body = _compose(pending)
+        self._sent.append(now)
+        sent = self._send(subject, body)
+        ALERT_EMAILS_TOTAL.labels(outcome='sent' if sent else 'failed').inc()
+        ALERTS_TOTAL.labels(outcome='sent' if sent else 'dropped').inc(len(pending))
+
+    def _ensure_worker(self):
+        # Started on first use, and again in a forked child (threads don't survive fork).
+        if self._worker_pid == os.getpid():
+            return
+        with self._lock:
+            if self._worker_pid == os.getpid():
+                return
+            self._worker_pid = os.getpid()
+        threading.Thread(target=self._work, name='alert-sender', daemon=True).start()
+
+    def _work(self):
+        while True:
+            with self._lock:
+                wait = max(0.0, self._due - self._clock()) if self._due is not None else None
+            try:
+                self.run_once(timeout=wait)
+            except Exception as e:  # the sender must outlive any one bad email
+                logger.error("Alert sender failed: %s", e, exc_info=True)
+
+
+def _when(ts):
+    return datetime.fromtimestamp(ts, timezone.utc).strftime('%Y-%m-%d %H:%M:%S UTC')
+
+
+def _compose(pending):
+    """Subject and body of the email for `pending` alerts."""
+    if len(pending) == 1:
+        (only,) = pending.values()
+        if only.count == 1:
+            return only.subject, only.samples[0]
+    total = sum(p.count for p in pending.values())
+    first = min(p.first for p in pending.values())
+    last = max(p.last for p in pending.values())
+    sections = [f"{total} alerts ({len(pending)} distinct) between {_when(first)} and {_when(last)}."]
+    for p in sorted(pending.values(), key=lambda p: -p.count):
+        samples = '\n---\n'.join(p.samples)
+        more = f"\n(+{p.count - len(p.samples)} more like these)" if p.count > len(p.samples) else ""
+        sections.append(f"[×{p.count}] {p.subject}\nfirst {_when(p.first)}, last {_when(p.last)}\n{samples}{more}")
+    return f"Calendar Bot - {total} alerts ({len(pending)} distinct)", '\n\n'.join(sections)
+
+
+_pipeline = AlertPipeline()
+atexit.register(_pipeline.flush)
+
+
+def alert(subject, body, fingerprint=None):
+    """Raise an alert email without waiting on SendGrid (see module docstring)."""
+    _pipeline.submit(subject, body, fingerprint)
+
+
+def outbox_depth():
+    return _pipeline.depth()
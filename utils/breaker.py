@@ -0,0 +1,241 @@
+# ~/calendar_bot/utils/breaker.py
+"""
+Circuit breakers for the bot's external dependencies.
+
+One breaker per Calendar API account (`calendar:<email>`) plus one each for
+SendGrid and Uptime Kuma. A breaker trips open after BREAKER_FAILURE_THRESHOLD
+consecutive failures; while open, `guard()` raises CircuitOpen immediately
+instead of spending the poll's time (and retries) on a dependency known to be
+down, e.g. an account whose refresh token was revoked. After the reset timeout
+one probe call is let through (half-open): success closes the breaker, failure
+reopens it with the timeout doubled, up to BREAKER_MAX_RESET_SECONDS.
+
+Transitions are logged, exported as `calendar_bot_circuit_breaker_state` and
+written to the engine status file so the web tier's /health can show them. The
+log line and the status write happen after the breaker's lock is released, so
+callers of `guard()` never wait on disk I/O or another process's file lock.
+
+Each process publishes all of its breakers as one entry of the 'breakers'
+section, keyed by instance (`set_instance()`; the engine republishes it after
+every poll with `publish_breakers()`), so shards don't overwrite each other and
+a restarted engine replaces what its predecessor left. A new breaker is
+published closed as soon as it is created.
+"""
+import os
+import socket
+import threading
+import time
+from contextlib import contextmanager
+
+from utils.logger import logger
+from utils.metrics import CIRCUIT_BREAKER_STATE, CIRCUIT_BREAKER_REJECTED_TOTAL
+from utils.status import publish_status
+
+BREAKER_FAILURE_THRESHOLD = int(os.getenv('BREAKER_FAILURE_THRESHOLD', '5'))
+BREAKER_RESET_SECONDS = float(os.getenv('BREAKER_RESET_SECONDS', '60'))
+BREAKER_MAX_RESET_SECONDS = float(os.getenv('BREAKER_MAX_RESET_SECONDS', '900'))
+
+CLOSED, HALF_OPEN, OPEN = 'closed', 'half_open', 'open'
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitOpen(Exception):
+    """A call was short-circuited because its dependency's breaker is open."""
+
+    def __init__(self, name, retry_in):
+        super().__init__(f"Circuit breaker {name} is open; next probe in {retry_in:.0f}s.")
+        self.name = name
+        self.retry_in = retry_in
+
+
+class CircuitBreaker:
+    def __init__(self, name, failure_threshold=BREAKER_FAILURE_THRESHOLD,
+                 reset_timeout=BREAKER_RESET_SECONDS, max_reset_timeout=BREAKER_MAX_RESET_SECONDS,
+                 clock=time.monotonic):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.max_reset_timeout = max_reset_timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0  # consecutive
+        self._timeout = reset_timeout  # current open period; doubles on a failed probe
+        self._probe_at = None  # when an open breaker lets its next probe through
+        self._probing = False
+        self._opened_at = None  # wall time, for /health
+        self._transitions = 0  # sequence number of the latest transition
+        self._published = 0  # sequence number of the last transition published
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state
+
+    def before_call(self):
+        """Raises CircuitOpen unless a call may go out now."""
+        transition = None
+        with self._lock:
+            if self._state == CLOSED:
+                return
+            now = self._clock()
+            if self._state == OPEN and now >= self._probe_at:
+                transition = self._transition(HALF_OPEN)
+            probe = self._state == HALF_OPEN and not self._probing
+            if probe:
+                self._probing = True  # this call is the probe; others wait for its outcome
+            retry_in = max(0.0, self._probe_at - now) if self._state == OPEN else 0.0
+        self._announce(transition)
+        if probe:
+            return
+        CIRCUIT_BREAKER_REJECTED_TOTAL.labels(breaker=self.name).inc()
+        raise CircuitOpen(self.name, retry_in)
+
+    def reject_if_open(self):
+        """Raises CircuitOpen while the breaker is open and its next probe
+        isn't due, without taking the probe slot; for cheap setup steps ahead
+        of the guarded calls."""
+        with self._lock:
+            if self._state != OPEN:
+                return
+            retry_in = self._probe_at - self._clock()
+        if retry_in > 0:
+            CIRCUIT_BREAKER_REJECTED_TOTAL.labels(breaker=self.name).inc()
+            raise CircuitOpen(self.name, retry_in)
+
+    def record_success(self):
+        transition = None
+        with self._lock:
+            self._failures = 0
+            self._probing = False
+            if self._state != CLOSED:
+                self._timeout = self.reset_timeout
+                transition = self._transition(CLOSED)
+        self._announce(transition)
+
+    def record_failure(self):
+        transition = None
+        with self._lock:
+            self._failures += 1
+            if self._state == HALF_OPEN or (self._state == OPEN and self._clock() >= self._probe_at):
+                # A failed probe (or a failed setup step standing in for one).
+                self._probing = False
+                self._timeout = min(self._timeout * 2, self.max_reset_timeout)
+                transition = self._open()
+            elif self._state == CLOSED and self._failures >= self.failure_threshold:
+                transition = self._open()
+        self._announce(transition)
+
+    @contextmanager
+    def guard(self, is_failure=lambda exc: True):
+        """Run the block through the breaker. Exceptions for which
+        `is_failure(exc)` is False (e.g. a 404: the dependency answered) count
+        as successes; every exception is re-raised."""
+        self.before_call()
+        try:
+            yield
+        except BaseException as e:
+            if isinstance(e, Exception) and is_failure(e):
+                self.record_failure()
+            else:
+                self.record_success()
+            raise
+        self.record_success()
+
+    def snapshot(self):
+        with self._lock:
+            snap = {'state': self._state, 'consecutive_failures': self._failures}
+            if self._state != CLOSED:
+                snap['opened_at'] = self._opened_at
+                snap['next_probe_in'] = round(max(0.0, self._probe_at - self._clock()), 1)
+            return snap
+
+    def _open(self):
+        self._probe_at = self._clock() + self._timeout
+        self._opened_at = time.time()
+        return self._transition(OPEN)
+
+    def _transition(self, state):
+        """Change state; called with self._lock held. Returns what `_announce`
+        needs, to be passed to it once the lock is released."""
+        previous, self._state = self._state, state
+        self._transitions += 1
+        CIRCUIT_BREAKER_STATE.labels(breaker=self.name).set(_STATE_VALUES[state])
+        return {
+            'seq': self._transitions, 'previous': previous, 'state': state, 'failures': self._failures,
+            'timeout': self._timeout, 'opened_at': self._opened_at if state == OPEN else None,
+        }
+
+    def _announce(self, transition):
+        """Log a transition and publish it to the status file; called without self._lock."""
+        if transition is None:
+            return
+        state = transition['state']
+        if state == OPEN:
+            logger.error(
+                "🔌 Circuit breaker %s opened after %d consecutive failure(s); calls are short-circuited for %.0fs.",
+                self.name, transition['failures'], transition['timeout'],
+            )
+        elif state == CLOSED:
+            logger.info("🔌 Circuit breaker %s closed; %s is healthy again.", self.name, self.name)
+        else:
+            logger.info("🔌 Circuit breaker %s half-open; probing %s.", self.name, self.name)
+        if CLOSED not in (transition['previous'], state):
+            return  # probes come and go on a schedule; only opening and closing are published
+        with _announce_lock:
+            if transition['seq'] < self._published:
+                return  # a later transition was already published
+            self._published = transition['seq']
+            _announced[self.name] = {'state': state, 'opened_at': transition['opened_at']}
+            _publish_announced()
+
+
+_breakers = {}
+_registry_lock = threading.Lock()
+# The key of this process's entry in the 'breakers' status section.
+_instance = os.getenv('INSTANCE_ID') or f"{socket.gethostname()}-{os.getpid()}"
+_announced = {}  # name -> {'state', 'opened_at'}: what this process last published
+_announce_lock = threading.Lock()
+
+
+def set_instance(instance_id):
+    """Publish this process's breakers under `instance_id` from now on."""
+    global _instance
+    _instance = instance_id
+
+
+def _publish_announced():
+    """Write this process's breakers to the status file; called with _announce_lock held."""
+    entry = {'published': time.time(), 'breakers': dict(_announced)}
+    try:
+        publish_status('breakers', {_instance: entry})
+    except OSError as e:
+        logger.warning("Could not publish circuit breaker state: %s", e)
+
+
+def publish_breakers():
+    """Republish every breaker of this process, refreshing the entry's age."""
+    with _announce_lock:
+        _publish_announced()
+
+
+def get_breaker(name):
+    """The process-wide breaker for `name`, created (and published closed) on first use."""
+    with _registry_lock:
+        breaker = _breakers.get(name)
+        if breaker is not None:
+            return breaker
+        breaker = _breakers[name] = CircuitBreaker(name)
+        CIRCUIT_BREAKER_STATE.labels(breaker=name).set(_STATE_VALUES[CLOSED])
+    with _announce_lock:
+        if breaker._published == 0:  # no transition got there first
+            _announced[name] = {'state': CLOSED, 'opened_at': None}
+            _publish_announced()
+    return breaker
+
+
+def breaker_states():
+    """{name: snapshot} for every breaker this process has used."""
+    with _registry_lock:
+        breakers = list(_breakers.values())
+    return {b.name: b.snapshot() for b in breakers}
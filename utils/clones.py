@@ -8,28 +8,51 @@ with no link back to the original, so if the original birthday is removed the
 clone would be orphaned. We record source -> clone here and delete the clone when
 the source is cancelled/deleted.
 
+One clone invites every target calendar the birthday routes to (see
+utils/routing.py); the map holds one entry per target, keyed
+`<source calendar>::<event id>::<target calendar>`, all pointing at that clone.
+
+The map is held in memory as a `CloneIndex` with source-event and clone-ID
+lookups, so handling a deletion costs a lookup per changed event rather than a
+scan of the map; like the mirror index it is reloaded only when another shard
+changed the file.
+
 (fromGmail events are intentionally deleted by the bot after duplication, so they
 are deliberately not tracked here — tracking them would delete the duplicate.)
 """
 import json
 import os
+import threading
 from pathlib import Path
 
 from googleapiclient.errors import HttpError
 
+from utils.deadline import check
+from utils.filelock import file_lock
 from utils.logger import logger
+from utils.routing import DEFAULT_TARGET
 
 CLONE_FILE = Path(os.getenv('CLONE_FILE', 'data/cloned_events.json'))
 
 
-def _key(source_calendar_id, event_id):
-    return f"{source_calendar_id}::{event_id}"
+def _key(source_calendar_id, event_id, target=DEFAULT_TARGET):
+    return f"{source_calendar_id}::{event_id}::{target}"
+
+
+def _parse_key(key):
+    source_calendar_id, event_id, target = key.split('::', 2)
+    return source_calendar_id, event_id, target
 
 
 def load_clone_map():
     if CLONE_FILE.exists():
         try:
-            return json.loads(CLONE_FILE.read_text())
+            clone_map = json.loads(CLONE_FILE.read_text())
+            # Keys from before routing had no target; they all invited the default one.
+            return {
+                (key if key.count('::') == 2 else f"{key}::{DEFAULT_TARGET}"): record
+                for key, record in clone_map.items()
+            }
         except json.JSONDecodeError:
             logger.error("🧬 Clone map file is corrupt; starting fresh.")
     return {}
@@ -37,34 +60,158 @@ def load_clone_map():
 
 def save_clone_map(clone_map):
     CLONE_FILE.parent.mkdir(parents=True, exist_ok=True)
-    CLONE_FILE.write_text(json.dumps(clone_map, indent=2))
+    # Renamed into place so every save changes the file's stamp (see clone_index).
+    tmp = CLONE_FILE.with_name(f"{CLONE_FILE.name}.tmp")
+    tmp.write_text(json.dumps(clone_map, indent=2))
+    os.replace(tmp, CLONE_FILE)
 
 
-def record_clone(source_calendar_id, source_event_id, clone_id):
-    """Remember that `source_event_id` was cloned into `clone_id`."""
-    clone_map = load_clone_map()
-    clone_map[_key(source_calendar_id, source_event_id)] = {'clone_id': clone_id}
-    save_clone_map(clone_map)
+class CloneIndex:
+    """The clone map with lookups by source event and by clone ID.
 
+    Records must not be mutated in place; writes go through `_update_clone_map`.
+    """
 
-def remove_clone(service, source_calendar_id, source_event_id):
+    def __init__(self, clone_map):
+        self.records = clone_map
+        self._by_source = {}  # (source calendar, event id) -> keys, one per target
+        self._by_clone = {}  # (clone id, target) -> keys tracking that clone there
+        for key, record in clone_map.items():
+            self._add(key, record)
+
+    def __len__(self):
+        return len(self.records)
+
+    def get(self, key):
+        return self.records.get(key)
+
+    def keys_for_source(self, source_calendar_id, event_id):
+        """Keys of every target's entry for one source event."""
+        return sorted(self._by_source.get((source_calendar_id, event_id), ()))
+
+    def keys_for_clone(self, clone_id, target):
+        """Keys whose clone `clone_id` invites `target`."""
+        return sorted(self._by_clone.get((clone_id, target), ()))
+
+    def put(self, key, record):
+        self.drop(key)
+        self.records[key] = record
+        self._add(key, record)
+
+    def drop(self, key):
+        record = self.records.pop(key, None)
+        if record is None:
+            return
+        source_calendar_id, event_id, target = _parse_key(key)
+        _discard(self._by_source, (source_calendar_id, event_id), key)
+        if record.get('clone_id'):
+            _discard(self._by_clone, (record['clone_id'], target), key)
+
+    def _add(self, key, record):
+        source_calendar_id, event_id, target = _parse_key(key)
+        self._by_source.setdefault((source_calendar_id, event_id), set()).add(key)
+        if record.get('clone_id'):
+            self._by_clone.setdefault((record['clone_id'], target), set()).add(key)
+
+
+def _discard(index, slot, key):
+    keys = index.get(slot)
+    if keys is not None:
+        keys.discard(key)
+        if not keys:
+            del index[slot]
+
+
+_index = None
+_index_stamp = None
+_index_lock = threading.RLock()
+
+
+def _file_stamp():
+    try:
+        st = os.stat(CLONE_FILE)
+    except FileNotFoundError:
+        return (str(CLONE_FILE), None)
+    return (str(CLONE_FILE), st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+def clone_index():
+    """The current `CloneIndex`, reloaded only when the map file changed since
+    this process last read or wrote it."""
+    global _index, _index_stamp
+    with _index_lock:
+        stamp = _file_stamp()
+        if _index is None or stamp != _index_stamp:
+            _index, _index_stamp = CloneIndex(load_clone_map()), stamp
+        return _index
+
+
+def cached_index():
+    """The index this process currently holds in memory (None before the
+    first load), without checking the file."""
+    return _index
+
+
+def _update_clone_map(changes):
+    """Apply `{key: record}` changes (None drops the key) to the on-disk map
+    under the file lock, so concurrent shards don't clobber each other's entries."""
+    global _index_stamp
+    with file_lock(CLONE_FILE), _index_lock:
+        index = clone_index()
+        for key, record in changes.items():
+            if record is None:
+                index.drop(key)
+            else:
+                index.put(key, record)
+        save_clone_map(index.records)
+        _index_stamp = _file_stamp()
+
+
+def record_clone(source_calendar_id, source_event_id, clone_id, targets=(DEFAULT_TARGET,)):
+    """Remember that `source_event_id` was cloned into `clone_id`, inviting `targets`."""
+    _update_clone_map({
+        _key(source_calendar_id, source_event_id, target): {'clone_id': clone_id} for target in targets
+    })
+
+
+def remove_clone(service, source_calendar_id, source_event_id, deadline=None):
     """Delete the clone for a now cancelled/deleted source event (no-op if none).
 
     The clone lives on the source calendar, so it is deleted with the source
     account's own service.
     """
-    clone_map = load_clone_map()
-    key = _key(source_calendar_id, source_event_id)
-    record = clone_map.get(key)
-    if not record:
+    index = clone_index()
+    keys = index.keys_for_source(source_calendar_id, source_event_id)
+    if not keys:
         return
-    clone_id = record.get('clone_id')
-    if clone_id:
+    for clone_id in dict.fromkeys(index.get(k).get('clone_id') for k in keys):
+        if not clone_id:
+            continue
+        check(deadline, f"deleting clone {clone_id}")
         try:
             service.events().delete(calendarId=source_calendar_id, eventId=clone_id).execute()
             logger.info("🗑️ Deleted an orphaned birthday clone whose source was removed.")
         except HttpError as e:
             if e.resp.status not in (404, 410):  # already gone is fine
-                logger.error(f"Failed to delete clone {clone_id}: {e}")
-    del clone_map[key]
-    save_clone_map(clone_map)
+                logger.error("Failed to delete clone %s: %s", clone_id, e)
+    _update_clone_map({k: None for k in keys})
+
+
+def forget_deleted_clones(shared_events, target=DEFAULT_TARGET):
+    """Drop mappings for clones whose copy on the `target` calendar was deleted.
+
+    `shared_events` is an incremental-sync delta of `target`; a clone shows up
+    there under its own ID because the target is invited to it. Only that
+    target's entry is dropped; the clone itself stays tracked while any other
+    target still has it. Returns the number of mappings dropped.
+    """
+    cancelled = {e['id'] for e in shared_events if e.get('status') == 'cancelled' and e.get('id')}
+    if not cancelled:
+        return 0
+    index = clone_index()
+    dropped = [key for clone_id in cancelled for key in index.keys_for_clone(clone_id, target)]
+    if dropped:
+        _update_clone_map({key: None for key in dropped})
+        for key in dropped:
+            logger.info("🧬 Clone for %s was deleted from %s; forgetting it.", key, target)
+    return len(dropped)
@@ -0,0 +1,75 @@
+# ~/calendar_bot/utils/deadline.py
+"""
+A per-poll deadline passed down to every external call the poll makes.
+
+poll_calendar_job runs with max_instances=1, so one hung connection or a long
+tenacity backoff would otherwise stall all syncing. Each poll creates a
+`Deadline`; code making an API call first calls `check()` (raising
+DeadlineExceeded once time is up) and HTTP calls that take a timeout use
+`timeout(cap)` to never wait past it. Retry schedules use `stop_at_deadline` so
+tenacity gives up rather than sleeping past the deadline.
+
+Google API calls can't take a per-call timeout through googleapiclient, so the
+poll also makes its deadline current with `bounded_by()`; each Calendar request
+then sets its socket timeout to GOOGLE_API_TIMEOUT_SECONDS (utils/google_utils.py)
+shortened to `current().remaining()`, so no single call outlives the poll.
+"""
+import contextvars
+import time
+from contextlib import contextmanager
+
+_current = contextvars.ContextVar('deadline', default=None)
+
+
+class DeadlineExceeded(Exception):
+    """The poll ran out of time; the caller should stop and let the next poll resume."""
+
+
+class Deadline:
+    def __init__(self, seconds, clock=time.monotonic):
+        self._clock = clock
+        self.expires_at = clock() + seconds
+
+    def remaining(self):
+        return max(0.0, self.expires_at - self._clock())
+
+    @property
+    def expired(self):
+        return self.remaining() <= 0
+
+    def check(self, what='the next call'):
+        if self.expired:
+            raise DeadlineExceeded(f"Poll deadline reached before {what}.")
+
+    def timeout(self, cap):
+        """A timeout for one call: `cap`, shortened to the time remaining."""
+        self.check()
+        return min(cap, self.remaining())
+
+
+@contextmanager
+def bounded_by(deadline):
+    """Make `deadline` the one `current()` returns inside the block."""
+    token = _current.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current.reset(token)
+
+
+def current():
+    """The deadline of the poll running in this context, or None."""
+    return _current.get()
+
+
+def check(deadline, what='the next call'):
+    """`deadline.check(what)`, tolerating deadline=None (no deadline)."""
+    if deadline is not None:
+        deadline.check(what)
+
+
+def stop_at_deadline(retry_state):
+    """Tenacity stop condition: give up if the next backoff would outlast the
+    `deadline` keyword argument of the retried call."""
+    deadline = retry_state.kwargs.get('deadline')
+    return deadline is not None and deadline.remaining() <= (retry_state.upcoming_sleep or 0)
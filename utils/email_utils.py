@@ -1,7 +1,9 @@
 # ~/calendar_bot/utils/email_utils.py (Final Version)
 
 import os
+import functools
 from utils.logger import logger
+from utils.breaker import CircuitOpen, get_breaker
 
 try:
     from sendgrid import SendGridAPIClient
@@ -10,21 +12,28 @@ except ImportError:
     logger.critical("The 'sendgrid' library is not installed. Email sending will fail. Please run 'pip install sendgrid'.")
     SendGridAPIClient = None
 
-def send_error_email(subject: str, body: str):
-    """Sends a notification email via the SendGrid API."""
+@functools.lru_cache(maxsize=1)
+def _client(api_key):
+    """One SendGrid client (and its connection setup) reused across emails."""
+    return SendGridAPIClient(api_key)
+
+def send_error_email(subject: str, body: str) -> bool:
+    """Sends a notification email via the SendGrid API, synchronously; returns
+    whether it was accepted. Alerts from the engine go through
+    utils.alerts.alert() instead, which batches them off the poll thread."""
     SENDGRID_API_KEY = os.getenv("SENDGRID_API_KEY")
     SENDER_EMAIL = os.getenv("SENDER_EMAIL")
     TO_EMAIL = os.getenv("TO_EMAIL")
 
     if not SendGridAPIClient:
         logger.error("SendGrid library not available, cannot send email.")
-        return
+        return False
 
     if not all([SENDGRID_API_KEY, SENDER_EMAIL, TO_EMAIL]):
         logger.error("❌ Cannot send email. Missing required environment variables: SENDGRID_API_KEY, SENDER_EMAIL, or TO_EMAIL.")
-        return
+        return False
 
-    logger.debug(f"Attempting to send email with subject: {subject}")
+    logger.debug("Attempting to send email with subject: %s", subject)
     html_body = f"<h2>Calendar Bot Alert</h2><p>{subject}</p><pre style='background-color:#f4f4f4; padding:15px; border-radius:5px;'>{body}</pre>"
 
     message = Mail(
@@ -34,11 +43,15 @@ def send_error_email(subject: str, body: str):
         html_content=html_body
     )
     try:
-        sg = SendGridAPIClient(SENDGRID_API_KEY)
-        response = sg.send(message)
+        # While SendGrid is failing, alerts are dropped (and logged) without waiting on it.
+        with get_breaker('sendgrid').guard():
+            response = _client(SENDGRID_API_KEY).send(message)
         if 200 <= response.status_code < 300:
-            logger.info(f"✅ Email notification sent successfully to {TO_EMAIL}.")
-        else:
-            logger.error(f"❌ Failed to send email via SendGrid (status {response.status_code}): {response.body}")
+            logger.info("✅ Email notification sent successfully to %s.", TO_EMAIL)
+            return True
+        logger.error("❌ Failed to send email via SendGrid (status %s): %s", response.status_code, response.body)
+    except CircuitOpen as e:
+        logger.warning("📪 Not sending email “%s”: %s", subject, e)
     except Exception as e:
-        logger.error(f"Exception in send_error_email: {e}", exc_info=True)
+        logger.error("Exception in send_error_email: %s", e, exc_info=True)
+    return False
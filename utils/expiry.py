@@ -0,0 +1,63 @@
+# ~/calendar_bot/utils/expiry.py
+"""
+A min-heap of keys ordered by expiry timestamp, for dropping expired state
+locally (no API reads) in O(log n) per expired entry.
+
+Updates and removals are lazy: the current expiry of each key is kept in a dict
+and heap entries that no longer match it are skipped when they surface, so
+`set`/`discard` never have to search the heap. Keys with no known expiry
+(None) are tracked as never expiring.
+"""
+import heapq
+
+
+class ExpiryIndex:
+    def __init__(self, items=()):
+        self._expiry = {}
+        self._heap = []
+        for key, ts in items:
+            self._expiry[key] = ts
+            if ts is not None:
+                self._heap.append((ts, key))
+        heapq.heapify(self._heap)
+
+    def __len__(self):
+        return len(self._expiry)
+
+    def __contains__(self, key):
+        return key in self._expiry
+
+    def get(self, key):
+        return self._expiry.get(key)
+
+    def set(self, key, ts):
+        """Track `key` as expiring at `ts` (epoch seconds), replacing any prior expiry."""
+        if key in self._expiry and self._expiry[key] == ts:
+            return
+        self._expiry[key] = ts
+        if ts is not None:
+            heapq.heappush(self._heap, (ts, key))
+        self._compact()
+
+    def discard(self, key):
+        self._expiry.pop(key, None)
+        self._compact()
+
+    def pop_expired(self, cutoff):
+        """Remove and return every key whose expiry is before `cutoff`."""
+        expired = []
+        while self._heap and self._heap[0][0] < cutoff:
+            ts, key = heapq.heappop(self._heap)
+            if self._expiry.get(key, _MISSING) == ts:  # skip stale heap entries
+                del self._expiry[key]
+                expired.append(key)
+        return expired
+
+    def _compact(self):
+        # Stale entries are dropped lazily; rebuild once they dominate the heap.
+        if len(self._heap) > 2 * len(self._expiry) + 64:
+            self._heap = [(ts, key) for key, ts in self._expiry.items() if ts is not None]
+            heapq.heapify(self._heap)
+
+
+_MISSING = object()
@@ -0,0 +1,26 @@
+# ~/calendar_bot/utils/filelock.py
+"""
+Advisory file locks for the JSON state files.
+
+When several engine shards share the data volume, each must re-read a state
+file and apply only its own changes while holding the lock, instead of writing
+back a copy loaded earlier (which would clobber the other shards' updates).
+"""
+import fcntl
+import os
+from contextlib import contextmanager
+from pathlib import Path
+
+
+@contextmanager
+def file_lock(path):
+    """Hold an exclusive lock on `<path>.lock` for the duration of the block."""
+    lock_path = Path(f"{path}.lock")
+    lock_path.parent.mkdir(parents=True, exist_ok=True)
+    fd = os.open(lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        yield
+    finally:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+        os.close(fd)
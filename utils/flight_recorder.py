@@ -0,0 +1,182 @@
+# ~/calendar_bot/utils/flight_recorder.py
+"""
+Flight recorder: the last FLIGHT_RECORDER_SIZE polls and reconciliation runs,
+kept in memory so a slow one can be examined after the fact.
+
+The engine opens a `record()` around each run; code underneath notes what
+happened through the module-level `note_*()` helpers and `stage()` timers,
+which find the open record through a context variable and are no-ops outside
+one. Each entry holds start/end times, the trigger, per-calendar event counts,
+actions taken, API calls by method, retries and the seconds spent per stage
+(list, process, persist, reconcile, heartbeat).
+
+After each run the engine appends the runs it finished since the last publish
+to FLIGHT_RECORDER_FILE, one JSON line each, which the web tier reads back
+(the last FLIGHT_RECORDER_SIZE per engine instance) for /debug/polls. Once
+the file outgrows FLIGHT_RECORDER_MAX_BYTES it is compacted down to those.
+"""
+import contextvars
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from pathlib import Path
+
+from utils.filelock import file_lock
+from utils.tracing import current_trace_id
+
+FLIGHT_RECORDER_SIZE = int(os.getenv('FLIGHT_RECORDER_SIZE', '50'))
+FLIGHT_RECORDER_FILE = Path(os.getenv('FLIGHT_RECORDER_FILE', 'data/flight_recorder.jsonl'))
+FLIGHT_RECORDER_MAX_BYTES = int(os.getenv('FLIGHT_RECORDER_MAX_BYTES', str(1024 * 1024)))
+
+_current = contextvars.ContextVar('flight_record', default=None)
+_ring = deque(maxlen=FLIGHT_RECORDER_SIZE)
+_unpublished = deque(maxlen=FLIGHT_RECORDER_SIZE)  # finished since the last publish()
+_ring_lock = threading.Lock()
+
+
+class FlightRecord:
+    __slots__ = ('kind', 'trigger', 'trace_id', 'started', 'ended', 'calendars', 'actions',
+                 'api_calls', 'retries', 'stages', 'error')
+
+    def __init__(self, kind, trigger):
+        self.kind = kind
+        self.trigger = trigger
+        self.trace_id = current_trace_id()
+        self.started = time.time()
+        self.ended = None
+        self.calendars = {}  # calendar -> {'trigger', 'events', 'full_sync'}
+        self.actions = {}  # action -> count
+        self.api_calls = {}  # method -> count
+        self.retries = 0
+        self.stages = {}  # stage -> seconds
+        self.error = None
+
+    def to_dict(self):
+        return {
+            'kind': self.kind,
+            'trigger': self.trigger,
+            'trace_id': self.trace_id,
+            'started': round(self.started, 3),
+            'ended': round(self.ended, 3),
+            'duration': round(self.ended - self.started, 3),
+            'calendars': self.calendars,
+            'actions': self.actions,
+            'api_calls': self.api_calls,
+            'retries': self.retries,
+            'stages': {name: round(seconds, 3) for name, seconds in self.stages.items()},
+            'error': self.error,
+        }
+
+
+@contextmanager
+def record(kind, trigger='scheduled'):
+    """Record one run (a poll, a reconciliation) into the ring."""
+    current = FlightRecord(kind, trigger)
+    token = _current.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        current.ended = time.time()
+        _current.reset(token)
+        entry = current.to_dict()
+        with _ring_lock:
+            _ring.append(entry)
+            _unpublished.append(entry)
+
+
+@contextmanager
+def stage(name):
+    """Add the block's duration to stage `name` of the open record."""
+    current = _current.get()
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        if current is not None:
+            current.stages[name] = current.stages.get(name, 0.0) + time.perf_counter() - started
+
+
+def note_calendar(calendar_id, **fields):
+    """Set fields (trigger, events, full_sync) of a calendar synced by the open record."""
+    current = _current.get()
+    if current is None:
+        return
+    current.calendars.setdefault(calendar_id, {}).update(fields)
+    if fields.get('trigger') == 'webhook':
+        current.trigger = 'webhook'
+
+
+def note_action(action):
+    current = _current.get()
+    if current is not None:
+        current.actions[action] = current.actions.get(action, 0) + 1
+
+
+def note_api_call(method):
+    current = _current.get()
+    if current is not None:
+        current.api_calls[method] = current.api_calls.get(method, 0) + 1
+
+
+def note_retry():
+    current = _current.get()
+    if current is not None:
+        current.retries += 1
+
+
+def recent():
+    """The recorded runs, oldest first."""
+    with _ring_lock:
+        return list(_ring)
+
+
+def publish(instance_id):
+    """Append the runs finished since the last call to FLIGHT_RECORDER_FILE,
+    tagged with `instance_id`."""
+    with _ring_lock:
+        entries = list(_unpublished)
+        _unpublished.clear()
+    if not entries:
+        return
+    path = FLIGHT_RECORDER_FILE
+    lines = ''.join(json.dumps({'instance': instance_id, 'run': e}, separators=(',', ':')) + '\n' for e in entries)
+    with file_lock(path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with path.open('a') as f:
+            f.write(lines)
+        if path.stat().st_size > FLIGHT_RECORDER_MAX_BYTES:
+            _compact(path)
+
+
+def read_runs(path=None):
+    """{instance: [runs, oldest first]} from the file, at most
+    FLIGHT_RECORDER_SIZE per instance."""
+    runs = {}
+    try:
+        with (path or FLIGHT_RECORDER_FILE).open() as f:
+            for line in f:
+                try:
+                    item = json.loads(line)
+                    instance, run = item['instance'], item['run']
+                except (ValueError, TypeError, KeyError):
+                    continue  # a torn or foreign line
+                runs.setdefault(instance, deque(maxlen=FLIGHT_RECORDER_SIZE)).append(run)
+    except FileNotFoundError:
+        return {}
+    return {instance: list(entries) for instance, entries in runs.items()}
+
+
+def _compact(path):
+    # Called under the file lock: keep only what read_runs() would return.
+    tmp = path.with_suffix('.tmp')
+    tmp.write_text(''.join(
+        json.dumps({'instance': instance, 'run': run}, separators=(',', ':')) + '\n'
+        for instance, entries in read_runs(path).items() for run in entries
+    ))
+    tmp.replace(path)
@@ -1,29 +1,155 @@
 # calendar_bot/utils/google_utils.py
 import os
+import time
+import httplib2
+from google_auth_httplib2 import AuthorizedHttp
 from utils.logger import logger
 from pathlib import Path
 from google.oauth2.credentials import Credentials
 from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
+from googleapiclient.http import HttpRequest
+from google.auth.exceptions import GoogleAuthError
 from google.auth.transport.requests import Request
 from common.credentials import load_credentials
+from utils.breaker import get_breaker
+from utils.deadline import current as current_deadline
+from utils.flight_recorder import note_api_call
+from utils.tracing import exemplar, set_attribute, span
+from utils.metrics import GOOGLE_API_REQUEST_SECONDS, GOOGLE_API_REQUESTS_TOTAL, GOOGLE_API_RESPONSE_BYTES
 
 #    Builds the Calendar service object for a specific user by loading their token.
 #    'calendar_id' is expected to be an email address like 'user@gmail.com'.
 
+# Socket timeout for every Calendar API call, shortened on each call to what is
+# left of the running poll's deadline (utils/deadline.py).
+GOOGLE_API_TIMEOUT_SECONDS = float(os.getenv('GOOGLE_API_TIMEOUT_SECONDS', '30'))
+
+
+def _is_outage(exc):
+    """Whether a failed API call says the account or Google is unhealthy
+    (auth, network, 5xx, rate limiting) rather than answering about one event
+    (404, 410, 412, 304, ...), which the breaker counts as a success."""
+    if isinstance(exc, HttpError):
+        return exc.resp.status in (401, 429) or exc.resp.status >= 500
+    return isinstance(exc, (GoogleAuthError, OSError, httplib2.HttpLib2Error))
+
+
+def _outcome(exc):
+    """The `status` label for a failed call: the HTTP status, or the kind of
+    failure when there was no response."""
+    if isinstance(exc, HttpError):
+        return str(exc.resp.status)
+    if isinstance(exc, GoogleAuthError):
+        return 'auth_error'
+    if isinstance(exc, (OSError, httplib2.HttpLib2Error)):
+        return 'transport_error'
+    return 'error'
+
+
+def _observe(account, method, status, seconds, size=None):
+    set_attribute('http.status', status)
+    note_api_call(method)
+    GOOGLE_API_REQUEST_SECONDS.labels(account=account, method=method, status=status).observe(
+        seconds, exemplar=exemplar()
+    )
+    GOOGLE_API_REQUESTS_TOTAL.labels(account=account, method=method, status=status).inc()
+    if size is not None:
+        GOOGLE_API_RESPONSE_BYTES.labels(account=account, method=method).observe(size)
+
+
+def _set_timeout(http, seconds):
+    """Set the socket timeout of `http` (an AuthorizedHttp or httplib2.Http),
+    including its open, reused connections."""
+    http = getattr(http, 'http', http)
+    if not isinstance(http, httplib2.Http):
+        return
+    http.timeout = seconds
+    for conn in http.connections.values():
+        conn.timeout = seconds
+        if conn.sock is not None:
+            conn.sock.settimeout(seconds)
+
+
+class _InstrumentedRequest(HttpRequest):
+    """An API request that goes through its account's circuit breaker and
+    records its latency, outcome and response size per account and method
+    (e.g. `events.list`). Its timeout is capped at what is left of the current
+    poll deadline; it raises DeadlineExceeded if none is left."""
+    account = None
+    breaker = None
+
+    def execute(self, http=None, num_retries=0):
+        method = (self.methodId or 'unknown').removeprefix('calendar.')
+        deadline = current_deadline()
+        _set_timeout(http or self.http, deadline.timeout(GOOGLE_API_TIMEOUT_SECONDS)
+                     if deadline is not None else GOOGLE_API_TIMEOUT_SECONDS)
+        with span(f"calendar.{method}", account=self.account), self.breaker.guard(_is_outage):
+            postproc = self.postproc
+            size = None
+            status = '200'
+
+            def measure(resp, content):
+                nonlocal size, status
+                size = len(content or b'')
+                status = str(resp.status)  # e.g. 204 for a delete
+                return postproc(resp, content)
+
+            self.postproc = measure
+            started = time.perf_counter()
+            try:
+                result = super().execute(http=http, num_retries=num_retries)
+            except Exception as e:
+                content = getattr(e, 'content', None)
+                _observe(self.account, method, _outcome(e), time.perf_counter() - started,
+                         len(content) if isinstance(content, bytes) else None)
+                raise
+            finally:
+                self.postproc = postproc
+            _observe(self.account, method, status, time.perf_counter() - started, size)
+            return result
+
+
+def _request_builder(breaker, account='unknown'):
+    def build_request(*args, **kwargs):
+        request = _InstrumentedRequest(*args, **kwargs)
+        request.account = account
+        request.breaker = breaker
+        return request
+    return build_request
+
+
 def build_calendar_service(email_address: str):
-    """Builds a Google Calendar service object for a given email address."""
-    logger.info(f"🔧 Building Calendar service for {email_address}...")
+    """Builds a Google Calendar service object for a given email address.
+
+    Every request it makes goes through the `calendar:<email>` circuit
+    breaker, and building it raises CircuitOpen while that breaker is open.
+    Requests and the credential load are timed into the
+    calendar_bot_google_api_* metrics.
+    """
+    breaker = get_breaker(f"calendar:{email_address}")
+    breaker.reject_if_open()
+    logger.info("🔧 Building Calendar service for %s...", email_address)
     try:
         # The suffix is the part of the email before the '@', e.g., 'joeltimm'
         suffix = email_address.split('@')[0]
 
         # We now pass the auth path directly to the credential loader
-        creds = load_credentials(suffix)
+        started = time.perf_counter()
+        try:
+            creds = load_credentials(suffix)
+        except Exception as e:
+            _observe(email_address, 'credentials.load', _outcome(e), time.perf_counter() - started)
+            breaker.record_failure()  # e.g. a revoked refresh token
+            raise
+        # Includes the token refresh when the stored access token had expired.
+        _observe(email_address, 'credentials.load', 'ok', time.perf_counter() - started)
 
-        service = build('calendar', 'v3', credentials=creds)
+        http = AuthorizedHttp(creds, http=httplib2.Http(timeout=GOOGLE_API_TIMEOUT_SECONDS))
+        service = build('calendar', 'v3', http=http, requestBuilder=_request_builder(breaker, email_address))
         return service
     except Exception as e:
-        logger.error(f"❌ Failed to build calendar service for {email_address}")
+        logger.error("❌ Failed to build calendar service for %s", email_address)
         raise e
 
 #For Tests/e2e.py
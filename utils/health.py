@@ -1,19 +1,108 @@
 # ~/calendar_bot/utils/health.py
 
+import os
 import requests
 from utils.logger import logger
+from utils.breaker import CircuitOpen, get_breaker
 
-def send_health_ping(url: str):
+# Engine snapshots and breaker entries not republished for this long are
+# dropped from the report: the instance is gone (replaced container, old shard
+# ID), not stalled.
+HEALTH_ENGINE_EXPIRY_SECONDS = float(os.getenv('HEALTH_ENGINE_EXPIRY_SECONDS', '86400'))
+# When instances disagree about a breaker, the report shows the worst state.
+_BREAKER_SEVERITY = {'closed': 0, 'half_open': 1, 'open': 2}
+
+def send_health_ping(url: str, deadline=None):
 #Sends a GET request to a specified health check URL. Intended to be called by a scheduler.
     if not url:
         logger.debug("Health check URL not configured, skipping ping.")
         return
 
-    logger.info(f"❤️ Sending health ping to {url}...")
+    logger.info("❤️ Sending health ping to %s...", url)
     try:
-        # The requests.get() call has a default timeout, which is fine.
-        response = requests.get(url, timeout=10) # Added a 10-second timeout
-        response.raise_for_status()  # This will raise an exception for 4xx or 5xx status codes
+        # While Uptime Kuma is unreachable, pings are skipped rather than waited on.
+        with get_breaker('uptime_kuma').guard(lambda e: isinstance(e, requests.exceptions.RequestException)):
+            # 10s at most, and never past the poll's deadline.
+            response = requests.get(url, timeout=deadline.timeout(10) if deadline else 10)
+            response.raise_for_status()  # This will raise an exception for 4xx or 5xx status codes
         logger.info("✅ Health ping sent successfully.")
+    except CircuitOpen as e:
+        logger.warning("Skipping health ping: %s", e)
     except requests.exceptions.RequestException as e:
-        logger.error(f"❌ Failed to send health ping to {url}: {e}")
+        logger.error("❌ Failed to send health ping to %s: %s", url, e)
+
+
+def readiness(status, now):
+    """Judges the engine from the status file (see engine.health_snapshot).
+
+    Returns {'ready', 'problems', 'engines', 'breakers'}: the bot is ready when
+    every engine published recently, every calendar synced within its
+    expected interval, every watched calendar has a live channel and no
+    instance reports a breaker open. Ages are computed against `now`, so a snapshot that
+    stopped being refreshed (a dead scheduler) shows growing ages until it is
+    HEALTH_ENGINE_EXPIRY_SECONDS old; then it is left out entirely.
+    """
+    problems = []
+    engines = {}
+    snapshots = {
+        instance: snapshot for instance, snapshot in status.get('health', {}).items()
+        if snapshot and now - snapshot['published'] <= HEALTH_ENGINE_EXPIRY_SECONDS
+    }
+    if not snapshots:
+        problems.append("no engine has published its status")
+    for instance, snapshot in sorted(snapshots.items()):
+        if now > snapshot['stale_after']:
+            problems.append(f"engine {instance} has not published since {now - snapshot['published']:.0f}s ago")
+        calendars = {}
+        for cal, info in sorted(snapshot['calendars'].items()):
+            sync_age = now - info['last_sync'] if info.get('last_sync') else None
+            expires_in = info['channel_expires'] - now if info.get('channel_expires') else None
+            calendars[cal] = {
+                'last_sync_age': round(sync_age) if sync_age is not None else None,
+                'channel_expires_in': round(expires_in) if expires_in is not None else None,
+                'retry_pending': info.get('retry_pending', False),
+            }
+            if 'max_sync_age' in info and (sync_age is None or sync_age > info['max_sync_age']):
+                problems.append(f"{cal} has not synced " + (f"for {sync_age:.0f}s" if sync_age is not None else "yet"))
+            if info.get('watched') and snapshot.get('webhooks') and (expires_in is None or expires_in <= 0):
+                problems.append(f"{cal} has no live watch channel")
+        engines[instance] = {
+            'published_age': round(now - snapshot['published']),
+            'calendars': calendars,
+            'retry_pending': sum(1 for info in calendars.values() if info['retry_pending']),
+            'channels_pending': snapshot.get('channels_pending', 0),
+            'outbox': snapshot.get('outbox', 0),
+        }
+    breakers = {}
+    for instance, entry in status.get('breakers', {}).items():
+        if not entry or now - entry.get('published', 0) > HEALTH_ENGINE_EXPIRY_SECONDS:
+            continue  # a departed process; entries without a timestamp predate per-instance keys
+        for name, info in entry['breakers'].items():
+            if _BREAKER_SEVERITY[info['state']] >= _BREAKER_SEVERITY.get(breakers.get(name), -1):
+                breakers[name] = info['state']
+    breakers = dict(sorted(breakers.items()))
+    problems.extend(f"breaker {name} is open" for name, state in breakers.items() if state == 'open')
+    return {'ready': not problems, 'problems': problems, 'engines': engines, 'breakers': breakers}
+
+
+def propagation_summary(status, now):
+    """{trigger: {'p50', 'p95', 'count'}} across the engines that published
+    propagation latency within HEALTH_ENGINE_EXPIRY_SECONDS. With one engine
+    these are its quantiles; across shards the counts add up, the p50 is the
+    count-weighted mean of theirs and the p95 the worst shard's."""
+    merged = {}
+    for entry in status.get('propagation', {}).values():
+        if not entry or now - entry.get('published', 0) > HEALTH_ENGINE_EXPIRY_SECONDS:
+            continue  # a departed shard, or a summary from before they were keyed by instance
+        for trigger, summary in entry['triggers'].items():
+            if summary:
+                merged.setdefault(trigger, []).append(summary)
+    result = {}
+    for trigger, summaries in sorted(merged.items()):
+        count = sum(s['count'] for s in summaries)
+        result[trigger] = {
+            'p50': round(sum(s['p50'] * s['count'] for s in summaries) / count, 1),
+            'p95': max(s['p95'] for s in summaries),
+            'count': count,
+        }
+    return result
@@ -0,0 +1,112 @@
+# ~/calendar_bot/utils/jobs.py
+"""
+Instrumentation of the engine's APScheduler jobs.
+
+`JobMonitor` listens to scheduler events and exports, per job: how late each
+run was submitted (lag), how long it ran, misfired runs (later than the
+misfire grace time) and runs skipped because the previous one was still
+going. The last one matters for poll_calendar_job: its max_instances=1 drops
+a webhook's `modify_job` poll that lands while a poll is running. The number
+of runs submitted and not yet finished is the executor's queue depth.
+
+The last outcome of each job is kept in memory and published to the status
+file for /health.
+"""
+import re
+import threading
+import time
+
+from apscheduler.events import (
+    EVENT_JOB_SUBMITTED, EVENT_JOB_EXECUTED, EVENT_JOB_ERROR, EVENT_JOB_MISSED, EVENT_JOB_MAX_INSTANCES,
+)
+
+from utils.logger import logger
+from utils.metrics import (
+    SCHEDULER_JOB_LAG_SECONDS, SCHEDULER_JOB_DURATION_SECONDS, SCHEDULER_JOB_MISFIRES_TOTAL,
+    SCHEDULER_JOB_SKIPPED_TOTAL, SCHEDULER_JOBS_IN_FLIGHT,
+)
+from utils.status import publish_status
+
+# One-off jobs added with a unique suffix (e.g. webhook_triggered_fallback_poll_<uuid>).
+_UNIQUE_SUFFIX = re.compile(r'_[0-9a-f]{32}$')
+
+
+def job_label(job_id):
+    """`job_id` without a unique suffix, so one-off jobs share a metric label."""
+    return _UNIQUE_SUFFIX.sub('', job_id)
+
+
+class JobMonitor:
+    EVENTS = EVENT_JOB_SUBMITTED | EVENT_JOB_EXECUTED | EVENT_JOB_ERROR | EVENT_JOB_MISSED | EVENT_JOB_MAX_INSTANCES
+
+    def __init__(self, instance_id, clock=time.time):
+        self.instance_id = instance_id
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._submitted = {}  # (job_id, scheduled_run_time) -> submission time
+        self._last = {}  # job label -> last outcome
+
+    def attach(self, scheduler):
+        scheduler.add_listener(self, self.EVENTS)
+
+    def __call__(self, event):
+        try:
+            if event.code == EVENT_JOB_SUBMITTED:
+                self._on_submitted(event)
+            elif event.code in (EVENT_JOB_EXECUTED, EVENT_JOB_ERROR):
+                self._on_finished(event)
+            elif event.code == EVENT_JOB_MISSED:
+                self._on_missed(event)
+            elif event.code == EVENT_JOB_MAX_INSTANCES:
+                SCHEDULER_JOB_SKIPPED_TOTAL.labels(job=job_label(event.job_id)).inc()
+                logger.warning("⏭️ Job %s skipped: its previous run is still going.", event.job_id)
+                self._record(event.job_id, 'skipped')
+        except Exception as e:  # a listener error must not take the scheduler down
+            logger.error("Job instrumentation failed on %s: %s", event, e, exc_info=True)
+
+    def _on_submitted(self, event):
+        now = self._clock()
+        with self._lock:
+            for run_time in event.scheduled_run_times:
+                self._submitted[(event.job_id, run_time)] = now
+            SCHEDULER_JOBS_IN_FLIGHT.set(len(self._submitted))
+        for run_time in event.scheduled_run_times:
+            SCHEDULER_JOB_LAG_SECONDS.labels(job=job_label(event.job_id)).observe(
+                max(0.0, now - run_time.timestamp())
+            )
+
+    def _on_missed(self, event):
+        # A missed run never executes, so no EXECUTED/ERROR event will clear it.
+        with self._lock:
+            self._submitted.pop((event.job_id, event.scheduled_run_time), None)
+            SCHEDULER_JOBS_IN_FLIGHT.set(len(self._submitted))
+        SCHEDULER_JOB_MISFIRES_TOTAL.labels(job=job_label(event.job_id)).inc()
+        logger.warning("⏰ Job %s misfired (scheduled for %s).", event.job_id, event.scheduled_run_time)
+        self._record(event.job_id, 'missed')
+
+    def _on_finished(self, event):
+        outcome = 'error' if event.exception else 'success'
+        with self._lock:
+            submitted = self._submitted.pop((event.job_id, event.scheduled_run_time), None)
+            SCHEDULER_JOBS_IN_FLIGHT.set(len(self._submitted))
+        duration = self._clock() - submitted if submitted is not None else None
+        if duration is not None:
+            SCHEDULER_JOB_DURATION_SECONDS.labels(job=job_label(event.job_id), outcome=outcome).observe(duration)
+        self._record(event.job_id, outcome, duration)
+
+    def _record(self, job_id, outcome, duration=None):
+        entry = {'outcome': outcome, 'at': round(self._clock(), 3)}
+        if duration is not None:
+            entry['duration'] = round(duration, 3)
+        with self._lock:
+            self._last[job_label(job_id)] = entry
+            snapshot = dict(self._last)
+        try:
+            publish_status('jobs', {self.instance_id: snapshot})
+        except OSError as e:
+            logger.warning("Could not publish job outcomes: %s", e)
+
+    def last_outcomes(self):
+        """{job: {'outcome', 'at', 'duration'}}: how each job's last run ended."""
+        with self._lock:
+            return dict(self._last)
@@ -0,0 +1,119 @@
+# ~/calendar_bot/utils/leader.py
+"""
+Leader election for the sync engine, plus a local notification queue from the
+web tier to it.
+
+Only one process may run the sync engine (polls, webhook registration, cleanup)
+and write the state files; otherwise polls and watch channels would be
+duplicated and in-memory processed_ids would diverge. That is either a
+standalone `python -m engine` process or, with EMBEDDED_ENGINE, one of the
+gunicorn workers. Whichever holds an exclusive flock on LEADER_LOCK_FILE is the
+leader. The OS releases the lock when that process exits, so a standby
+retrying the lock takes over within `retry_interval` seconds.
+
+Web workers serve /webhook, /health and /metrics and forward webhook
+notifications to the leader as JSON datagrams over a Unix socket
+(NOTIFY_SOCKET) that only the leader binds.
+"""
+import fcntl
+import json
+import os
+import socket
+import threading
+from pathlib import Path
+
+from utils.logger import logger
+
+LEADER_LOCK_FILE = Path(os.getenv('LEADER_LOCK_FILE', 'data/scheduler.lock'))
+NOTIFY_SOCKET = Path(os.getenv('NOTIFY_SOCKET', 'data/leader.sock'))
+_MAX_DATAGRAM = 64 * 1024
+
+
+class LeaderElection:
+    """Holds (or keeps trying to take) the leader lock for this process.
+
+    `on_elected()` is called once, in this process, when it becomes leader.
+    """
+
+    def __init__(self, lock_path, on_elected, retry_interval=15):
+        self.lock_path = Path(lock_path)
+        self.on_elected = on_elected
+        self.retry_interval = retry_interval
+        self.is_leader = False
+        self._fd = None
+        self._stop = threading.Event()
+
+    def try_acquire(self):
+        """Non-blocking attempt to take the lock. Returns True if we are leader."""
+        if self.is_leader:
+            return True
+        self.lock_path.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        os.ftruncate(fd, 0)
+        os.write(fd, str(os.getpid()).encode())
+        self._fd = fd  # keep open: closing it would release the lock
+        self.is_leader = True
+        logger.info("👑 Process %s elected leader; it runs the sync engine.", os.getpid())
+        self.on_elected()
+        return True
+
+    def start(self):
+        """Take the lock now if free; otherwise retry in a background thread."""
+        if self.try_acquire():
+            return
+        logger.info("🧍 Process %s is a follower; standing by for the leader lock.", os.getpid())
+        threading.Thread(target=self._retry_loop, name='leader-election', daemon=True).start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _retry_loop(self):
+        while not self._stop.wait(self.retry_interval):
+            try:
+                if self.try_acquire():
+                    return
+            except Exception as e:
+                logger.error("Leader election attempt failed: %s", e, exc_info=True)
+
+
+def forward_to_leader(message, socket_path=NOTIFY_SOCKET):
+    """Send a JSON notification to the leader. Returns False if it couldn't be delivered."""
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+    try:
+        sock.sendto(json.dumps(message).encode('utf-8'), str(socket_path))
+        return True
+    except OSError as e:
+        logger.error("Could not forward notification to leader via %s: %s", socket_path, e)
+        return False
+    finally:
+        sock.close()
+
+
+def serve_notifications(handler, socket_path=NOTIFY_SOCKET):
+    """Bind NOTIFY_SOCKET and call `handler(message)` for each notification,
+    in a background thread. Only the leader should call this."""
+    socket_path = Path(socket_path)
+    socket_path.parent.mkdir(parents=True, exist_ok=True)
+    if socket_path.exists():
+        socket_path.unlink()  # stale socket from a previous leader
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+    sock.bind(str(socket_path))
+
+    def loop():
+        while True:
+            try:
+                data = sock.recv(_MAX_DATAGRAM)
+            except OSError:
+                return  # socket closed
+            try:
+                handler(json.loads(data))
+            except Exception as e:
+                logger.error("Failed to handle forwarded notification: %s", e, exc_info=True)
+
+    threading.Thread(target=loop, name='leader-notifications', daemon=True).start()
+    return sock
@@ -1,6 +1,40 @@
+# ~/calendar_bot/utils/logger.py
+"""
+The shared "calendar_bot" logger.
+
+Records are handed to a QueueHandler and written to the log file and stderr
+by a QueueListener thread, so the poll never waits on disk or a slow stderr
+pipe. Only the message itself is resolved on the calling thread (its
+arguments may change afterwards); formatting happens on the writer thread.
+Log with %-style arguments, `logger.info("Synced %s", cal)`, rather than
+f-strings: a disabled level then costs nothing, and the rate limit can tell
+repeats of one line apart from distinct lines.
+
+Before queueing, each record is tagged with the current trace (trace_id,
+span_id) and the structured fields calendar, event_id and action, taken from
+`extra=` or else from the innermost span carrying them. LOG_FORMAT=json writes
+one JSON object per line with those fields; the default text format shows
+the trace ID.
+
+Repetitive DEBUG and INFO lines are rate limited per message template (or
+`extra={'rate_key': ...}`): at most LOG_RATE_LIMIT per LOG_RATE_WINDOW_SECONDS,
+the rest dropped and counted on the next line of that key that gets through.
+A WARNING is limited only if it sets a `rate_key`; ERROR and CRITICAL records,
+the ones an outage needs, always get through.
+"""
+import atexit
+import copy
+import json
 import logging
 import os
-from logging.handlers import RotatingFileHandler
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+from utils.metrics import LOG_RECORDS_DROPPED_TOTAL
+from utils.tracing import current_span
 
 # Set up log directory
 LOG_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'logs')
@@ -9,6 +43,131 @@ os.makedirs(LOG_DIR, exist_ok=True)
 # Shared log file path
 LOG_PATH = os.path.join(LOG_DIR, 'calendar_bot.log')
 
+# 'text' or 'json' (one object per line, for log shippers).
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'text').lower()
+# Records waiting for the writer thread; past this, new records are dropped.
+LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', '10000'))
+# Times one message template may be logged per window (0 disables the limit).
+LOG_RATE_LIMIT = int(os.getenv('LOG_RATE_LIMIT', '20'))
+LOG_RATE_WINDOW_SECONDS = float(os.getenv('LOG_RATE_WINDOW_SECONDS', '60'))
+
+# Structured field -> span attribute it defaults to.
+STRUCTURED_FIELDS = {'calendar': 'calendar_id', 'event_id': 'event_id', 'action': 'action'}
+
+
+class TraceContextFilter(logging.Filter):
+    """Adds `trace_id`, `span_id`, a ` [trace=…]` `trace` field and the
+    structured fields (calendar, event_id, action) to records."""
+
+    def filter(self, record):
+        current = current_span()
+        record.trace_id = current.trace_id if current else None
+        record.span_id = current.span_id if current else None
+        record.trace = f" [trace={current.trace_id}]" if current else ""
+        for field, attribute in STRUCTURED_FIELDS.items():
+            if getattr(record, field, None) is None:
+                setattr(record, field, current.lookup(attribute) if current else None)
+        return True
+
+
+class RateLimitFilter(logging.Filter):
+    """Lets each message key through at most `limit` times per `window`
+    seconds. The key is the record's `rate_key` extra, else its unformatted
+    message template. The first record of a key let through after some were
+    dropped says how many. Only DEBUG/INFO records, and WARNINGs with a
+    `rate_key`, are limited; ERROR and above are never dropped."""
+
+    _MAX_KEYS = 4096  # beyond this, keys idle for a whole window are forgotten
+
+    def __init__(self, limit, window, clock=time.monotonic):
+        super().__init__()
+        self.limit = limit
+        self.window = window
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._keys = {}  # key -> [window start, records let through, records dropped]
+
+    def filter(self, record):
+        rate_key = getattr(record, 'rate_key', None)
+        if self.limit <= 0 or record.levelno >= (logging.ERROR if rate_key else logging.WARNING):
+            return True
+        key = rate_key or (record.name, record.levelno, str(record.msg))
+        now = self._clock()
+        with self._lock:
+            entry = self._keys.get(key)
+            if entry is None or now - entry[0] >= self.window:
+                dropped = entry[2] if entry else 0
+                if entry is None and len(self._keys) >= self._MAX_KEYS:
+                    self._keys = {k: e for k, e in self._keys.items() if now - e[0] < self.window}
+                self._keys[key] = [now, 1, 0]
+            elif entry[1] < self.limit:
+                entry[1] += 1
+                return True
+            else:
+                entry[2] += 1
+                LOG_RECORDS_DROPPED_TOTAL.labels(reason='rate_limited').inc()
+                return False
+        if dropped:
+            record.suppressed = dropped
+            record.msg = f"{record.msg} [{dropped} similar lines suppressed]"
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record: ts, level, logger, message, then whichever
+    of trace_id, span_id, calendar, event_id, action, suppressed and exc are set."""
+
+    FIELDS = ('trace_id', 'span_id', *STRUCTURED_FIELDS, 'suppressed')
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for field in self.FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exc'] = record.exc_text
+        if record.stack_info:
+            entry['stack'] = self.formatStack(record.stack_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class _QueueHandler(QueueHandler):
+    """Queues records without blocking: when the writer falls LOG_QUEUE_SIZE
+    behind, new records are dropped and counted rather than stalling the poll."""
+
+    def prepare(self, record):
+        # Resolve what can't wait (arguments and exceptions may change once
+        # the caller moves on) and leave formatting to the writer thread.
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_RECORDS_DROPPED_TOTAL.labels(reason='queue_full').inc()
+
+
+def _restart_listener_after_fork():
+    # The writer thread doesn't survive fork(); give the child its own queue and thread.
+    queue_handler.queue = listener.queue = queue.Queue(LOG_QUEUE_SIZE)
+    listener._thread = None
+    listener.start()
+
+
 # Create logger
 logger = logging.getLogger("calendar_bot")
 logger.setLevel(logging.INFO)
@@ -18,9 +177,21 @@ if not logger.hasHandlers():
     file_handler = RotatingFileHandler(LOG_PATH, maxBytes=5_000_000, backupCount=3)
     stream_handler = logging.StreamHandler()
 
-    formatter = logging.Formatter('%(asctime)s [%(levelname)s] %(name)s: %(message)s')
+    if LOG_FORMAT == 'json':
+        formatter = JsonFormatter()
+    else:
+        formatter = logging.Formatter('%(asctime)s [%(levelname)s] %(name)s%(trace)s: %(message)s')
     file_handler.setFormatter(formatter)
     stream_handler.setFormatter(formatter)
 
-    logger.addHandler(file_handler)
-    logger.addHandler(stream_handler)
+    queue_handler = _QueueHandler(queue.Queue(LOG_QUEUE_SIZE))
+    # Filters run on the calling thread: drop repeats before they cost anything,
+    # then tag what's left with the trace it was logged in.
+    queue_handler.addFilter(RateLimitFilter(LOG_RATE_LIMIT, LOG_RATE_WINDOW_SECONDS))
+    queue_handler.addFilter(TraceContextFilter())
+    listener = QueueListener(queue_handler.queue, file_handler, stream_handler, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)  # flush what's queued on shutdown
+    os.register_at_fork(after_in_child=_restart_listener_after_fork)
+
+    logger.addHandler(queue_handler)
@@ -0,0 +1,226 @@
+# ~/calendar_bot/utils/memory.py
+"""
+Memory accounting for the long-running engine.
+
+Resident structures (processed IDs, watch channels, the cached mirror and clone
+indexes, the flight recorder, logging buffers, ...) are registered with `track()`;
+`update_gauges()` sizes each after a poll into the
+calendar_bot_resident_state_{entries,bytes} gauges (at most every
+MEMORY_GAUGE_INTERVAL_SECONDS). Sizes are approximate:
+`approx_bytes()` sums `sys.getsizeof` over the object graph, counting shared
+objects once. State files are registered with `track_file()` and reported by
+their on-disk size in calendar_bot_state_file_bytes, without being read.
+
+Each sync's event batch, usually the largest transient allocation (a full
+sync holds the whole calendar at once), is sized into
+calendar_bot_sync_batch_bytes by `note_batch()`, from a sample of at most
+BATCH_SAMPLE_EVENTS events scaled to the batch, so the cost stays bounded.
+
+For leaks the gauges can't pin down, `SnapshotDiff` (armed from the web
+tier's /admin/memory route) turns on tracemalloc, snapshots the heap after
+the next poll and again after the one following it, and writes the top
+allocation growth by source line to PROFILE_DIR as `<id>.tracemalloc`.
+"""
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+import types
+from collections import deque
+from contextlib import contextmanager
+
+from utils.flight_recorder import note_calendar
+from utils.logger import logger
+from utils.metrics import RESIDENT_STATE_ENTRIES, RESIDENT_STATE_BYTES, STATE_FILE_BYTES, SYNC_BATCH_BYTES
+from utils.profiling import profile_path
+
+# Walking a large structure costs real CPU (~10ms per 1000 processed IDs), so
+# the resident gauges are refreshed at most this often.
+MEMORY_GAUGE_INTERVAL_SECONDS = float(os.getenv('MEMORY_GAUGE_INTERVAL_SECONDS', '300'))
+# Events sized per sync batch; the batch's size is extrapolated from them.
+BATCH_SAMPLE_EVENTS = int(os.getenv('BATCH_SAMPLE_EVENTS', '50'))
+# Frames kept per tracemalloc traceback while a snapshot diff is armed.
+TRACEMALLOC_FRAMES = int(os.getenv('TRACEMALLOC_FRAMES', '10'))
+# Source lines listed in a snapshot diff.
+TRACEMALLOC_TOP = int(os.getenv('TRACEMALLOC_TOP', '25'))
+
+# Not walked into: shared by everything, and not what a structure "holds".
+_OPAQUE = (type, types.ModuleType, types.FunctionType, types.BuiltinFunctionType,
+           types.MethodType, logging.Logger, logging.Handler)
+
+_tracked = {}  # name -> callable returning the structure
+_tracked_files = {}  # name -> callable returning the file's path
+_last_update = None
+
+
+def approx_bytes(obj):
+    """Approximate bytes held by `obj` and everything reachable from it
+    through containers and instance attributes."""
+    seen = set()
+    total = 0
+    stack = [obj]
+    while stack:
+        current = stack.pop()
+        if id(current) in seen or isinstance(current, _OPAQUE):
+            continue
+        seen.add(id(current))
+        total += sys.getsizeof(current)
+        if isinstance(current, dict):
+            stack.extend(current.keys())
+            stack.extend(current.values())
+        elif isinstance(current, (list, tuple, set, frozenset, deque)):
+            stack.extend(current)
+        elif isinstance(current, (str, bytes, int, float, bool)) or current is None:
+            continue
+        else:
+            if hasattr(current, '__dict__'):
+                stack.append(vars(current))
+            for slot in getattr(type(current), '__slots__', ()):
+                if hasattr(current, slot):
+                    stack.append(getattr(current, slot))
+    return total
+
+
+def track(name, get):
+    """Report the structure returned by `get()` as `name` in the resident gauges."""
+    _tracked[name] = get
+
+
+def track_file(name, get_path):
+    """Report the on-disk size of the file at `get_path()` as `name`."""
+    _tracked_files[name] = get_path
+
+
+def logging_buffers():
+    """Records waiting in the calendar_bot logger's buffering handlers
+    (MemoryHandler buffers, QueueHandler queues)."""
+    records = []
+    for handler in logging.getLogger('calendar_bot').handlers:
+        if isinstance(getattr(handler, 'buffer', None), list):
+            records.extend(handler.buffer)
+        queue = getattr(getattr(handler, 'queue', None), 'queue', None)
+        if queue is not None:
+            records.extend(list(queue))
+    return records
+
+
+def update_gauges(force=False):
+    """Size every tracked structure into the resident state gauges, unless
+    that was done less than MEMORY_GAUGE_INTERVAL_SECONDS ago."""
+    global _last_update
+    now = time.monotonic()
+    if not force and _last_update is not None and now - _last_update < MEMORY_GAUGE_INTERVAL_SECONDS:
+        return
+    _last_update = now
+    for name, get in list(_tracked.items()):
+        try:
+            structure = get()
+        except Exception as e:
+            logger.warning("Could not size resident structure %s: %s", name, e)
+            continue
+        if hasattr(structure, '__len__'):
+            RESIDENT_STATE_ENTRIES.labels(structure=name).set(len(structure))
+        RESIDENT_STATE_BYTES.labels(structure=name).set(approx_bytes(structure))
+    for name, get_path in list(_tracked_files.items()):
+        try:
+            size = os.stat(get_path()).st_size
+        except FileNotFoundError:
+            size = 0
+        except OSError as e:
+            logger.warning("Could not size state file %s: %s", name, e)
+            continue
+        STATE_FILE_BYTES.labels(file=name).set(size)
+
+
+def batch_bytes(events, sample=None):
+    """Approximate bytes of a list of events, from at most `sample`
+    (BATCH_SAMPLE_EVENTS) of them spread evenly through it."""
+    sample = sample or BATCH_SAMPLE_EVENTS
+    if len(events) <= sample:
+        return approx_bytes(events)
+    step = len(events) / sample
+    sampled = [events[int(i * step)] for i in range(sample)]
+    per_event = (approx_bytes(sampled) - sys.getsizeof(sampled)) / sample
+    return sys.getsizeof(events) + int(per_event * len(events))
+
+
+def note_batch(calendar_id, events, full_sync):
+    """Record the size of one sync's event batch (metric and flight recorder)."""
+    size = batch_bytes(events)
+    SYNC_BATCH_BYTES.labels(full_sync=str(bool(full_sync)).lower()).observe(size)
+    note_calendar(calendar_id, batch_bytes=size)
+    return size
+
+
+class SnapshotDiff:
+    """Diffs tracemalloc snapshots taken after two consecutive polls. One diff
+    is armed at a time; tracemalloc runs only while one is (unless it was
+    already on, e.g. via PYTHONTRACEMALLOC)."""
+
+    def __init__(self, directory=None):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._armed = None  # {'id', 'baseline', 'started_tracing'}
+
+    def arm(self, diff_id):
+        path = profile_path(diff_id, 'json', self.directory)  # validates the ID
+        with self._lock:
+            if self._armed:
+                self._finish(self._armed, None, 'superseded')
+            started_tracing = not tracemalloc.is_tracing()
+            if started_tracing:
+                tracemalloc.start(TRACEMALLOC_FRAMES)
+            self._armed = {'id': diff_id, 'baseline': None, 'started_tracing': started_tracing}
+        self._write_status(path, {'state': 'armed'})
+        logger.info("🧮 tracemalloc snapshot diff armed (%s): comparing the next two polls.", diff_id)
+
+    @contextmanager
+    def around_poll(self):
+        """Snapshot the heap after the enclosed poll if a diff is armed."""
+        with self._lock:
+            armed = self._armed
+            if armed and armed['baseline'] is not None:
+                tracemalloc.reset_peak()
+        try:
+            yield
+        finally:
+            if armed is not None:
+                with self._lock:
+                    if self._armed is armed:
+                        self._after_poll(armed)
+
+    def _after_poll(self, armed):
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap*>'),
+        ))
+        if armed['baseline'] is None:
+            armed['baseline'] = snapshot
+            self._write_status(profile_path(armed['id'], 'json', self.directory),
+                               {'state': 'baseline_taken'})
+            return
+        _, peak = tracemalloc.get_traced_memory()
+        self._finish(armed, snapshot, 'done', peak)
+
+    def _finish(self, armed, snapshot, state, peak=None):
+        """Write the diff (if any) and release tracemalloc. Called under the lock."""
+        self._armed = None
+        if armed['started_tracing']:
+            tracemalloc.stop()
+        if snapshot is not None:
+            stats = snapshot.compare_to(armed['baseline'], 'lineno')
+            growth = sum(stat.size_diff for stat in stats)
+            lines = [f"# Heap growth between two polls: {growth / 1024:+.1f} KiB; "
+                     f"peak traced during the second poll: {peak / 1024:.1f} KiB",
+                     *(str(stat) for stat in stats[:TRACEMALLOC_TOP])]
+            profile_path(armed['id'], 'tracemalloc', self.directory).write_text('\n'.join(lines) + '\n')
+            logger.info("🧮 tracemalloc snapshot diff %s written (%+.1f KiB).", armed['id'], growth / 1024)
+        self._write_status(profile_path(armed['id'], 'json', self.directory), {'state': state})
+
+    @staticmethod
+    def _write_status(path, status):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(status))
@@ -0,0 +1,195 @@
+# ~/calendar_bot/utils/metrics.py
+"""
+Prometheus metric definitions, shared by the web tier (app.py) and the sync
+engine (engine.py) so both processes label and name things identically.
+"""
+from prometheus_client import Counter, Gauge, Histogram
+
+POLLS_INITIATED_TOTAL = Counter(
+    'calendar_bot_polls_initiated_total',
+    'Total number of calendar polling cycles initiated.'
+)
+EVENTS_PROCESSED_SUCCESS_TOTAL = Counter(
+    'calendar_bot_events_processed_success_total',
+    'Total number of events successfully processed (invited/duplicated).',
+    ['calendar_id', 'event_type'] # All labels in one list
+)
+EVENTS_PROCESSED_FAILURE_TOTAL = Counter(
+    'calendar_bot_events_processed_failure_total',
+    'Total number of events that failed processing.',
+    ['calendar_id', 'reason'] # All labels in one list
+)
+PROCESSED_EVENT_IDS_COUNT = Gauge(
+    'calendar_bot_processed_event_ids_count',
+    'Current number of unique event IDs tracked as processed.',
+    multiprocess_mode='livemax'  # only the leader worker sets it
+)
+WEBHOOK_RECEIVED_TOTAL = Counter(
+    'calendar_bot_webhooks_received_total',
+    'Total number of webhooks received.'
+)
+POLL_DURATION_SECONDS = Histogram(
+    'calendar_bot_poll_duration_seconds',
+    'Time taken to complete a polling cycle.'
+)
+EVENTS_CLEANED_TOTAL = Counter(
+    'calendar_bot_events_cleaned_total', 
+    'Total number of old event IDs cleaned from memory.'
+)
+WEBHOOK_REGISTRATIONS_TOTAL = Counter(
+    'calendar_bot_webhook_registrations_total', 
+    'Total webhook registration attempts.', 
+    ['calendar_id', 'status']
+)
+MIRROR_RECONCILE_READS_TOTAL = Counter(
+    'calendar_bot_mirror_reconcile_reads_total',
+    'Conditional source reads during mirror reconciliation, by outcome (not_modified = 304).',
+    ['outcome']
+)
+SHARD_OWNED_CALENDARS = Gauge(
+    'calendar_bot_shard_owned_calendars',
+    'Calendars owned by each engine shard (1 = owned).',
+    ['instance', 'calendar_id'],
+    multiprocess_mode='livemax'
+)
+CALENDAR_SYNC_LAG_SECONDS = Gauge(
+    'calendar_bot_calendar_sync_lag_seconds',
+    'Seconds since each owned calendar last synced successfully.',
+    ['calendar_id'],
+    multiprocess_mode='livemax'
+)
+MIRROR_DRIFT_REPAIRS_TOTAL = Counter(
+    'calendar_bot_mirror_drift_repairs_total',
+    'Mirrors repaired after being edited or deleted by hand on the shared calendar.'
+)
+POLL_INTERVAL_SECONDS = Gauge(
+    'calendar_bot_poll_interval_seconds',
+    'Current adaptive safety-net poll interval for each calendar.',
+    ['calendar_id'],
+    multiprocess_mode='livemax'
+)
+MIRROR_RECONCILE_BACKLOG = Gauge(
+    'calendar_bot_mirror_reconcile_backlog',
+    'Mirrors not yet visited in the current reconciliation sweep.',
+    multiprocess_mode='livemax'
+)
+MIRROR_RECONCILE_SWEEP_SECONDS = Gauge(
+    'calendar_bot_mirror_reconcile_sweep_seconds',
+    'Wall time the last completed reconciliation sweep took, across budgeted runs.',
+    multiprocess_mode='livemax'
+)
+MIRROR_RECONCILE_SWEEP_COMPLETED = Gauge(
+    'calendar_bot_mirror_reconcile_sweep_completed_timestamp_seconds',
+    'Unix time the last reconciliation sweep completed.',
+    multiprocess_mode='livemax'
+)
+POLL_DEADLINE_EXCEEDED_TOTAL = Counter(
+    'calendar_bot_poll_deadline_exceeded_total',
+    'Polls cut short by their deadline (POLL_DEADLINE_SECONDS).'
+)
+CIRCUIT_BREAKER_STATE = Gauge(
+    'calendar_bot_circuit_breaker_state',
+    'State of each circuit breaker (0 = closed, 1 = half-open, 2 = open).',
+    ['breaker'],
+    multiprocess_mode='livemax'
+)
+CIRCUIT_BREAKER_REJECTED_TOTAL = Counter(
+    'calendar_bot_circuit_breaker_rejected_total',
+    'Calls short-circuited because their circuit breaker was open.',
+    ['breaker']
+)
+GOOGLE_API_REQUEST_SECONDS = Histogram(
+    'calendar_bot_google_api_request_seconds',
+    'Latency of each Calendar API request (and credential load), by account, method and HTTP status.',
+    ['account', 'method', 'status'],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+)
+GOOGLE_API_REQUESTS_TOTAL = Counter(
+    'calendar_bot_google_api_requests_total',
+    'Calendar API requests by account, method and outcome (HTTP status, auth_error, transport_error).',
+    ['account', 'method', 'status']
+)
+GOOGLE_API_RESPONSE_BYTES = Histogram(
+    'calendar_bot_google_api_response_bytes',
+    'Size of Calendar API response bodies, by account and method.',
+    ['account', 'method'],
+    buckets=(256, 1024, 4096, 16384, 65536, 262144, 1048576)
+)
+PROPAGATION_LATENCY_SECONDS = Histogram(
+    'calendar_bot_propagation_latency_seconds',
+    "Time from a source event's edit (its `updated` time) to the bot's write reflecting it.",
+    ['calendar_id', 'action', 'trigger'],
+    buckets=(5, 15, 30, 60, 120, 300, 600, 1800, 3600, 21600, 86400)
+)
+RESIDENT_STATE_ENTRIES = Gauge(
+    'calendar_bot_resident_state_entries',
+    'Entries in each long-lived in-memory structure of the engine.',
+    ['structure'],
+    multiprocess_mode='livemax'
+)
+RESIDENT_STATE_BYTES = Gauge(
+    'calendar_bot_resident_state_bytes',
+    'Approximate bytes held by each long-lived in-memory structure of the engine.',
+    ['structure'],
+    multiprocess_mode='livemax'
+)
+STATE_FILE_BYTES = Gauge(
+    'calendar_bot_state_file_bytes',
+    "On-disk size of each of the engine's state files.",
+    ['file'],
+    multiprocess_mode='livemax'
+)
+SYNC_BATCH_BYTES = Histogram(
+    'calendar_bot_sync_batch_bytes',
+    'Approximate bytes of the changed-event batch each calendar sync held in memory (estimated from a sample).',
+    ['full_sync'],
+    buckets=(16384, 65536, 262144, 1048576, 4194304, 16777216, 67108864)
+)
+SCHEDULER_JOB_LAG_SECONDS = Histogram(
+    'calendar_bot_scheduler_job_lag_seconds',
+    'How late each scheduler job was submitted to its executor, relative to its scheduled time.',
+    ['job'],
+    buckets=(0.01, 0.1, 0.5, 1, 5, 15, 60, 300)
+)
+SCHEDULER_JOB_DURATION_SECONDS = Histogram(
+    'calendar_bot_scheduler_job_duration_seconds',
+    'Run time of each scheduler job, from submission (including any executor queueing) to completion.',
+    ['job', 'outcome'],
+    buckets=(0.1, 0.5, 1, 5, 15, 60, 300, 900)
+)
+SCHEDULER_JOB_MISFIRES_TOTAL = Counter(
+    'calendar_bot_scheduler_job_misfires_total',
+    'Scheduled runs dropped because they were later than the misfire grace time.',
+    ['job']
+)
+SCHEDULER_JOB_SKIPPED_TOTAL = Counter(
+    'calendar_bot_scheduler_job_skipped_total',
+    'Scheduled runs dropped because the previous run was still going (max_instances reached).',
+    ['job']
+)
+SCHEDULER_JOBS_IN_FLIGHT = Gauge(
+    'calendar_bot_scheduler_jobs_in_flight',
+    'Job runs submitted to the executor and not yet finished (running or queued for a thread).',
+    multiprocess_mode='livemax'
+)
+LOG_RECORDS_DROPPED_TOTAL = Counter(
+    'calendar_bot_log_records_dropped_total',
+    'Log records dropped before being written, by reason (rate_limited, queue_full).',
+    ['reason']
+)
+ALERTS_TOTAL = Counter(
+    'calendar_bot_alerts_total',
+    'Alerts raised, by what became of them: sent (in an email), suppressed (folded into an '
+    'earlier alert with the same fingerprint) or dropped (queue full, email failed).',
+    ['outcome']
+)
+ALERT_EMAILS_TOTAL = Counter(
+    'calendar_bot_alert_emails_total',
+    'Alert emails by outcome (sent, failed, deferred by the hourly limit).',
+    ['outcome']
+)
+ALERT_OUTBOX_DEPTH = Gauge(
+    'calendar_bot_alert_outbox_depth',
+    'Alerts queued or waiting for their digest email.',
+    multiprocess_mode='livemax'
+)
@@ -1,7 +1,8 @@
 # ~/calendar_bot/utils/mirror.py
 """
 Mirror events that a source user was *invited to* (but does not organize) onto
-the shared calendar, and keep those mirrors in sync.
+the shared calendar (or whichever target calendars utils/routing.py sends them
+to), and keep those mirrors in sync.
 
 For events the source user organizes, the bot adds the shared calendar as an
 attendee and Google propagates moves/cancellations natively. But you cannot add
@@ -13,27 +14,71 @@ we delete the mirror.
 Both source accounts have manage access to the shared calendar, so each source
 service writes (and later reconciles) its own mirrors directly — no separate
 writer account is needed. The source event -> mirror event mapping is persisted
-in MIRROR_FILE.
+in MIRROR_FILE as `{source_key: {'mirror_id', 'ical_uid', 'digest', 'start_ts', 'end_ts', 'etag'}}`,
+where source_key is `<source calendar>::<event id>::<target calendar>`, so an
+event routed to several targets has one record (and one mirror) per target:
+a hash of the synced fields (rather than the fields themselves), the pre-parsed
+start and end times, and the source event's etag so reconciliation reads can be
+conditional.
+
+Reconciliation runs as its own budgeted job: each run spends at most a time and
+API-call budget, walking mirrors soonest-start first from a cursor persisted in
+RECONCILE_CURSOR_FILE, so a large map is swept over several runs instead of
+stalling one.
+
+Each record also keeps `mirror_etag`, the etag of our own last write to the
+mirror, through whichever source key it went. The shared calendar is itself incrementally synced (see `repair_drift`),
+so a mirror deleted or edited by hand shows up in its delta and is repaired from
+the source; changes whose etag matches `mirror_etag` are our own echoes.
+
+When both source accounts are invited to the same meeting, the second one
+attaches to the first one's mirror (matched on iCalUID) instead of creating a
+duplicate, so several source keys may share one mirror_id. The mirror is only
+deleted once the last attached source cancels or declines.
+
+Lookups go through a `MirrorIndex`: the map plus secondary indexes by iCalUID,
+by mirror and by source event, and an end-time ExpiryIndex per source
+calendar, built once when the file is loaded, kept in memory while the file is
+unchanged, and updated by every write. Finding an event's records or a
+meeting's existing mirror never scans the whole map, and reconciliation prunes
+its k expired mirrors in O(k log n).
 """
+import hashlib
 import json
 import os
+import threading
+import time
 from datetime import datetime, timezone, timedelta
 from pathlib import Path
 
 from googleapiclient.errors import HttpError
 
+from utils.breaker import CircuitOpen
+from utils.deadline import check
+from utils.expiry import ExpiryIndex
+from utils.filelock import file_lock
 from utils.logger import logger
+from utils.propagation import record_propagation
+from utils.routing import DEFAULT_TARGET
+from utils.tracing import span
 
-# The shared calendar we write mirrors onto (same address used for invites).
-SHARED_CALENDAR_ID = os.getenv('INVITE_EMAIL', 'joelandtaylor@gmail.com')
+# The default target calendar mirrors are written onto (same address used for invites).
+SHARED_CALENDAR_ID = DEFAULT_TARGET
 MIRROR_FILE = Path(os.getenv('MIRROR_FILE', 'data/mirrored_events.json'))
+RECONCILE_CURSOR_FILE = Path(os.getenv('RECONCILE_CURSOR_FILE', 'data/reconcile_cursor.json'))
 # Stop tracking (and reconciling) mirrors once the source event ended this long
 # ago. The mirror is left in place as a historical record.
 PRUNE_AFTER = timedelta(days=2)
 
 
-def _key(source_calendar_id, event_id):
-    return f"{source_calendar_id}::{event_id}"
+def _key(source_calendar_id, event_id, target=SHARED_CALENDAR_ID):
+    return f"{source_calendar_id}::{event_id}::{target}"
+
+
+def _parse_key(key):
+    """(source calendar, event id, target calendar) for a mirror map key."""
+    source_calendar_id, event_id, target = key.split('::', 2)
+    return source_calendar_id, event_id, target
 
 
 def _snapshot(event):
@@ -48,6 +93,12 @@ def _snapshot(event):
     }
 
 
+def _digest(snapshot):
+    """A stable, compact hash of a snapshot (key order doesn't matter)."""
+    canonical = json.dumps(snapshot, sort_keys=True, separators=(',', ':'))
+    return hashlib.blake2b(canonical.encode('utf-8'), digest_size=16).hexdigest()
+
+
 def _mirror_body(event):
     """The event body written onto the shared calendar.
 
@@ -94,10 +145,102 @@ def _end_dt(event):
         return None
 
 
+def _start_dt(event):
+    """Best-effort UTC start datetime for an event (handles all-day 'date')."""
+    return _end_dt({'end': event.get('start')})
+
+
+# Upper bounds on one recurrence period, for estimating a COUNT-limited series'
+# last occurrence. Overshooting only keeps a mirror tracked a little longer.
+_FREQ_PERIOD = {
+    'SECONDLY': timedelta(seconds=1),
+    'MINUTELY': timedelta(minutes=1),
+    'HOURLY': timedelta(hours=1),
+    'DAILY': timedelta(days=1),
+    'WEEKLY': timedelta(weeks=1),
+    'MONTHLY': timedelta(days=31),
+    'YEARLY': timedelta(days=366),
+}
+
+
+def _parse_until(val):
+    """Parse an RRULE UNTIL value ('YYYYMMDD' or 'YYYYMMDDTHHMMSS[Z]') as UTC."""
+    fmt = '%Y%m%dT%H%M%S' if 'T' in val else '%Y%m%d'
+    return datetime.strptime(val.rstrip('Z'), fmt).replace(tzinfo=timezone.utc)
+
+
+def _series_end_dt(event):
+    """Best-effort UTC end of a recurring series' last occurrence.
+
+    Derived from each RRULE's UNTIL or COUNT; None if any rule is unbounded or
+    the series can't be bounded (e.g. RDATEs), so the mirror is never pruned
+    while the series may still have future occurrences.
+    """
+    start_dt, end_dt = _start_dt(event), _end_dt(event)
+    if not start_dt or not end_dt:
+        return None
+    duration = end_dt - start_dt
+    last_start = start_dt
+    for line in event.get('recurrence') or []:
+        name, _, value = line.partition(':')
+        name = name.split(';', 1)[0].upper()
+        if name == 'RDATE':
+            return None
+        if name != 'RRULE':
+            continue  # EXDATE/EXRULE only remove occurrences
+        parts = dict(p.split('=', 1) for p in value.upper().split(';') if '=' in p)
+        try:
+            if 'UNTIL' in parts:
+                rule_last = _parse_until(parts['UNTIL'])
+            elif 'COUNT' in parts and parts.get('FREQ') in _FREQ_PERIOD:
+                periods = (int(parts['COUNT']) - 1) * int(parts.get('INTERVAL', 1))
+                # BYDAY/BYMONTHDAY etc. can place occurrences later within the
+                # final period, so allow one extra period.
+                rule_last = start_dt + _FREQ_PERIOD[parts['FREQ']] * (periods + 1)
+            else:
+                return None  # unbounded
+        except ValueError:
+            return None
+        last_start = max(last_start, rule_last)
+    return last_start + duration
+
+
+def event_end_ts(event):
+    """The event's end as a UTC epoch timestamp (int), or None if unknown.
+
+    For a recurring master this is the end of the series' last occurrence
+    (None if the series is unbounded), not the first occurrence's end.
+    """
+    end_dt = _series_end_dt(event) if event.get('recurrence') else _end_dt(event)
+    return int(end_dt.timestamp()) if end_dt else None
+
+
+def event_start_ts(event):
+    """The event's (first occurrence's) start as a UTC epoch timestamp, or None."""
+    start_dt = _start_dt(event)
+    return int(start_dt.timestamp()) if start_dt else None
+
+
+def _migrate_record(record):
+    """Convert a legacy record holding the full `snapshot` dict to digest form."""
+    if 'snapshot' in record:
+        snapshot = record.pop('snapshot') or {}
+        record['digest'] = _digest(snapshot)
+        record['end_ts'] = event_end_ts(snapshot)
+    return record
+
+
 def load_mirror_map():
     if MIRROR_FILE.exists():
         try:
-            return json.loads(MIRROR_FILE.read_text())
+            mirror_map = json.loads(MIRROR_FILE.read_text())
+            for record in mirror_map.values():
+                _migrate_record(record)
+            # Keys from before routing had no target; they were all on the shared calendar.
+            return {
+                (key if key.count('::') == 2 else f"{key}::{SHARED_CALENDAR_ID}"): record
+                for key, record in mirror_map.items()
+            }
         except json.JSONDecodeError:
             logger.error("🪞 Mirror map file is corrupt; starting fresh.")
     return {}
@@ -105,7 +248,151 @@ def load_mirror_map():
 
 def save_mirror_map(mirror_map):
     MIRROR_FILE.parent.mkdir(parents=True, exist_ok=True)
-    MIRROR_FILE.write_text(json.dumps(mirror_map, indent=2))
+    # Written aside and renamed into place, so readers in other shards never
+    # see a partial file and every save changes the file's stamp.
+    tmp = MIRROR_FILE.with_name(f"{MIRROR_FILE.name}.tmp")
+    tmp.write_text(json.dumps(mirror_map, indent=2))
+    os.replace(tmp, MIRROR_FILE)
+
+
+class MirrorIndex:
+    """The mirror map with the secondary indexes its lookups need.
+
+    Records must not be mutated in place; writes go through `update_mirror_map`,
+    which keeps the indexes in step via `put`/`drop`.
+    """
+
+    def __init__(self, mirror_map):
+        self.records = mirror_map
+        self._by_uid = {}     # (ical_uid, target) -> keys holding a mirror of that meeting
+        self._by_mirror = {}  # (target, mirror_id) -> keys attached to that mirror
+        self._by_source = {}  # (source calendar, event id) -> keys, one per target
+        self._by_calendar = {}  # source calendar -> its keys
+        self._expiry = {}  # source calendar -> ExpiryIndex of its keys' end_ts
+        for key, record in mirror_map.items():
+            self._add(key, record)
+
+    def __len__(self):
+        return len(self.records)
+
+    def get(self, key):
+        return self.records.get(key)
+
+    def keys_for_source(self, source_calendar_id, event_id):
+        """Keys of every target's record for one source event."""
+        return list(self._by_source.get((source_calendar_id, event_id), ()))
+
+    def attached_keys(self, target, mirror_id):
+        """Source keys sharing the mirror `mirror_id` on `target`."""
+        return list(self._by_mirror.get((target, mirror_id), ()))
+
+    def keys_for_calendars(self, calendars=None):
+        """Keys of the given source calendars' records (every record if None)."""
+        if calendars is None:
+            return list(self.records)
+        return [key for cal in calendars for key in self._by_calendar.get(cal, ())]
+
+    def expired(self, cutoff, calendars=None):
+        """Keys of the given source calendars' records (all if None) whose
+        source ended before `cutoff`. They leave the expiry index; the caller
+        drops them from the map."""
+        cals = list(self._expiry) if calendars is None else calendars
+        return [key for cal in cals if cal in self._expiry for key in self._expiry[cal].pop_expired(cutoff)]
+
+    def find_by_ical_uid(self, ical_uid, target):
+        """An existing record mirroring the meeting `ical_uid` onto `target`, or None."""
+        for key in self._by_uid.get((ical_uid, target), ()):
+            return self.records[key]
+        return None
+
+    def put(self, key, record):
+        self.drop(key)
+        self.records[key] = record
+        self._add(key, record)
+
+    def drop(self, key):
+        record = self.records.pop(key, None)
+        if record is None:
+            return
+        source_calendar_id, event_id, target = _parse_key(key)
+        _discard(self._by_source, (source_calendar_id, event_id), key)
+        _discard(self._by_calendar, source_calendar_id, key)
+        expiry = self._expiry.get(source_calendar_id)
+        if expiry is not None:
+            expiry.discard(key)
+            if not len(expiry):
+                del self._expiry[source_calendar_id]
+        if record.get('mirror_id'):
+            _discard(self._by_mirror, (target, record['mirror_id']), key)
+            if record.get('ical_uid'):
+                _discard(self._by_uid, (record['ical_uid'], target), key)
+
+    def _add(self, key, record):
+        source_calendar_id, event_id, target = _parse_key(key)
+        self._by_source.setdefault((source_calendar_id, event_id), set()).add(key)
+        self._by_calendar.setdefault(source_calendar_id, set()).add(key)
+        self._expiry.setdefault(source_calendar_id, ExpiryIndex()).set(key, record.get('end_ts'))
+        if record.get('mirror_id'):
+            self._by_mirror.setdefault((target, record['mirror_id']), set()).add(key)
+            if record.get('ical_uid'):
+                self._by_uid.setdefault((record['ical_uid'], target), set()).add(key)
+
+
+def _discard(index, slot, key):
+    keys = index.get(slot)
+    if keys is not None:
+        keys.discard(key)
+        if not keys:
+            del index[slot]
+
+
+_index = None
+_index_stamp = None
+_index_lock = threading.RLock()
+
+
+def _file_stamp():
+    try:
+        st = os.stat(MIRROR_FILE)
+    except FileNotFoundError:
+        return (str(MIRROR_FILE), None)
+    return (str(MIRROR_FILE), st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+def mirror_index():
+    """The current `MirrorIndex`, reloaded (and re-indexed) only when the map
+    file changed since it was last read or written by this process."""
+    global _index, _index_stamp
+    with _index_lock:
+        stamp = _file_stamp()
+        if _index is None or stamp != _index_stamp:
+            _index, _index_stamp = MirrorIndex(load_mirror_map()), stamp
+        return _index
+
+
+def cached_index():
+    """The index this process currently holds in memory (None before the
+    first load), without checking the file."""
+    return _index
+
+
+def update_mirror_map(changes):
+    """Apply `{key: record}` changes (None drops the key) to the on-disk map.
+
+    The map is re-read (if another shard wrote it) and written under the file
+    lock, so a shard only ever writes its own entries and never clobbers
+    another shard's concurrent ones.
+    """
+    global _index_stamp
+    with file_lock(MIRROR_FILE), _index_lock:
+        index = mirror_index()
+        for key, record in changes.items():
+            if record is None:
+                index.drop(key)
+            else:
+                index.put(key, record)
+        save_mirror_map(index.records)
+        _index_stamp = _file_stamp()
 
 
 def is_self_organized(event):
@@ -120,136 +407,440 @@ def is_self_organized(event):
     return organizer.get('self', False)
 
 
-def ensure_mirror(service, source_calendar_id, event):
-    """Create or update the shared-calendar mirror for a non-organized event.
+def ensure_mirror(service, source_calendar_id, event, targets=(SHARED_CALENDAR_ID,), deadline=None):
+    """Create or update the mirrors of a non-organized event on each of `targets`.
 
     `service` is the source account's Calendar service (it has manage access to
-    the shared calendar). Returns True if a mirror exists/was written, False if
-    it was skipped (e.g. the shared calendar isn't writable).
+    the target calendars). Mirrors the event previously had on targets it no
+    longer routes to are released. All map changes for the event are written in
+    one pass. Returns the targets that now hold a mirror (those that aren't
+    writable are skipped).
     """
-    mirror_map = load_mirror_map()
-    key = _key(source_calendar_id, event['id'])
-    snapshot = _snapshot(event)
-    record = mirror_map.get(key)
+    index = mirror_index()
+    digest = _digest(_snapshot(event))
+    changes = {}
+    mirrored = []
 
-    try:
-        if record and record.get('mirror_id'):
-            if record.get('snapshot') == snapshot:
-                return True  # already mirrored and unchanged
-            service.events().patch(
-                calendarId=SHARED_CALENDAR_ID, eventId=record['mirror_id'],
-                body=_mirror_body(event)
-            ).execute()
-            logger.info(f"🔁 Updated shared-calendar mirror for “{event.get('summary')}”.")
-        else:
-            created = service.events().insert(
-                calendarId=SHARED_CALENDAR_ID, body=_mirror_body(event)
-            ).execute()
-            record = {'mirror_id': created['id']}
-            logger.info(f"🪞 Mirrored “{event.get('summary')}” onto the shared calendar.")
-        record['snapshot'] = snapshot
-        mirror_map[key] = record
-        save_mirror_map(mirror_map)
-        return True
-    except HttpError as e:
-        if e.resp.status in (403, 404):
-            logger.warning(
-                f"⚠️ Cannot write to shared calendar '{SHARED_CALENDAR_ID}' (status {e.resp.status}). "
-                "Does the source account have manage access? Skipping mirror."
-            )
-            return False
-        raise
+    for key in index.keys_for_source(source_calendar_id, event['id']):
+        if _parse_key(key)[2] not in targets:  # no longer routed there
+            _release(service, index, key, changes)
 
+    try:
+        for target in targets:
+            check(deadline, f"mirroring onto {target}")
+            key = _key(source_calendar_id, event['id'], target)
+            current = index.get(key)
+            record = dict(current) if current else None
+            if not (record and record.get('mirror_id')):
+                # Another source invited to the same meeting may already have mirrored
+                # it; attach to that mirror rather than writing a duplicate.
+                shared = index.find_by_ical_uid(event.get('iCalUID'), target)
+                if shared:
+                    record = dict(shared)
+                    logger.info("🔗 Attached “%s” from %s to its existing mirror.", event.get('summary'), source_calendar_id)
 
-def _delete_mirror(service, mirror_id):
+            try:
+                if record and record.get('mirror_id'):
+                    if record.get('digest') != digest:
+                        written = service.events().patch(
+                            calendarId=target, eventId=record['mirror_id'],
+                            body=_mirror_body(event)
+                        ).execute()
+                        record['mirror_etag'] = written.get('etag')
+                        _share_etag(index, changes, target, record['mirror_id'], record['mirror_etag'])
+                        record_propagation(source_calendar_id, 'mirror_write', event)
+                        logger.info("🔁 Updated mirror on %s for “%s”.", target, event.get('summary'))
+                    elif current == record:
+                        mirrored.append(target)
+                        continue  # already mirrored and unchanged
+                else:
+                    created = service.events().insert(
+                        calendarId=target, body=_mirror_body(event)
+                    ).execute()
+                    record = {'mirror_id': created['id'], 'mirror_etag': created.get('etag')}
+                    record_propagation(source_calendar_id, 'mirror_write', event)
+                    logger.info("🪞 Mirrored “%s” onto %s.", event.get('summary'), target)
+            except HttpError as e:
+                if e.resp.status in (403, 404):
+                    logger.warning(
+                        "⚠️ Cannot write to target calendar '%s' (status %s). "
+                        "Does the source account have manage access? Skipping mirror.",
+                        target, e.resp.status,
+                    )
+                    continue
+                raise
+            record['ical_uid'] = event.get('iCalUID')
+            record['digest'] = digest
+            record['start_ts'] = event_start_ts(event)
+            record['end_ts'] = event_end_ts(event)
+            record['etag'] = event.get('etag')
+            changes[key] = record
+            mirrored.append(target)
+    finally:
+        if changes:  # persist what was written even if the deadline cut us short
+            update_mirror_map(changes)
+    return mirrored
+
+
+def _share_etag(index, changes, target, mirror_id, etag):
+    """Record the etag of our write to a mirror on every source key attached to
+    it, so `_repair_one` recognises the echo whichever key it compares against."""
+    for key in index.attached_keys(target, mirror_id):
+        if key in changes and changes[key] is None:
+            continue  # being released
+        record = dict(changes.get(key) or index.get(key))
+        record['mirror_etag'] = etag
+        changes[key] = record
+
+
+def _delete_mirror(service, target, mirror_id):
     if not mirror_id:
         return
     try:
         service.events().delete(
-            calendarId=SHARED_CALENDAR_ID, eventId=mirror_id
+            calendarId=target, eventId=mirror_id
         ).execute()
     except HttpError as e:
         if e.resp.status not in (404, 410):  # already gone is fine
-            logger.error(f"Failed to delete shared-calendar mirror {mirror_id}: {e}")
-
-
-def remove_mirror(service, source_calendar_id, event_id):
-    """Delete the shared-calendar mirror for a now cancelled/deleted source event."""
-    mirror_map = load_mirror_map()
-    key = _key(source_calendar_id, event_id)
-    record = mirror_map.get(key)
-    if not record:
+            logger.error("Failed to delete mirror %s on %s: %s", mirror_id, target, e)
+
+
+def _release(service, index, key, changes):
+    """Detach `key` from its mirror, deleting the mirror if no other source is
+    still attached to it. Records the drop in `changes` (the caller persists
+    them); keys `changes` already drops no longer count as attached."""
+    record = index.get(key)
+    changes[key] = None
+    target = _parse_key(key)[2]
+    mirror_id = record.get('mirror_id')
+    attached = [k for k in index.attached_keys(target, mirror_id) if not (k in changes and changes[k] is None)]
+    if mirror_id and attached:
+        logger.info("🔗 Detached a source from a shared mirror; other invitees still keep it.")
         return
-    _delete_mirror(service, record.get('mirror_id'))
-    del mirror_map[key]
-    save_mirror_map(mirror_map)
-    logger.info("🗑️ Removed shared-calendar mirror for a cancelled source event.")
+    _delete_mirror(service, target, mirror_id)
+    logger.info("🗑️ Removed mirror on %s for a cancelled source event.", target)
 
 
-def apply_instance_exception(service, source_calendar_id, exception_event):
-    """Reflect a single-occurrence change of a recurring source series onto its
-    mirror: cancel or move the matching instance of the mirror event.
+def remove_mirror(service, source_calendar_id, event_id, deadline=None):
+    """Drop the mirrors (on every target) for a now cancelled/deleted/declined
+    source event.
 
-    No-op if the series isn't mirrored (e.g. it's self-organized) or the matching
-    mirror instance can't be located.
+    If another source is attached to the same mirror it is left in place.
     """
-    master_id = exception_event.get('recurringEventId')
-    original_start = exception_event.get('originalStartTime') or {}
-    start_val = original_start.get('dateTime') or original_start.get('date')
-    if not master_id or not start_val:
+    index = mirror_index()
+    keys = index.keys_for_source(source_calendar_id, event_id)
+    if not keys:
         return
+    released = {}
+    try:
+        for key in keys:
+            check(deadline, f"removing mirror {key}")
+            _release(service, index, key, released)
+    finally:
+        if released:
+            update_mirror_map(released)
 
-    record = load_mirror_map().get(_key(source_calendar_id, master_id))
-    if not record or not record.get('mirror_id'):
-        return  # series not mirrored (likely self-organized) -> nothing to do
-    mirror_id = record['mirror_id']
 
+def _instance_id(mirror_id, original_start):
+    """The Google instance ID of a recurring event's occurrence.
+
+    Instances are addressed as `<masterId>_<originalStart>`, where the original
+    start is the UTC basic-format timestamp (`20300101T090000Z`) for timed
+    events and the bare date (`20300101`) for all-day ones. Returns None if the
+    start can't be parsed.
+    """
+    if original_start.get('dateTime'):
+        try:
+            dt = datetime.fromisoformat(original_start['dateTime'].replace('Z', '+00:00'))
+        except ValueError:
+            return None
+        if dt.tzinfo is None:
+            dt = dt.replace(tzinfo=timezone.utc)
+        return f"{mirror_id}_{dt.astimezone(timezone.utc).strftime('%Y%m%dT%H%M%SZ')}"
+    if original_start.get('date'):
+        return f"{mirror_id}_{original_start['date'].replace('-', '')}"
+    return None
+
+
+def _lookup_instance_id(service, target, mirror_id, start_val):
+    """Fallback: ask Google for the mirror occurrence at `start_val`."""
     try:
         resp = service.events().instances(
-            calendarId=SHARED_CALENDAR_ID, eventId=mirror_id,
+            calendarId=target, eventId=mirror_id,
             originalStart=start_val, showDeleted=True,
         ).execute()
     except HttpError as e:
-        logger.error(f"Mirror exception: could not list mirror instance for {mirror_id} @ {start_val}: {e}")
+        logger.error("Mirror exception: could not list mirror instance for %s @ %s: %s", mirror_id, start_val, e)
+        return None
+    instances = resp.get('items', [])
+    return instances[0]['id'] if instances else None
+
+
+def _apply_to_instance(service, target, instance_id, exception_event):
+    """Cancel or move one mirror occurrence. Raises HttpError as-is."""
+    if exception_event.get('status') == 'cancelled':
+        service.events().delete(
+            calendarId=target, eventId=instance_id
+        ).execute()
+        logger.info("🗑️ Cancelled a single mirror occurrence to match the source.")
+    else:
+        body = {
+            'start': _ensure_timezone(exception_event.get('start')),
+            'end': _ensure_timezone(exception_event.get('end')),
+            'location': exception_event.get('location'),
+        }
+        if exception_event.get('summary'):
+            body['summary'] = exception_event['summary']
+        service.events().patch(
+            calendarId=target, eventId=instance_id, body=body,
+        ).execute()
+        logger.info("🔁 Moved a single mirror occurrence to match the source.")
+
+
+def _apply_exception(service, target, mirror_id, exception_event):
+    """Apply one occurrence exception to a mirror. Returns True if a mirror
+    occurrence was written, False if there was nothing to write or it failed."""
+    original_start = exception_event.get('originalStartTime') or {}
+    start_val = original_start.get('dateTime') or original_start.get('date')
+    instance_id = _instance_id(mirror_id, original_start)
+
+    if instance_id:
+        try:
+            _apply_to_instance(service, target, instance_id, exception_event)
+            return True
+        except HttpError as e:
+            if e.resp.status == 410 and exception_event.get('status') == 'cancelled':
+                return False  # occurrence already cancelled on the mirror
+            if e.resp.status != 404:
+                logger.error("Mirror exception: failed to apply to mirror instance %s: %s", instance_id, e)
+                return False
+            # Computed ID didn't match (e.g. an unusual ID form); look it up instead.
+
+    instance_id = _lookup_instance_id(service, target, mirror_id, start_val)
+    if not instance_id:
+        return False  # no matching mirror instance to act on
+    try:
+        _apply_to_instance(service, target, instance_id, exception_event)
+        return True
+    except HttpError as e:
+        if e.resp.status not in (404, 410):
+            logger.error("Mirror exception: failed to apply to mirror instance %s: %s", instance_id, e)
+        return False
+
+
+def apply_instance_exceptions(service, source_calendar_id, exception_events, deadline=None):
+    """Reflect single-occurrence changes of recurring source series onto their
+    mirrors: cancel or move the matching instance of each mirror event.
+
+    Exceptions are grouped by series so the mirror map is read once and each
+    series' mirror ID resolved once. The mirror instance ID is computed from the
+    mirror ID and the original start; `events().instances` is only consulted if
+    that ID 404s.
+
+    Exceptions whose series isn't mirrored (e.g. it's self-organized) are no-ops.
+    """
+    by_series = {}
+    for exception_event in exception_events:
+        master_id = exception_event.get('recurringEventId')
+        original_start = exception_event.get('originalStartTime') or {}
+        if not master_id or not (original_start.get('dateTime') or original_start.get('date')):
+            continue
+        by_series.setdefault(master_id, []).append(exception_event)
+    if not by_series:
         return
 
-    instances = resp.get('items', [])
-    if not instances:
-        return  # no matching mirror instance to act on
-    instance = instances[0]
+    index = mirror_index()
+    for master_id, series_exceptions in by_series.items():
+        check(deadline, f"applying exceptions of series {master_id}")
+        # One mirror per target; a series not mirrored anywhere (likely
+        # self-organized) has no keys and nothing to do.
+        for key in index.keys_for_source(source_calendar_id, master_id):
+            mirror_id = index.get(key).get('mirror_id')
+            if not mirror_id:
+                continue
+            for exception_event in series_exceptions:
+                if _apply_exception(service, _parse_key(key)[2], mirror_id, exception_event):
+                    record_propagation(source_calendar_id, 'instance_exception', exception_event)
+
+
+def apply_instance_exception(service, source_calendar_id, exception_event, deadline=None):
+    """Reflect a single-occurrence change of a recurring source series onto its
+    mirror. See `apply_instance_exceptions`.
+    """
+    apply_instance_exceptions(service, source_calendar_id, [exception_event], deadline)
 
+
+def repair_drift(build_service, shared_events, target=SHARED_CALENDAR_ID, deadline=None):
+    """Repair mirrors that changed on a target calendar other than by us.
+
+    `shared_events` is an incremental-sync delta of the `target` calendar. Each
+    change is matched to its source keys through the index of mirror_id ->
+    source keys; entries whose etag equals the `mirror_etag` we recorded are
+    our own writes and are ignored. A mirror deleted by hand is recreated from
+    a live source, one edited by hand is overwritten from it. Cost is
+    O(changes) API calls, independent of how many mirrors exist.
+
+    Returns the number of mirrors repaired.
+    """
+    index = mirror_index()
+    changes = {}
+    repaired = 0
     try:
-        if exception_event.get('status') == 'cancelled':
-            if instance.get('status') != 'cancelled':
-                service.events().delete(
-                    calendarId=SHARED_CALENDAR_ID, eventId=instance['id']
+        for shared_event in shared_events:
+            check(deadline, f"repairing drift on {target}")
+            repaired += _repair_one(build_service, index, changes, shared_event, target)
+    finally:
+        if changes:  # keep what was repaired before the deadline
+            update_mirror_map(changes)
+    return repaired
+
+
+def _repair_one(build_service, index, changes, shared_event, target):
+    """Repair the mirror behind one target-calendar change. Returns 1 if it was
+    repaired, else 0; repaired records are added to `changes`."""
+    if shared_event.get('recurringEventId'):
+        return 0  # occurrence exceptions are written by apply_instance_exceptions
+    keys = sorted(index.attached_keys(target, shared_event.get('id')))
+    if not keys:
+        return 0  # not one of our mirrors
+    deleted = shared_event.get('status') == 'cancelled'
+    if not deleted and shared_event.get('etag') == index.get(keys[0]).get('mirror_etag'):
+        return 0  # echo of our own write
+
+    for key in keys:  # repair from the first attached source that still exists
+        source_cal, source_eid, _ = _parse_key(key)
+        try:
+            service = build_service(source_cal)
+            source_event = service.events().get(calendarId=source_cal, eventId=source_eid).execute()
+            if source_event.get('status') == 'cancelled':
+                continue  # reconcile will release this key
+            if deleted:
+                written = service.events().insert(
+                    calendarId=target, body=_mirror_body(source_event)
+                ).execute()
+                logger.info("🩹 Recreated hand-deleted mirror for “%s”.", source_event.get('summary'))
+            else:
+                written = service.events().patch(
+                    calendarId=target, eventId=shared_event['id'],
+                    body=_mirror_body(source_event)
                 ).execute()
-                logger.info("🗑️ Cancelled a single mirror occurrence to match the source.")
+                logger.info("🩹 Reverted hand edit to mirror for “%s”.", source_event.get('summary'))
+        except CircuitOpen:
+            continue  # that account is failing; try another attached source
+        except HttpError as e:
+            if e.resp.status in (404, 410):
+                continue  # source gone; reconcile will release this key
+            logger.error("Mirror drift: failed to repair mirror %s from %s: %s", shared_event.get('id'), key, e)
+            return 0
+        for attached in keys:
+            record = dict(index.get(attached))
+            record['mirror_id'] = written['id']
+            record['mirror_etag'] = written.get('etag')
+            if attached == key:
+                record['digest'] = _digest(_snapshot(source_event))
+                record['start_ts'] = event_start_ts(source_event)
+                record['end_ts'] = event_end_ts(source_event)
+                record['etag'] = source_event.get('etag')
+            changes[attached] = record
+        return 1
+    return 0
+
+
+def _source_get_request(service, source_calendar_id, event_id, etag=None):
+    """An events().get request for a source event, conditional on `etag`.
+
+    With an etag the request carries If-None-Match, so Google answers 304 (no
+    body) when the event is unchanged. The header lives on the request itself,
+    so it is honoured whether the request is executed directly or added to a
+    BatchHttpRequest; either way a 304 surfaces as an HttpError (see
+    `_not_modified`).
+    """
+    request = service.events().get(calendarId=source_calendar_id, eventId=event_id)
+    if etag:
+        request.headers['If-None-Match'] = etag
+    return request
+
+
+def _not_modified(error):
+    return isinstance(error, HttpError) and error.resp.status == 304
+
+
+def _cursor_scope(calendars):
+    return 'all' if calendars is None else ','.join(sorted(calendars))
+
+
+def load_reconcile_cursor(calendars=None):
+    """The in-progress sweep for this calendar scope, or None if the next run
+    starts a fresh sweep: `{'sweep_started', 'priority', 'key'}`."""
+    if RECONCILE_CURSOR_FILE.exists():
+        try:
+            return json.loads(RECONCILE_CURSOR_FILE.read_text()).get(_cursor_scope(calendars))
+        except json.JSONDecodeError:
+            logger.error("🪞 Reconcile cursor file is corrupt; starting a fresh sweep.")
+    return None
+
+
+def save_reconcile_cursor(cursor, calendars=None):
+    """Persist (or, with None, clear) the cursor for this calendar scope."""
+    with file_lock(RECONCILE_CURSOR_FILE):
+        cursors = {}
+        if RECONCILE_CURSOR_FILE.exists():
+            try:
+                cursors = json.loads(RECONCILE_CURSOR_FILE.read_text())
+            except json.JSONDecodeError:
+                pass
+        scope = _cursor_scope(calendars)
+        if cursor is None:
+            cursors.pop(scope, None)
         else:
-            service.events().patch(
-                calendarId=SHARED_CALENDAR_ID, eventId=instance['id'],
-                body={
-                    'summary': exception_event.get('summary', instance.get('summary')),
-                    'start': _ensure_timezone(exception_event.get('start')),
-                    'end': _ensure_timezone(exception_event.get('end')),
-                    'location': exception_event.get('location'),
-                },
-            ).execute()
-            logger.info("🔁 Moved a single mirror occurrence to match the source.")
-    except HttpError as e:
-        logger.error(f"Mirror exception: failed to apply to mirror instance {instance.get('id')}: {e}")
+            cursors[scope] = cursor
+        RECONCILE_CURSOR_FILE.parent.mkdir(parents=True, exist_ok=True)
+        RECONCILE_CURSOR_FILE.write_text(json.dumps(cursors, indent=2))
 
 
-def reconcile_mirrors(build_service):
-    """Walk all tracked mirrors and propagate source moves/cancellations.
+def reconcile_mirrors(build_service, read_counter=None, calendars=None, max_seconds=None, max_calls=None):
+    """Propagate source moves/cancellations to tracked mirrors, within a budget.
+
+    If `calendars` is given, only mirrors of those source calendars are
+    reconciled (a shard reconciles just the calendars it owns).
+
+    One sweep visits every mirror once, soonest source start first (events
+    already under way, including recurring series, rank as starting when the
+    sweep began). A run stops once it has spent `max_seconds` or made
+    `max_calls` API calls (None = unlimited) and leaves a cursor, so the next
+    run resumes the same sweep where this one stopped.
+
+    Returns `{'backlog': mirrors left in the sweep, 'sweep_seconds': duration
+    of the sweep if this run completed it, else None}`.
 
     `build_service(calendar_id)` returns an authed Calendar service. Each
     mirror is read from, and written to, using the service for its own source
     calendar (which holds manage access to the shared calendar).
+
+    Source reads are conditional on the etag stored with each mirror, so an
+    unchanged source costs a bodiless 304. If given, `read_counter` (a
+    Prometheus Counter labelled by `outcome`) counts reads as 'not_modified',
+    'modified', 'gone' or 'error'.
     """
-    mirror_map = load_mirror_map()
+    def count_read(outcome):
+        if read_counter is not None:
+            read_counter.labels(outcome=outcome).inc()
+
+    if calendars is not None:
+        calendars = set(calendars)
+    prune_before = (datetime.now(timezone.utc) - PRUNE_AFTER).timestamp()
+
+    # Stop tracking long-past mirrors straight from the end-time index, before
+    # spending any API reads on them.
+    with _index_lock:
+        expired = mirror_index().expired(prune_before, calendars)
+    if expired:
+        update_mirror_map({key: None for key in expired})
+
+    index = mirror_index()  # for attachment counts across every source
+    mirror_map = {key: index.get(key) for key in index.keys_for_calendars(calendars)}
     if not mirror_map:
-        return
+        return {'backlog': 0, 'sweep_seconds': None}
 
     services = {}
 
@@ -258,58 +849,130 @@ def reconcile_mirrors(build_service):
             services[cal] = build_service(cal)
         return services[cal]
 
-    now = datetime.now(timezone.utc)
-    changed = False
+    changes = {}  # key -> updated record, or None to drop it
+
+    def forget(key):
+        del mirror_map[key]
+        changes[key] = None
+
+    def release(source_service, key):
+        # Deletes the mirror itself only if no other source is attached.
+        _release(source_service, index, key, changes)
+        del mirror_map[key]
+
+    calls = 0
 
-    for key, record in list(mirror_map.items()):
-        source_cal, source_eid = key.split('::', 1)
+    def reconcile_one(key, record):
+        """Sync one source key's mirror. Returns False if the source is gone."""
+        nonlocal calls
+        source_cal, source_eid, target = _parse_key(key)
+        record = dict(changes.get(key) or record)  # another key's write may have updated it
+        calls += 1
 
         try:
             source_service = svc(source_cal)
+        except CircuitOpen:
+            return True  # account unavailable; revisited next sweep
         except Exception as e:
-            logger.error(f"🪞 Mirror reconcile: could not build service for {source_cal}: {e}")
-            continue
+            logger.error("🪞 Mirror reconcile: could not build service for %s: %s", source_cal, e)
+            return True
 
         try:
-            source_event = source_service.events().get(
-                calendarId=source_cal, eventId=source_eid
+            source_event = _source_get_request(
+                source_service, source_cal, source_eid, record.get('etag')
             ).execute()
+        except CircuitOpen:
+            return True
         except HttpError as e:
-            if e.resp.status in (404, 410):  # source deleted -> remove mirror
-                _delete_mirror(source_service, record.get('mirror_id'))
-                del mirror_map[key]
-                changed = True
-                logger.info("🗑️ Source event gone; removed its shared-calendar mirror.")
+            if _not_modified(e):  # source unchanged since the last read
+                count_read('not_modified')
+            elif e.resp.status in (404, 410):  # source deleted -> remove mirror
+                count_read('gone')
+                logger.info("🗑️ Source event gone; releasing its shared-calendar mirror.")
+                release(source_service, key)
+                return False
             else:
-                logger.error(f"Mirror reconcile: failed to read source {key}: {e}")
-            continue
+                count_read('error')
+                logger.error("Mirror reconcile: failed to read source %s: %s", key, e)
+            return True
+        count_read('modified')
 
         if source_event.get('status') == 'cancelled':  # source cancelled -> remove mirror
-            _delete_mirror(source_service, record.get('mirror_id'))
-            del mirror_map[key]
-            changed = True
-            logger.info("🗑️ Source event cancelled; removed its shared-calendar mirror.")
-            continue
+            logger.info("🗑️ Source event cancelled; releasing its shared-calendar mirror.")
+            release(source_service, key)
+            return False
 
-        end_dt = _end_dt(source_event)
-        if end_dt and end_dt < now - PRUNE_AFTER:  # stop tracking long-past events
-            del mirror_map[key]
-            changed = True
-            continue
+        # An unchanged digest means an unchanged end, so the cached end_ts can
+        # be trusted for pruning; only a changed source needs its end re-parsed.
+        digest = _digest(_snapshot(source_event))
+        end_ts = record.get('end_ts') if digest == record.get('digest') else event_end_ts(source_event)
+        if end_ts is not None and end_ts < prune_before:  # moved into the past
+            forget(key)
+            return True
 
-        snapshot = _snapshot(source_event)
-        if snapshot != record.get('snapshot'):  # source moved/edited -> patch mirror
+        if digest != record.get('digest'):  # source moved/edited -> patch mirror
+            calls += 1
             try:
-                source_service.events().patch(
-                    calendarId=SHARED_CALENDAR_ID, eventId=record['mirror_id'],
+                written = source_service.events().patch(
+                    calendarId=target, eventId=record['mirror_id'],
                     body=_mirror_body(source_event)
                 ).execute()
-                record['snapshot'] = snapshot
-                mirror_map[key] = record
-                changed = True
-                logger.info(f"🔁 Synced shared-calendar mirror for “{source_event.get('summary')}”.")
-            except HttpError as e:
-                logger.error(f"Mirror reconcile: failed to update mirror {key}: {e}")
+                record['mirror_etag'] = written.get('etag')
+                _share_etag(index, changes, target, record['mirror_id'], record['mirror_etag'])
+                record_propagation(source_cal, 'mirror_write', source_event, trigger='reconcile')
+                record['digest'] = digest
+                record['start_ts'] = event_start_ts(source_event)
+                record['end_ts'] = end_ts
+                record['etag'] = source_event.get('etag')
+                changes[key] = record
+                logger.info("🔁 Synced shared-calendar mirror for “%s”.", source_event.get('summary'))
+            except (HttpError, CircuitOpen) as e:
+                logger.error("Mirror reconcile: failed to update mirror %s: %s", key, e)
+        elif source_event.get('etag') != record.get('etag'):
+            # Changed in a field we don't mirror; remember the etag so the next
+            # read can be a 304.
+            record['etag'] = source_event.get('etag')
+            changes[key] = record
+        return True
 
-    if changed:
-        save_mirror_map(mirror_map)
+    # Sources attached to the same mirror (one meeting, several invitees) are
+    # the same event, so reading one live source keeps the mirror in sync; the
+    # others are only read if the ones before them are gone.
+    groups = {}
+    for key, record in mirror_map.items():
+        group = (_parse_key(key)[2], record['mirror_id']) if record.get('mirror_id') else key
+        groups.setdefault(group, []).append(key)
+
+    cursor = load_reconcile_cursor(calendars) or {'sweep_started': time.time()}
+    sweep_started = cursor['sweep_started']
+
+    def priority(keys):
+        starts = [mirror_map[k].get('start_ts') or mirror_map[k].get('end_ts') or 0 for k in keys]
+        return max(min(starts), int(sweep_started))
+
+    ordered = sorted((priority(keys), min(keys), keys) for keys in groups.values())
+    if 'key' in cursor:
+        resume_after = (cursor['priority'], cursor['key'])
+        ordered = [g for g in ordered if (g[0], g[1]) > resume_after]
+
+    deadline = time.monotonic() + max_seconds if max_seconds is not None else None
+    visited = 0
+    for prio, head, keys in ordered:
+        if (deadline is not None and time.monotonic() >= deadline) or (max_calls is not None and calls >= max_calls):
+            break
+        with span('reconcile.mirror', mirror=head):
+            for key in keys:
+                if reconcile_one(key, mirror_map[key]):
+                    break
+        cursor.update(priority=prio, key=head)
+        visited += 1
+
+    if changes:
+        update_mirror_map(changes)
+
+    backlog = len(ordered) - visited
+    if backlog:
+        save_reconcile_cursor(cursor, calendars)
+        return {'backlog': backlog, 'sweep_seconds': None}
+    save_reconcile_cursor(None, calendars)
+    return {'backlog': 0, 'sweep_seconds': time.time() - sweep_started}
@@ -0,0 +1,43 @@
+# ~/calendar_bot/utils/pacing.py
+"""
+Adaptive safety-net poll interval, per calendar.
+
+Webhooks deliver changes within seconds, so the scheduled poll only exists to
+catch what a lapsed or broken watch channel misses. When a calendar's channel is
+live and proven to deliver (a notification, including Google's initial 'sync'
+message, arrived since it was registered) the poll can back off to the
+maximum interval. When the channel has lapsed or failed to register, polling is
+the only path for changes, so it tightens to the minimum. It also tightens while
+the calendar is busy (a high moving average of changes per sync), since a busy
+calendar is where a missed notification costs the most.
+"""
+
+
+class AdaptivePollInterval:
+    def __init__(self, base, minimum, maximum, churn_high, smoothing=0.3):
+        self.base = base
+        self.minimum = minimum
+        self.maximum = maximum
+        self.churn_high = churn_high
+        self.smoothing = smoothing
+        self._churn = {}  # calendar -> moving average of changes per incremental sync
+
+    def observe(self, calendar_id, changes):
+        """Feed the number of changed events one incremental sync returned."""
+        prev = self._churn.get(calendar_id)
+        self._churn[calendar_id] = changes if prev is None else (
+            self.smoothing * changes + (1 - self.smoothing) * prev
+        )
+
+    def churn(self, calendar_id):
+        return self._churn.get(calendar_id, 0.0)
+
+    def forget(self, calendar_id):
+        self._churn.pop(calendar_id, None)
+
+    def interval(self, calendar_id, channel_live, channel_heard):
+        """Effective poll interval (seconds) for a calendar, given whether its
+        watch channel is live and whether it has delivered a notification."""
+        if not channel_live or self.churn(calendar_id) >= self.churn_high:
+            return self.minimum
+        return self.maximum if channel_heard else self.base
@@ -1,17 +1,24 @@
 # ~/calendar_bot/utils/process_event.py (Updated)
 import json
 import os
+import time
 from pathlib import Path
 
 from tenacity import retry, wait_exponential, stop_after_attempt, retry_if_exception_type
 from googleapiclient.errors import HttpError
 
+from utils.deadline import check, stop_at_deadline
+from utils.expiry import ExpiryIndex
+from utils.filelock import file_lock
 from utils.logger import logger
 from utils.tenacity_utils import log_before_retry, log_and_email_on_final_failure
 from utils.mirror import is_self_organized, ensure_mirror, remove_mirror
 from utils.clones import record_clone
+from utils.propagation import record_propagation
+from utils.routing import DEFAULT_TARGET, get_router
+from utils.tracing import traced, set_attribute
 
-INVITE_EMAIL = os.getenv('INVITE_EMAIL', 'joelandtaylor@gmail.com')
+INVITE_EMAIL = DEFAULT_TARGET
 PROCESSED_FILE_PATH_STR = os.getenv('PROCESSED_FILE', 'data/processed_events.json')
 PROCESSED_FILE = Path(PROCESSED_FILE_PATH_STR)
 
@@ -27,26 +34,144 @@ def _user_declined(event):
             return True
     return False
 
+class ProcessedStore:
+    """The set of processed (cloned) event IDs, each tagged with its source
+    calendar and the event's end time.
+
+    Behaves like a set of IDs for membership/iteration, and keeps an
+    ExpiryIndex on end time so IDs of long-ended events can be dropped locally
+    in O(expired), across all calendars, with no Calendar API calls. IDs with
+    no known end (unbounded recurring series) never expire.
+
+    Entries with no calendar (migrated from the legacy list) are global: every
+    shard keeps them, so the already-processed check holds whichever shard
+    syncs their calendar.
+    """
+
+    def __init__(self, entries=None):
+        self._entries = {}
+        self._expiry = ExpiryIndex()
+        self.update(entries or {})
+
+    def __contains__(self, event_id):
+        return event_id in self._entries
+
+    def __iter__(self):
+        return iter(self._entries)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def add(self, event_id, calendar_id=None, end_ts=None):
+        self._entries[event_id] = {'calendar_id': calendar_id, 'end_ts': end_ts}
+        self._expiry.set(event_id, end_ts)
+
+    def discard(self, event_id):
+        self._entries.pop(event_id, None)
+        self._expiry.discard(event_id)
+
+    def clear(self):
+        self._entries.clear()
+        self._expiry = ExpiryIndex()
+
+    def update(self, entries):
+        """Add from another store, an `{id: {'calendar_id', 'end_ts'}}` dict, or bare IDs."""
+        if isinstance(entries, (ProcessedStore, dict)):
+            items = entries.items()
+        else:
+            items = ((event_id, {}) for event_id in entries)
+        for event_id, meta in items:
+            self.add(event_id, meta.get('calendar_id'), meta.get('end_ts'))
+
+    def items(self):
+        return self._entries.items()
+
+    def discard_calendars(self, calendar_ids):
+        """Forget every entry belonging to one of `calendar_ids`."""
+        calendar_ids = set(calendar_ids)
+        for event_id in [e for e, meta in self._entries.items() if meta['calendar_id'] in calendar_ids]:
+            self.discard(event_id)
+
+    def expire(self, cutoff_ts):
+        """Drop and return the IDs of events that ended before `cutoff_ts`."""
+        expired = self._expiry.pop_expired(cutoff_ts)
+        for event_id in expired:
+            del self._entries[event_id]
+        return expired
+
+
 def load_processed():
+    """Load the processed-ID store, migrating the legacy bare-ID list format.
+
+    Legacy IDs have no calendar or end time; they are kept as global entries
+    that count as having ended at migration, so they age out one retention
+    window later like any other ID (see `migrate_processed`).
+    """
     if PROCESSED_FILE.exists():
-        return set(json.loads(PROCESSED_FILE.read_text()))
-    return set()
+        data = json.loads(PROCESSED_FILE.read_text())
+        if isinstance(data, list):
+            migrated_at = int(time.time())
+            return ProcessedStore({event_id: {'end_ts': migrated_at} for event_id in data})
+        return ProcessedStore(data.get('events', {}))
+    return ProcessedStore()
+
+def migrate_processed():
+    """Rewrite a legacy bare-ID list in the current format, once at startup,
+    so the expiry its IDs get at migration is fixed on disk."""
+    with file_lock(PROCESSED_FILE):
+        if PROCESSED_FILE.exists() and isinstance(json.loads(PROCESSED_FILE.read_text()), list):
+            _write_processed(dict(load_processed().items()))
+            logger.info("📂 Migrated the legacy processed-ID list.")
 
-def save_processed(event_ids):
+def save_processed(store, calendar_ids=None):
+    """Persist the store. With `calendar_ids` (a shard's owned calendars), only
+    entries of those calendars are replaced on disk, under the file lock, and
+    every other calendar's entries are left as they are. Global entries (no
+    calendar) are kept only while the store still holds them, so whichever
+    shard expires one first drops it."""
+    with file_lock(PROCESSED_FILE):
+        if calendar_ids is None:
+            entries = dict(store.items())
+        else:
+            calendar_ids = set(calendar_ids)
+            entries = {
+                event_id: meta for event_id, meta in load_processed().items()
+                if meta.get('calendar_id') is not None and meta.get('calendar_id') not in calendar_ids
+            }
+            entries.update(
+                (event_id, meta) for event_id, meta in store.items()
+                if meta.get('calendar_id') is None or meta.get('calendar_id') in calendar_ids
+            )
+        _write_processed(entries)
+
+def _write_processed(entries):
     PROCESSED_FILE.parent.mkdir(parents=True, exist_ok=True)
-    PROCESSED_FILE.write_text(json.dumps(list(event_ids), indent=2))
+    PROCESSED_FILE.write_text(json.dumps({'_version': 2, 'events': entries}, indent=2))
 
 @retry(
     retry=retry_if_exception_type(HttpError),
     wait=wait_exponential(multiplier=2, min=4, max=30),
-    stop=stop_after_attempt(4),
+    stop=stop_after_attempt(4) | stop_at_deadline,
     before_sleep=log_before_retry,
     retry_error_callback=log_and_email_on_final_failure,
     reraise=True
 )
+@traced('handle_event')  # inside the retry: one span per attempt
 # CORRECTED: Function now accepts the success counter as an argument
-def handle_event(service, calendar_id: str, event_id: str, success_counter, invite_email: str = INVITE_EMAIL):
-    logger.debug(f"➡️ handle_event(event_id={event_id})")
+def handle_event(service, calendar_id: str, event_id: str, success_counter, invite_email: str = None, deadline=None):
+    """Copy one source event to its target calendars.
+
+    Targets come from the routing table (utils/routing.py) unless
+    `invite_email` names a single target explicitly. Every write for the event
+    covers all its targets at once: one clone or invite patch listing them all
+    as attendees, and one mirror-map update for all mirrors.
+
+    Pass `deadline` by keyword: it is checked before each API call and also
+    bounds the retry schedule.
+    """
+    logger.debug("➡️ handle_event(event_id=%s)", event_id)
+    set_attribute('event_id', event_id)
+    check(deadline, f"handling event {event_id}")
 
     event = service.events().get(calendarId=calendar_id, eventId=event_id).execute()
     summary = event.get('summary', '(no title)')
@@ -54,67 +179,78 @@ def handle_event(service, calendar_id: str, event_id: str, success_counter, invi
 
     # (#5) Skip event types that can't have attendees / aren't meaningful to mirror.
     if event_type in SKIP_EVENT_TYPES:
-        logger.info(f"⏭️ Skipping '{event_type}' event “{summary}” ({event_id}); not actionable.")
+        logger.info("⏭️ Skipping '%s' event “%s” (%s); not actionable.", event_type, summary, event_id)
         return
 
     # (#7) Skip cancelled or declined events; drop any stale mirror for a declined one.
     if event.get('status') == 'cancelled':
-        logger.info(f"⏭️ Skipping cancelled event “{summary}” ({event_id}).")
+        logger.info("⏭️ Skipping cancelled event “%s” (%s).", summary, event_id)
         return
     if _user_declined(event):
-        logger.info(f"⏭️ Skipping declined event “{summary}” ({event_id}).")
-        remove_mirror(service, calendar_id, event_id)
+        logger.info("⏭️ Skipping declined event “%s” (%s).", summary, event_id)
+        remove_mirror(service, calendar_id, event_id, deadline)
+        return
+
+    targets = (invite_email,) if invite_email else get_router().route(calendar_id, event)
+    if not targets:
+        logger.info("⏭️ No routing rule sends “%s” (%s) anywhere; skipping.", summary, event_id)
+        remove_mirror(service, calendar_id, event_id, deadline)  # in case it used to be routed
         return
 
     if event_type == "birthday":
-        logger.info(f"🎂 Detected 'birthday' event: “{summary}”. Cloning to shared calendar.")
+        logger.info("🎂 Detected 'birthday' event: “%s”. Cloning to %s.", summary, ', '.join(targets))
         new_birthday_event = {
             "summary":     event.get("summary"), "description": "Automatically copied by Calendar Bot.",
             "start":       event.get("start"), "end":         event.get("end"),
-            "attendees":   [{"email": invite_email}], "transparency": "transparent",
+            "attendees":   [{"email": t} for t in targets], "transparency": "transparent",
         }
         inserted = service.events().insert(calendarId=calendar_id, body=new_birthday_event, sendUpdates="all").execute()
-        record_clone(calendar_id, event_id, inserted['id'])  # so the clone is cleaned up if the source is removed
+        record_clone(calendar_id, event_id, inserted['id'], targets)  # so the clone is cleaned up if the source is removed
+        record_propagation(calendar_id, 'birthday_clone', event)
         success_counter.labels(calendar_id=calendar_id, event_type='birthday_clone').inc()
-        logger.info(f"✅ Cloned birthday as new event ID {inserted['id']} for “{inserted.get('summary')}”")
+        logger.info("✅ Cloned birthday as new event ID %s for “%s”", inserted['id'], inserted.get('summary'))
         return
 
     if event_type == "fromGmail":
-        logger.info(f"🔁 Duplicating 'fromGmail' event: {event_id} - “{summary}”")
+        logger.info("🔁 Duplicating 'fromGmail' event: %s - “%s”", event_id, summary)
         new_event = {
             "summary": event.get("summary"), "description": event.get("description"),
             "start": event.get("start"), "end": event.get("end"),
-            "location": event.get("location"), "attendees": [{"email": invite_email}],
+            "location": event.get("location"), "attendees": [{"email": t} for t in targets],
         }
         inserted = service.events().insert(calendarId=calendar_id, body=new_event, sendUpdates="all").execute()
-        logger.info(f"✅ Created copy ID {inserted['id']} for “{inserted.get('summary')}”")
+        record_propagation(calendar_id, 'gmail_clone', event)
+        logger.info("✅ Created copy ID %s for “%s”", inserted['id'], inserted.get('summary'))
         service.events().delete(calendarId=calendar_id, eventId=event_id).execute()
         success_counter.labels(calendar_id=calendar_id, event_type='gmail_clone').inc()
-        logger.info(f"🗑️ Deleted original 'fromGmail' event: {event_id}")
+        logger.info("🗑️ Deleted original 'fromGmail' event: %s", event_id)
         return
 
     if 'start' not in event or 'end' not in event:
-        logger.warning(f"⚠️ Skipping event {event_id}: missing start or end.")
+        logger.warning("⚠️ Skipping event %s: missing start or end.", event_id)
         return
 
     # If the user doesn't organize this event we can't add an attendee, so mirror
-    # it onto the shared calendar instead (and keep it synced via reconciliation).
+    # it onto the target calendars instead (and keep it synced via reconciliation).
     if not is_self_organized(event):
-        if ensure_mirror(service, calendar_id, event):
+        if ensure_mirror(service, calendar_id, event, targets, deadline):
             success_counter.labels(calendar_id=calendar_id, event_type='mirrored').inc()
-            logger.info(f"🪞 Mirrored non-organized event “{summary}” ({event_id}) to shared calendar.")
+            logger.info("🪞 Mirrored non-organized event “%s” (%s) to %s.", summary, event_id, ', '.join(targets))
         return
 
     attendees = event.get('attendees', [])
-    if any(att.get('email') == invite_email for att in attendees):
-        logger.info(f"⏩ {invite_email} already invited to “{summary}” ({event_id})")
+    invited = {att.get('email') for att in attendees}
+    missing = [t for t in targets if t not in invited]
+    if not missing:
+        logger.info("⏩ %s already invited to “%s” (%s)", ', '.join(targets), summary, event_id)
         success_counter.labels(calendar_id=calendar_id, event_type='already_invited').inc()
         return
 
     minimal = [{'email': a['email']} for a in attendees if 'email' in a]
-    minimal.append({'email': invite_email})
+    minimal.extend({'email': t} for t in missing)
     patch_body = {'attendees': minimal}
 
     updated = service.events().patch(calendarId=calendar_id, eventId=event_id, body=patch_body, sendUpdates='all').execute()
+    record_propagation(calendar_id, 'invite_added', event)
     success_counter.labels(calendar_id=calendar_id, event_type='invite_added').inc()
-    logger.info(f"✅ Invited {invite_email} to “{updated.get('summary', summary)}” (ID: {event_id})")
+    logger.info("✅ Invited %s to “%s” (ID: %s)", ', '.join(missing), updated.get('summary', summary), event_id)
@@ -0,0 +1,176 @@
+# ~/calendar_bot/utils/profiling.py
+"""
+On-demand profiling of the engine's polls, armed at runtime from the web
+tier's admin route (no restart needed).
+
+`PollProfiler.arm()` profiles the next N polls, or every poll that starts
+within a time window, with cProfile. cProfile hooks the thread it is enabled
+in, so it works the same whether the poll runs on an APScheduler thread or, in
+a gevent worker, on a greenlet. On Python 3.12+ it observes every thread while
+enabled, so work done concurrently in other threads shows up too.
+
+When the profile completes it is written to PROFILE_DIR as `<id>.pstats` and
+as `<id>.collapsed`, flamegraph-compatible collapsed stacks reconstructed from
+the pstats call graph (a function's time is split across its callers in
+proportion to the time each call edge accounts for). `<id>.json` tracks the
+profile's state for the admin route.
+"""
+import cProfile
+import json
+import os
+import pstats
+import re
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from utils.logger import logger
+
+PROFILE_DIR = Path(os.getenv('PROFILE_DIR', 'data/profiles'))
+PROFILE_ID = re.compile(r'^[0-9a-f]{8,64}$')
+_MAX_STACK_DEPTH = 64
+
+
+def profile_path(profile_id, suffix, directory=None):
+    """Path of one of a profile's files; raises ValueError on a malformed ID."""
+    if not PROFILE_ID.match(profile_id or ''):
+        raise ValueError(f"Malformed profile ID {profile_id!r}")
+    return (directory or PROFILE_DIR) / f"{profile_id}.{suffix}"
+
+
+def read_profile_status(profile_id, directory=None):
+    """The profile's state dict, or None if it doesn't exist."""
+    try:
+        return json.loads(profile_path(profile_id, 'json', directory).read_text())
+    except FileNotFoundError:
+        return None
+
+
+class PollProfiler:
+    """Profiles polls on request. One profile is armed at a time; arming
+    another replaces it (writing out what the previous one collected)."""
+
+    def __init__(self, directory=None, clock=time.time):
+        self.directory = directory
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._armed = None  # {'id', 'polls_left', 'until', 'profile', 'polls'}
+        self._active = False  # a poll is being profiled right now
+
+    def arm(self, profile_id, polls=None, seconds=None):
+        if polls is None and seconds is None:
+            polls = 1
+        profile_path(profile_id, 'json', self.directory)  # validate the ID
+        with self._lock:
+            previous = self._armed
+            self._armed = {
+                'id': profile_id,
+                'polls_left': polls,
+                'until': self._clock() + seconds if seconds is not None else None,
+                'profile': cProfile.Profile(),
+                'polls': 0,
+            }
+        if previous:
+            self._write(previous)
+        self._write_status(profile_id, {'state': 'armed', 'polls': polls, 'seconds': seconds})
+        if polls is not None:
+            logger.info("🔬 Profiler armed (%s): %s poll(s).", profile_id, polls)
+        else:
+            logger.info("🔬 Profiler armed (%s): polls in the next %gs.", profile_id, seconds)
+
+    @contextmanager
+    def profiling(self):
+        """Profile the enclosed poll if a profile is armed."""
+        with self._lock:
+            armed = self._armed
+            take = armed is not None and not self._active and not self._expired(armed)
+            if take:
+                self._active = True
+        if not take:
+            yield
+            self.finish_if_due()
+            return
+        try:
+            armed['profile'].enable()
+            try:
+                yield
+            finally:
+                armed['profile'].disable()
+        finally:
+            with self._lock:
+                self._active = False
+                armed['polls'] += 1
+                if armed['polls_left'] is not None:
+                    armed['polls_left'] -= 1
+            self.finish_if_due()
+
+    def finish_if_due(self):
+        """Write out the armed profile once its polls are done or its window closed."""
+        with self._lock:
+            armed = self._armed
+            if armed is None or self._active or not self._expired(armed):
+                return
+            self._armed = None
+        self._write(armed)
+
+    def _expired(self, armed):
+        if armed['polls_left'] is not None and armed['polls_left'] <= 0:
+            return True
+        return armed['until'] is not None and self._clock() >= armed['until']
+
+    def _write(self, armed):
+        profile_id = armed['id']
+        if not armed['polls']:
+            self._write_status(profile_id, {'state': 'done', 'polls': 0})
+            logger.info("🔬 Profile %s finished without profiling any poll.", profile_id)
+            return
+        stats = pstats.Stats(armed['profile'])
+        stats.dump_stats(str(profile_path(profile_id, 'pstats', self.directory)))
+        profile_path(profile_id, 'collapsed', self.directory).write_text(collapsed_stacks(stats))
+        self._write_status(profile_id, {'state': 'done', 'polls': armed['polls']})
+        logger.info("🔬 Profile %s written (%s poll(s)).", profile_id, armed['polls'])
+
+    def _write_status(self, profile_id, status):
+        path = profile_path(profile_id, 'json', self.directory)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(status))
+
+
+def _frame_name(func):
+    filename, line, name = func
+    if filename == '~':
+        return name  # a builtin, e.g. <built-in method time.sleep>
+    return f"{name} ({Path(filename).name}:{line})"
+
+
+def collapsed_stacks(stats):
+    """Collapsed stacks (`root;caller;callee <microseconds>` lines, as read by
+    flamegraph.pl / speedscope) reconstructed from a pstats call graph."""
+    entries = stats.stats  # func -> (cc, nc, tt, ct, callers{caller: (cc, nc, tt, ct)})
+    callees = {}
+    for func, (_, _, _, _, callers) in entries.items():
+        for caller, edge in callers.items():
+            callees.setdefault(caller, []).append((func, edge[3]))
+    roots = [func for func, entry in entries.items() if not entry[4]]
+
+    lines = {}
+
+    def walk(func, share, path, on_path):
+        _, _, tt, ct, _ = entries[func]
+        frames = path + [_frame_name(func)]
+        scale = share / ct if ct else 0.0
+        self_us = int(tt * scale * 1e6)
+        if self_us:
+            key = ';'.join(frames)
+            lines[key] = lines.get(key, 0) + self_us
+        if len(frames) >= _MAX_STACK_DEPTH:
+            return
+        for callee, edge_ct in callees.get(func, ()):
+            if callee in on_path:
+                continue  # recursion: its time is already counted higher up
+            walk(callee, edge_ct * scale, frames, on_path | {callee})
+
+    for root in roots:
+        walk(root, entries[root][3], [], {root})
+    return ''.join(f"{stack} {us}\n" for stack, us in sorted(lines.items()))
@@ -0,0 +1,107 @@
+# ~/calendar_bot/utils/propagation.py
+"""
+End-to-end propagation latency: how long after a source event was edited the
+bot's write reflecting it (invite patch, mirror write, clone insert, instance
+exception) completed.
+
+Each write site calls `record_propagation()` with the source event, whose
+`updated` timestamp is when the edit happened. The trigger label says what
+led the bot to the change: the engine wraps each calendar sync in
+`triggered_by('webhook' | 'poll')`, and reconciliation records with
+trigger 'reconcile'. Samples go to the calendar_bot_propagation_latency_seconds
+histogram and to a sliding window per trigger, whose p50/p95 each engine
+publishes to the status file under its instance for /health, which merges them
+(see utils/health.py `propagation_summary`).
+"""
+import contextvars
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+from utils.flight_recorder import note_action
+from utils.metrics import PROPAGATION_LATENCY_SECONDS
+from utils.status import publish_status
+from utils.tracing import exemplar, set_attribute
+
+WINDOW_SIZE = 500  # most recent samples per trigger behind the /health quantiles
+
+_trigger = contextvars.ContextVar('propagation_trigger', default='other')
+
+
+@contextmanager
+def triggered_by(trigger):
+    """Label the propagation samples recorded inside the block with `trigger`."""
+    token = _trigger.set(trigger)
+    try:
+        yield
+    finally:
+        _trigger.reset(token)
+
+
+def updated_ts(event):
+    """The event's `updated` time as epoch seconds, or None."""
+    value = event.get('updated')
+    if not value:
+        return None
+    try:
+        dt = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+
+class LatencyWindow:
+    """The most recent `size` latency samples, for percentile summaries."""
+
+    def __init__(self, size=WINDOW_SIZE):
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def add(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def summary(self):
+        """{'p50', 'p95', 'count'} (nearest-rank), or None with no samples."""
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return None
+
+        def rank(q):
+            return round(samples[max(0, -(-len(samples) * q // 100) - 1)], 1)
+        return {'p50': rank(50), 'p95': rank(95), 'count': len(samples)}
+
+
+_windows = {}  # trigger -> LatencyWindow
+_unpublished = threading.Event()
+
+
+def record_propagation(calendar_id, action, event, trigger=None):
+    """Record that `action` on source `event` just completed."""
+    note_action(action)
+    ts = updated_ts(event)
+    if ts is None:
+        return
+    seconds = max(0.0, time.time() - ts)  # clamp clock skew against Google
+    trigger = trigger or _trigger.get()
+    PROPAGATION_LATENCY_SECONDS.labels(calendar_id=calendar_id, action=action, trigger=trigger).observe(
+        seconds, exemplar=exemplar()
+    )
+    set_attribute('action', action)
+    _windows.setdefault(trigger, LatencyWindow()).add(seconds)
+    _unpublished.set()
+
+
+def publish_propagation_summary(instance_id):
+    """Write p50/p95 per trigger to the status file under `instance_id`, if
+    anything new was recorded."""
+    if not _unpublished.is_set():
+        return
+    _unpublished.clear()
+    summaries = {trigger: window.summary() for trigger, window in list(_windows.items())}
+    publish_status('propagation', {instance_id: {'published': time.time(), 'triggers': summaries}})
@@ -0,0 +1,118 @@
+# ~/calendar_bot/utils/routing.py
+"""
+Which target calendars each source event is copied to.
+
+Routing rules are read from ROUTING_FILE, a JSON list evaluated in order; the
+first rule whose conditions all match decides the event's targets. Every
+condition is optional (an absent one matches anything):
+
+    [
+      {"source": "joeltimm@gmail.com", "event_type": "birthday",
+       "targets": ["family@group.calendar.google.com"]},
+      {"organizer_domain": "work.example.com",
+       "targets": ["team@group.calendar.google.com", "joelandtaylor@gmail.com"]},
+      {"summary": "(?i)^\\[private\\]", "targets": []},
+      {"targets": ["joelandtaylor@gmail.com"]}
+    ]
+
+`summary` is a regular expression searched for in the title and
+`organizer_domain` is compared case-insensitively with the organizer's email
+domain. A target is a calendar ID: mirrors are written onto it, and it is the
+attendee address invited to events the source user organizes. An empty
+`targets` list (or no matching rule) means the event isn't copied anywhere.
+
+Without a routing file every event goes to DEFAULT_TARGET (INVITE_EMAIL), as
+before routing existed.
+"""
+import json
+import os
+import re
+from pathlib import Path
+
+from utils.logger import logger
+
+DEFAULT_TARGET = os.getenv('INVITE_EMAIL', 'joelandtaylor@gmail.com')
+ROUTING_FILE = Path(os.getenv('ROUTING_FILE', 'data/routing.json'))
+
+_CONDITIONS = ('source', 'event_type', 'organizer_domain', 'summary')
+
+
+class _Rule:
+    __slots__ = ('source', 'event_type', 'organizer_domain', 'summary', 'targets')
+
+    def __init__(self, spec):
+        unknown = set(spec) - set(_CONDITIONS) - {'targets'}
+        if unknown:
+            raise ValueError(f"Unknown routing rule keys {sorted(unknown)} in {spec}")
+        targets = spec.get('targets')
+        if not isinstance(targets, list):
+            raise ValueError(f"Routing rule needs a 'targets' list: {spec}")
+        self.source = spec.get('source')
+        self.event_type = spec.get('event_type')
+        domain = spec.get('organizer_domain')
+        self.organizer_domain = domain.lower() if domain else None
+        self.summary = re.compile(spec['summary']) if spec.get('summary') else None
+        self.targets = tuple(dict.fromkeys(targets))  # de-duplicated, order kept
+
+    def matches(self, event):
+        # `source` is already applied by the per-source pre-filter in Router.
+        if self.event_type and event.get('eventType', 'default') != self.event_type:
+            return False
+        if self.organizer_domain:
+            email = (event.get('organizer') or {}).get('email', '')
+            if email.rpartition('@')[2].lower() != self.organizer_domain:
+                return False
+        if self.summary and not self.summary.search(event.get('summary') or ''):
+            return False
+        return True
+
+
+class Router:
+    """A compiled routing table. `route()` returns the target tuple for an event."""
+
+    def __init__(self, rules):
+        self._rules = [_Rule(spec) for spec in rules]
+        self._by_source = {}  # source calendar -> the rules that can apply to it
+
+    @property
+    def targets(self):
+        """Every target calendar any rule can route to."""
+        return list(dict.fromkeys(t for rule in self._rules for t in rule.targets))
+
+    def route(self, source_calendar_id, event):
+        rules = self._by_source.get(source_calendar_id)
+        if rules is None:
+            rules = [r for r in self._rules if r.source in (None, source_calendar_id)]
+            self._by_source[source_calendar_id] = rules
+        for rule in rules:
+            if rule.matches(event):
+                return rule.targets
+        return ()
+
+
+def load_router(path=ROUTING_FILE):
+    """Compile the routing table at `path`, or the single default route if it
+    doesn't exist. Raises ValueError on a malformed table."""
+    path = Path(path)
+    if not path.exists():
+        return Router([{'targets': [DEFAULT_TARGET]}])
+    try:
+        rules = json.loads(path.read_text())
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Routing file {path} is not valid JSON: {e}") from e
+    if not isinstance(rules, list):
+        raise ValueError(f"Routing file {path} must hold a JSON list of rules.")
+    router = Router(rules)
+    logger.info("🧭 Loaded %s routing rule(s) over %s target calendar(s).", len(rules), len(router.targets))
+    return router
+
+
+_router = None
+
+
+def get_router():
+    """The process-wide router, compiled once on first use."""
+    global _router
+    if _router is None:
+        _router = load_router()
+    return _router
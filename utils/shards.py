@@ -0,0 +1,167 @@
+# ~/calendar_bot/utils/shards.py
+"""
+Horizontal sharding of SOURCE_CALENDARS across several engine instances.
+
+Each instance heartbeats into a SQLite database on the shared data volume
+(SHARD_DB). The live instances form a consistent-hash ring, and each calendar
+is assigned to the instance the ring maps it to, so an instance joining or
+dying only moves the calendars adjacent to it on the ring.
+
+Assignment alone would briefly let two instances poll the same calendar while
+their views of the live set differ, so ownership is also a lease in the same
+database: an instance only acts on a calendar once it holds its lease, renews
+its leases on every heartbeat, and releases the ones the ring no longer gives
+it. A dead instance's leases lapse after LEASE_TTL and are picked up by the
+instances the ring now assigns them to.
+
+The web tier uses the lease table to route a webhook to the owning instance's
+notify socket.
+"""
+import bisect
+import hashlib
+import os
+import sqlite3
+import time
+from pathlib import Path
+
+from utils.logger import logger
+
+SHARD_DB = Path(os.getenv('SHARD_DB', 'data/shards.db'))
+LEASE_TTL_SECONDS = int(os.getenv('SHARD_LEASE_TTL_SECONDS', '60'))
+_VNODES = 64  # ring points per instance, to even out the split
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS instances (
+    instance_id TEXT PRIMARY KEY,
+    notify_socket TEXT NOT NULL,
+    heartbeat REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS leases (
+    calendar_id TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    expires REAL NOT NULL
+);
+"""
+
+
+def _hash(value):
+    return int(hashlib.md5(value.encode('utf-8')).hexdigest()[:16], 16)
+
+
+class HashRing:
+    """Consistent-hash ring over instance IDs."""
+
+    def __init__(self, nodes, vnodes=_VNODES):
+        self._points = sorted((_hash(f"{node}#{i}"), node) for node in nodes for i in range(vnodes))
+        self._hashes = [h for h, _ in self._points]
+
+    def owner(self, key):
+        if not self._points:
+            return None
+        idx = bisect.bisect(self._hashes, _hash(key)) % len(self._points)
+        return self._points[idx][1]
+
+
+def _connect(db_path):
+    db_path = Path(db_path)
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(db_path), timeout=10, isolation_level=None)
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+def owner_socket(calendar_id, db_path=SHARD_DB):
+    """The notify socket of the instance currently leasing `calendar_id`, or None."""
+    conn = _connect(db_path)
+    try:
+        row = conn.execute(
+            "SELECT i.notify_socket FROM leases l JOIN instances i ON i.instance_id = l.owner "
+            "WHERE l.calendar_id = ? AND l.expires > ?",
+            (calendar_id, time.time()),
+        ).fetchone()
+        return row[0] if row else None
+    finally:
+        conn.close()
+
+
+class ShardCoordinator:
+    """This instance's membership and calendar leases.
+
+    Call `heartbeat()` every LEASE_TTL_SECONDS / 3 or so; it returns the
+    calendars gained and lost since the previous heartbeat. `owned` is the set
+    of calendars this instance currently holds leases for.
+    """
+
+    def __init__(self, instance_id, calendars, notify_socket, db_path=SHARD_DB,
+                 lease_ttl=LEASE_TTL_SECONDS):
+        self.instance_id = instance_id
+        self.calendars = list(calendars)
+        self.notify_socket = str(notify_socket)
+        self.db_path = db_path
+        self.lease_ttl = lease_ttl
+        self.owned = set()
+
+    def heartbeat(self):
+        now = time.time()
+        expires = now + self.lease_ttl
+        conn = _connect(self.db_path)
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(
+                "INSERT OR REPLACE INTO instances (instance_id, notify_socket, heartbeat) VALUES (?, ?, ?)",
+                (self.instance_id, self.notify_socket, now),
+            )
+            conn.execute("DELETE FROM instances WHERE heartbeat <= ?", (now - self.lease_ttl,))
+            live = [row[0] for row in conn.execute("SELECT instance_id FROM instances")]
+            ring = HashRing(live)
+            desired = {cal for cal in self.calendars if ring.owner(cal) == self.instance_id}
+
+            for cal in desired:
+                # Claim if free, lapsed, or already ours; otherwise wait for the
+                # current holder to release it (or for its lease to lapse).
+                conn.execute(
+                    "INSERT INTO leases (calendar_id, owner, expires) VALUES (?, ?, ?) "
+                    "ON CONFLICT(calendar_id) DO UPDATE SET owner = excluded.owner, expires = excluded.expires "
+                    "WHERE leases.owner = excluded.owner OR leases.expires <= ?",
+                    (cal, self.instance_id, expires, now),
+                )
+            held = [row[0] for row in conn.execute(
+                "SELECT calendar_id FROM leases WHERE owner = ?", (self.instance_id,)
+            )]
+            released = [cal for cal in held if cal not in desired]
+            conn.executemany(
+                "DELETE FROM leases WHERE calendar_id = ? AND owner = ?",
+                [(cal, self.instance_id) for cal in released],
+            )
+            owned = {
+                row[0] for row in conn.execute(
+                    "SELECT calendar_id FROM leases WHERE owner = ? AND expires > ?",
+                    (self.instance_id, now),
+                )
+            }
+            conn.execute("COMMIT")
+        except Exception:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+        gained, lost = owned - self.owned, self.owned - owned
+        self.owned = owned
+        if gained or lost:
+            logger.info(
+                "🧩 Shard %s now owns %s (gained %s, lost %s; %d live instance(s)).",
+                self.instance_id, sorted(owned), sorted(gained), sorted(lost), len(live),
+            )
+        return gained, lost
+
+    def leave(self):
+        """Release all leases and deregister, so others take over immediately."""
+        conn = _connect(self.db_path)
+        try:
+            conn.execute("DELETE FROM leases WHERE owner = ?", (self.instance_id,))
+            conn.execute("DELETE FROM instances WHERE instance_id = ?", (self.instance_id,))
+        finally:
+            conn.close()
+        self.owned = set()
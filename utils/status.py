@@ -0,0 +1,40 @@
+# ~/calendar_bot/utils/status.py
+"""
+Engine status shared with the web tier.
+
+The engine and the web workers are separate processes, so state the engine
+holds in memory (circuit breakers, ...) that /health should report is written
+to STATUS_FILE. The file is a JSON object of sections, each a dict merged
+key-by-key under the file lock, so several engine shards can publish their own
+entries side by side.
+"""
+import json
+import os
+from pathlib import Path
+
+from utils.filelock import file_lock
+
+STATUS_FILE = Path(os.getenv('ENGINE_STATUS_FILE', 'data/engine_status.json'))
+
+
+def read_status(path=None):
+    """The whole status document (STATUS_FILE unless `path` names another
+    one), or {} if nothing was published yet."""
+    path = path or STATUS_FILE
+    try:
+        data = json.loads(path.read_text())
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def publish_status(section, entries, path=None):
+    """Merge `entries` ({key: value}) into `section` of the status file."""
+    path = path or STATUS_FILE
+    with file_lock(path):
+        status = read_status(path)
+        status.setdefault(section, {}).update(entries)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix('.tmp')
+        tmp.write_text(json.dumps(status, indent=2))
+        tmp.replace(path)  # readers don't take the lock; never show them a partial file
@@ -17,7 +17,10 @@ from pathlib import Path
 
 from googleapiclient.errors import HttpError
 
+from utils.deadline import check
+from utils.filelock import file_lock
 from utils.logger import logger
+from utils.tracing import span
 
 SYNC_TOKEN_FILE = Path(os.getenv('SYNC_TOKEN_FILE', 'data/sync_tokens.json'))
 _PAGE_SIZE = 2500  # max allowed; keeps the full initial sync to a few pages
@@ -40,11 +43,19 @@ def load_sync_tokens():
 
 
 def save_sync_tokens(tokens):
-    SYNC_TOKEN_FILE.parent.mkdir(parents=True, exist_ok=True)
-    SYNC_TOKEN_FILE.write_text(json.dumps({'_version': _SYNC_VERSION, 'tokens': tokens}, indent=2))
+    """Merge `tokens` ({calendar_id: token}) into the token file.
+
+    Only the given calendars are written, under the file lock, so shards that
+    own other calendars don't overwrite each other's tokens.
+    """
+    with file_lock(SYNC_TOKEN_FILE):
+        merged = load_sync_tokens()
+        merged.update(tokens)
+        SYNC_TOKEN_FILE.parent.mkdir(parents=True, exist_ok=True)
+        SYNC_TOKEN_FILE.write_text(json.dumps({'_version': _SYNC_VERSION, 'tokens': merged}, indent=2))
 
 
-def _list_all(service, base_params):
+def _list_all(service, base_params, deadline=None):
     """Page through events().list, returning (events, next_sync_token).
 
     nextSyncToken only appears on the final page, so we carry it forward.
@@ -52,11 +63,16 @@ def _list_all(service, base_params):
     events = []
     sync_token = None
     page_token = None
+    page = 0
     while True:
+        check(deadline, f"listing {base_params['calendarId']}")
         params = dict(base_params)
         if page_token:
             params['pageToken'] = page_token
-        resp = service.events().list(**params).execute()
+        with span('sync.page', calendar_id=base_params['calendarId'], page=page) as page_span:
+            resp = service.events().list(**params).execute()
+            page_span.set_attribute('items', len(resp.get('items', [])))
+        page += 1
         events.extend(resp.get('items', []))
         sync_token = resp.get('nextSyncToken') or sync_token
         page_token = resp.get('nextPageToken')
@@ -65,12 +81,13 @@ def _list_all(service, base_params):
     return events, sync_token
 
 
-def list_changes(service, calendar_id, stored_token):
+def list_changes(service, calendar_id, stored_token, deadline=None):
     """Return (events, new_sync_token, is_full_sync).
 
     With a valid stored_token: an incremental sync returning only changed
     events (including cancelled ones, since showDeleted=True). Without a token,
-    or on a 410 (expired token): a full sync bounded by timeMin=now.
+    or on a 410 (expired token): a full sync bounded by timeMin=now. Raises
+    DeadlineExceeded if `deadline` passes between pages.
     """
     common = dict(
         calendarId=calendar_id,
@@ -80,14 +97,14 @@ def list_changes(service, calendar_id, stored_token):
     )
     if stored_token:
         try:
-            events, token = _list_all(service, dict(common, syncToken=stored_token))
+            events, token = _list_all(service, dict(common, syncToken=stored_token), deadline)
             return events, token, False
         except HttpError as e:
             if e.resp.status == 410:  # token expired -> fall back to full resync
-                logger.warning(f"🔄 Sync token for {calendar_id} expired; doing a full resync.")
+                logger.warning("🔄 Sync token for %s expired; doing a full resync.", calendar_id)
             else:
                 raise
 
     now = datetime.now(timezone.utc).isoformat()
-    events, token = _list_all(service, dict(common, timeMin=now))
+    events, token = _list_all(service, dict(common, timeMin=now), deadline)
     return events, token, True
@@ -1,7 +1,8 @@
 # ~/calendar_bot/utils/tenacity_utils.py
 #This is to make sure the bot only sends emails if retry errors fail
 from utils.logger import logger
-from utils.email_utils import send_error_email
+from utils.alerts import alert
+from utils.flight_recorder import note_retry
 
 def log_and_email_on_final_failure(retry_state):
 
@@ -13,23 +14,24 @@ def log_and_email_on_final_failure(retry_state):
     failed_function_name = retry_state.fn.__name__
 
     logger.error(
-        f"❌ FINAL ATTEMPT FAILED for '{failed_function_name}'.",
+        "❌ FINAL ATTEMPT FAILED for '%s'.", failed_function_name,
         exc_info=exception
     )
-    send_error_email(
+    alert(
         f"Calendar Bot - Permanent Error in {failed_function_name}",
         f"The bot encountered a permanent error that could not be resolved after multiple retries.\n\n"
         f"Function: {failed_function_name}\n"
         f"Arguments: {retry_state.args}\n"
-        f"Final error:\n{exception}"
+        f"Final error:\n{exception}",
+        fingerprint=f"final_failure:{failed_function_name}:{type(exception).__name__}",
     )
 
 def log_before_retry(retry_state):
 
 #    Callback to log that a retry is about to happen. This gives visibility
 #    into transient errors without sending an email.
+    note_retry()
     logger.warning(
-        f"⚠️ Transient API error in '{retry_state.fn.__name__}'. "
-        f"Retrying in {retry_state.next_action.sleep:.2f} seconds... "
-        f"(Attempt #{retry_state.attempt_number})"
+        "⚠️ Transient API error in '%s'. Retrying in %.2f seconds... (Attempt #%d)",
+        retry_state.fn.__name__, retry_state.next_action.sleep, retry_state.attempt_number,
     )
@@ -0,0 +1,204 @@
+# ~/calendar_bot/utils/tracing.py
+"""
+Lightweight tracing for the sync engine.
+
+A root span is opened per poll (and per reconciliation run or webhook
+registration); calendar syncs, sync pages, event actions and every Calendar
+API request open child spans under whatever span is current. The current span
+lives in a context variable, so each scheduler thread traces independently.
+
+Log records carry the current trace ID (see utils/logger.py), and latency
+histograms attach it as an exemplar via `exemplar()`, so a slow bucket links
+to the poll that produced it.
+
+When TRACE_EXPORT_FILE is set, each finished trace is appended to it as one
+line of OTLP/JSON (an ExportTraceServiceRequest), which an OpenTelemetry
+collector's otlpjsonfile receiver can ingest; at most TRACE_MAX_SPANS spans of
+one trace are kept for it, and the root records how many were dropped. With
+export off, finished spans aren't collected at all: trace IDs in logs and
+exemplars still work.
+"""
+import contextvars
+import functools
+import json
+import os
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from utils.filelock import file_lock
+
+TRACE_EXPORT_FILE = os.getenv('TRACE_EXPORT_FILE', '')
+# The export file is rolled over to `<file>.1` past this size.
+TRACE_EXPORT_MAX_BYTES = int(os.getenv('TRACE_EXPORT_MAX_BYTES', str(50 * 1024 * 1024)))
+# Spans buffered per trace for export; a poll over a large full sync could
+# otherwise hold one span per event and API call until it ends.
+TRACE_MAX_SPANS = int(os.getenv('TRACE_MAX_SPANS', '5000'))
+SERVICE_NAME = 'calendar_bot'
+
+_STATUS_OK, _STATUS_ERROR = 1, 2
+_current = contextvars.ContextVar('current_span', default=None)
+
+
+class Span:
+    __slots__ = ('name', 'trace_id', 'span_id', 'parent_id', 'start_ns', 'end_ns',
+                 'attributes', 'error', '_trace', '_parent')
+
+    def __init__(self, name, parent, attributes):
+        self.name = name
+        self.trace_id = parent.trace_id if parent else secrets.token_hex(16)
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent.span_id if parent else None
+        self.attributes = dict(attributes)
+        self.error = None
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        # Finished spans of the whole trace, collected only for export.
+        self._trace = parent._trace if parent else (_TraceBuffer() if TRACE_EXPORT_FILE else None)
+        self._parent = parent
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def lookup(self, key):
+        """Attribute `key` of this span or of its nearest ancestor that has it."""
+        current = self
+        while current is not None:
+            if key in current.attributes:
+                return current.attributes[key]
+            current = current._parent
+        return None
+
+    def to_otlp(self):
+        span = {
+            'traceId': self.trace_id,
+            'spanId': self.span_id,
+            'name': self.name,
+            'kind': 1,  # SPAN_KIND_INTERNAL
+            'startTimeUnixNano': str(self.start_ns),
+            'endTimeUnixNano': str(self.end_ns),
+            'attributes': [_otlp_attribute(k, v) for k, v in self.attributes.items()],
+            'status': {'code': _STATUS_ERROR, 'message': self.error} if self.error else {'code': _STATUS_OK},
+        }
+        if self.parent_id:
+            span['parentSpanId'] = self.parent_id
+        return span
+
+
+class _TraceBuffer:
+    """A trace's finished spans awaiting export, at most TRACE_MAX_SPANS children."""
+    __slots__ = ('spans', 'dropped')
+
+    def __init__(self):
+        self.spans = []
+        self.dropped = 0
+
+    def add(self, finished):
+        if finished.parent_id is None:  # the root always goes in, last
+            if self.dropped:
+                finished.set_attribute('trace.dropped_spans', self.dropped)
+            self.spans.append(finished)
+        elif len(self.spans) < TRACE_MAX_SPANS:
+            self.spans.append(finished)
+        else:
+            self.dropped += 1
+
+
+def _otlp_attribute(key, value):
+    if isinstance(value, bool):
+        typed = {'boolValue': value}
+    elif isinstance(value, int):
+        typed = {'intValue': str(value)}
+    elif isinstance(value, float):
+        typed = {'doubleValue': value}
+    else:
+        typed = {'stringValue': str(value)}
+    return {'key': key, 'value': typed}
+
+
+@contextmanager
+def span(name, **attributes):
+    """Open a span named `name` under the current one (or a new trace)."""
+    current = Span(name, _current.get(), attributes)
+    token = _current.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        current.end_ns = time.time_ns()
+        _current.reset(token)
+        trace = current._trace
+        if trace is not None:
+            trace.add(current)
+            if current.parent_id is None:
+                _export(trace.spans)
+
+
+def traced(name):
+    """Decorator: run each call of the function in its own span."""
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def current_span():
+    return _current.get()
+
+
+def set_attribute(key, value):
+    """Set an attribute on the current span, if any."""
+    current = _current.get()
+    if current is not None:
+        current.set_attribute(key, value)
+
+
+def current_trace_id():
+    current = _current.get()
+    return current.trace_id if current else None
+
+
+def exemplar():
+    """Exemplar labels linking a histogram observation to the current trace."""
+    trace_id = current_trace_id()
+    return {'trace_id': trace_id} if trace_id else None
+
+
+@contextmanager
+def timed(histogram):
+    """Like `histogram.time()`, with the current trace as the exemplar."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        histogram.observe(time.perf_counter() - started, exemplar=exemplar())
+
+
+_export_lock = threading.Lock()
+
+
+def _export(spans):
+    request = {'resourceSpans': [{
+        'resource': {'attributes': [_otlp_attribute('service.name', SERVICE_NAME),
+                                    _otlp_attribute('process.pid', os.getpid())]},
+        'scopeSpans': [{'scope': {'name': SERVICE_NAME}, 'spans': [s.to_otlp() for s in spans]}],
+    }]}
+    line = json.dumps(request, separators=(',', ':')) + '\n'
+    path = Path(TRACE_EXPORT_FILE)
+    try:
+        with _export_lock, file_lock(path):
+            path.parent.mkdir(parents=True, exist_ok=True)
+            if path.exists() and path.stat().st_size > TRACE_EXPORT_MAX_BYTES:
+                path.replace(path.with_name(path.name + '.1'))
+            with path.open('a') as f:
+                f.write(line)
+    except OSError as e:  # tracing must never break the work it observes
+        from utils.logger import logger  # not at import time: the logger imports this module
+        logger.warning("Could not export trace to %s: %s", path, e)